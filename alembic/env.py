@@ -4,10 +4,12 @@ from sqlalchemy import engine_from_config
 from sqlalchemy import pool
 from alembic import context
 
-from app.db.database import Base
-from app.models import user, file
+from app.db.database import Base, SQLALCHEMY_DATABASE_URL
+from app.models import user, file, blob, upload_session, reclaim, chunk, ingestion_job, embedding_cache, search_index
 
 config = context.config
+# same DATABASE_URL the app uses (alembic.ini only holds the fallback)
+config.set_main_option("sqlalchemy.url", SQLALCHEMY_DATABASE_URL.replace("%", "%%"))
 
 if config.config_file_name is not None:
     fileConfig(config.config_file_name)
@@ -15,6 +17,18 @@ if config.config_file_name is not None:
 target_metadata = Base.metadata
 
 
+def include_object(obj, name, type_, reflected, compare_to):
+    # full-text index objects live outside the ORM (app/models/search_index.py);
+    # keep autogenerate from proposing to drop them
+    if type_ == "table" and name.startswith(("files_fts", "file_chunks_fts")):
+        return False
+    if type_ == "column" and name in ("name_tsv", "text_tsv"):
+        return False
+    if type_ == "index" and name in ("ix_files_name_tsv", "ix_file_chunks_text_tsv"):
+        return False
+    return True
+
+
 def run_migrations_offline() -> None:
     url = config.get_main_option("sqlalchemy.url")
     context.configure(
@@ -23,6 +37,7 @@ def run_migrations_offline() -> None:
         literal_binds=True,
         dialect_opts={"paramstyle": "named"},
         compare_type=True,
+        include_object=include_object,
     )
 
     with context.begin_transaction():
@@ -41,6 +56,7 @@ def run_migrations_online() -> None:
             connection=connection,
             target_metadata=target_metadata,
             compare_type=True,
+            include_object=include_object,
         )
 
         with context.begin_transaction():
@@ -0,0 +1,39 @@
+"""add reclaim queue for background file removal
+
+Revision ID: 5d2e8f4a9b17
+Revises: c47e9b3a1d58
+Create Date: 2026-10-18 11:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5d2e8f4a9b17'
+down_revision: Union[str, Sequence[str], None] = 'c47e9b3a1d58'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('reclaim_queue',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('storage_path', sa.String(), nullable=False),
+    sa.Column('sha256', sa.String(), nullable=True),
+    sa.Column('attempts', sa.Integer(), nullable=False),
+    sa.Column('last_error', sa.String(), nullable=True),
+    sa.Column('not_before', sa.DateTime(timezone=True), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_reclaim_queue_not_before'), 'reclaim_queue', ['not_before'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_reclaim_queue_not_before'), table_name='reclaim_queue')
+    op.drop_table('reclaim_queue')
@@ -1,7 +1,7 @@
 """init
 
 Revision ID: 69be1f926366
-Revises: 
+Revises: 4a0c2e7b9d13
 Create Date: 2026-02-26 03:02:27.844011
 
 """
@@ -13,7 +13,7 @@ import sqlalchemy as sa
 
 # revision identifiers, used by Alembic.
 revision: str = '69be1f926366'
-down_revision: Union[str, Sequence[str], None] = None
+down_revision: Union[str, Sequence[str], None] = '4a0c2e7b9d13'
 branch_labels: Union[str, Sequence[str], None] = None
 depends_on: Union[str, Sequence[str], None] = None
 
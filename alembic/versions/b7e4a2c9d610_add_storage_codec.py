@@ -0,0 +1,34 @@
+"""add storage codec
+
+Revision ID: b7e4a2c9d610
+Revises: f1c8d3a5e927
+Create Date: 2026-10-18 18:40:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7e4a2c9d610'
+down_revision: Union[str, Sequence[str], None] = 'f1c8d3a5e927'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('files', sa.Column('codec', sa.String(), nullable=True))
+    op.add_column('files', sa.Column('stored_size', sa.Integer(), nullable=True))
+    op.add_column('blobs', sa.Column('codec', sa.String(), nullable=True))
+    op.add_column('blobs', sa.Column('stored_size', sa.Integer(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('blobs', 'stored_size')
+    op.drop_column('blobs', 'codec')
+    op.drop_column('files', 'stored_size')
+    op.drop_column('files', 'codec')
@@ -0,0 +1,28 @@
+"""composite index for keyset pagination of files
+
+Revision ID: c47e9b3a1d58
+Revises: a81d5e02c6f3
+Create Date: 2026-10-18 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c47e9b3a1d58'
+down_revision: Union[str, Sequence[str], None] = 'a81d5e02c6f3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_files_owner_id_id', 'files', ['owner_id', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_files_owner_id_id', table_name='files')
@@ -0,0 +1,35 @@
+"""add user storage usage and quota
+
+Revision ID: d3f6a8b1c594
+Revises: b7e4a2c9d610
+Create Date: 2026-10-18 21:10:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd3f6a8b1c594'
+down_revision: Union[str, Sequence[str], None] = 'b7e4a2c9d610'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('users', sa.Column('storage_used_bytes', sa.BigInteger(), nullable=False, server_default='0'))
+    op.add_column('users', sa.Column('storage_quota_bytes', sa.BigInteger(), nullable=True))
+    # one full count now; from here on uploads and deletes keep it current
+    op.execute(
+        "UPDATE users SET storage_used_bytes = "
+        "(SELECT COALESCE(SUM(size_bytes), 0) FROM files WHERE files.owner_id = users.id)"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('users', 'storage_quota_bytes')
+    op.drop_column('users', 'storage_used_bytes')
@@ -0,0 +1,84 @@
+"""add full-text search indexes
+
+Revision ID: f1c8d3a5e927
+Revises: e2a7c4f19b63
+Create Date: 2026-10-18 15:20:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f1c8d3a5e927'
+down_revision: Union[str, Sequence[str], None] = 'e2a7c4f19b63'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+SQLITE_UPGRADE = [
+    "CREATE VIRTUAL TABLE files_fts USING fts5("
+    "original_name, content='files', content_rowid='id', tokenize='unicode61 remove_diacritics 2')",
+    "CREATE TRIGGER files_fts_ai AFTER INSERT ON files BEGIN "
+    "INSERT INTO files_fts(rowid, original_name) VALUES (new.id, new.original_name); END",
+    "CREATE TRIGGER files_fts_ad AFTER DELETE ON files BEGIN "
+    "INSERT INTO files_fts(files_fts, rowid, original_name) VALUES ('delete', old.id, old.original_name); END",
+    "CREATE TRIGGER files_fts_au AFTER UPDATE OF original_name ON files BEGIN "
+    "INSERT INTO files_fts(files_fts, rowid, original_name) VALUES ('delete', old.id, old.original_name); "
+    "INSERT INTO files_fts(rowid, original_name) VALUES (new.id, new.original_name); END",
+    "CREATE VIRTUAL TABLE file_chunks_fts USING fts5("
+    "text, content='file_chunks', content_rowid='id', tokenize='unicode61 remove_diacritics 2')",
+    "CREATE TRIGGER file_chunks_fts_ai AFTER INSERT ON file_chunks BEGIN "
+    "INSERT INTO file_chunks_fts(rowid, text) VALUES (new.id, new.text); END",
+    "CREATE TRIGGER file_chunks_fts_ad AFTER DELETE ON file_chunks BEGIN "
+    "INSERT INTO file_chunks_fts(file_chunks_fts, rowid, text) VALUES ('delete', old.id, old.text); END",
+    "CREATE TRIGGER file_chunks_fts_au AFTER UPDATE OF text ON file_chunks BEGIN "
+    "INSERT INTO file_chunks_fts(file_chunks_fts, rowid, text) VALUES ('delete', old.id, old.text); "
+    "INSERT INTO file_chunks_fts(rowid, text) VALUES (new.id, new.text); END",
+    # index what is already there, once
+    "INSERT INTO files_fts(files_fts) VALUES ('rebuild')",
+    "INSERT INTO file_chunks_fts(file_chunks_fts) VALUES ('rebuild')",
+]
+
+SQLITE_DOWNGRADE = [
+    "DROP TRIGGER file_chunks_fts_au",
+    "DROP TRIGGER file_chunks_fts_ad",
+    "DROP TRIGGER file_chunks_fts_ai",
+    "DROP TABLE file_chunks_fts",
+    "DROP TRIGGER files_fts_au",
+    "DROP TRIGGER files_fts_ad",
+    "DROP TRIGGER files_fts_ai",
+    "DROP TABLE files_fts",
+]
+
+POSTGRES_UPGRADE = [
+    "ALTER TABLE files ADD COLUMN name_tsv tsvector GENERATED ALWAYS AS "
+    "(to_tsvector('simple', regexp_replace(original_name, '[._-]+', ' ', 'g'))) STORED",
+    "CREATE INDEX ix_files_name_tsv ON files USING gin (name_tsv)",
+    "ALTER TABLE file_chunks ADD COLUMN text_tsv tsvector GENERATED ALWAYS AS "
+    "(to_tsvector('simple', text)) STORED",
+    "CREATE INDEX ix_file_chunks_text_tsv ON file_chunks USING gin (text_tsv)",
+]
+
+POSTGRES_DOWNGRADE = [
+    "DROP INDEX ix_file_chunks_text_tsv",
+    "ALTER TABLE file_chunks DROP COLUMN text_tsv",
+    "DROP INDEX ix_files_name_tsv",
+    "ALTER TABLE files DROP COLUMN name_tsv",
+]
+
+
+def _run(statements: dict) -> None:
+    for statement in statements.get(op.get_bind().dialect.name, []):
+        op.execute(statement)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    _run({"sqlite": SQLITE_UPGRADE, "postgresql": POSTGRES_UPGRADE})
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    _run({"sqlite": SQLITE_DOWNGRADE, "postgresql": POSTGRES_DOWNGRADE})
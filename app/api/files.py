@@ -1,119 +1,908 @@
 from __future__ import annotations
 
+import asyncio
+import mimetypes
 import os
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File
-from fastapi.responses import FileResponse
-from sqlalchemy.orm import Session
+import re
+import uuid
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from urllib.parse import quote
+from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Query, Request
+from fastapi.responses import FileResponse, Response, StreamingResponse
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.db.database import get_db
+from app.db.database import get_async_db
 from app.core.deps import get_current_active_user
-from app.models.user import User
+from app.core.user_cache import CurrentUser
 from app.models.file import FileRecord
-from app.schemas.file import FileOut
-from app.services.storage import save_upload_file
+from app.models.upload_session import UploadSession
+from app.models.chunk import FileChunk
+from app.models.ingestion_job import IngestionJob
+from app.schemas.file import (
+    FileOut,
+    FileListItem,
+    FileSummary,
+    FilePage,
+    BulkUploadItem,
+    BulkUploadResult,
+    BulkDeleteRequest,
+    BulkDeleteResult,
+)
+from app.schemas.upload import UploadSessionCreate, UploadSessionOut
+from app.schemas.ingestion import IngestionJobOut, ChunkPage, FileChunkOut
+from app.schemas.search import SearchHit, SearchPage, RetrieveRequest, RetrieveResult, Passage
+from app.services.backends import get_backend
+from app.services.compression import HTTP_ENCODINGS, accepts_encoding
+from app.services.storage import (
+    CHUNK_SIZE,
+    MAX_UPLOAD_BYTES,
+    BULK_UPLOAD_CONCURRENCY,
+    SavedUpload,
+    save_upload_file,
+    save_archive,
+    session_staging_path,
+    append_session_chunk,
+    finish_session_upload,
+    drop_session,
+    retain_blob,
+    retain_blobs,
+    finalize_upload,
+    discard_upload,
+    open_stored,
+    run_io,
+)
+from app.services.reclaimer import delete_files, wake_reclaimer
+from app.services.ingestion import drop_vectors, enqueue_ingestion, wake_ingestion
+from app.services.quota import quota_exceeded, reserve_storage, storage_room
+from app.services.search import lexical_search
+from app.services.retrieval import hybrid_search
 
 router = APIRouter(prefix="/files", tags=["files"])
 
 
-def _get_file_or_404(db: Session, file_id: int) -> FileRecord:
-    rec = db.query(FileRecord).filter(FileRecord.id == file_id).first()
+async def _get_file_or_404(db: AsyncSession, file_id: int) -> FileRecord:
+    rec = await db.get(FileRecord, file_id)
     if not rec:
         raise HTTPException(status_code=404, detail="File not found")
     return rec
 
 
-def _assert_owner_or_admin(rec: FileRecord, current_user: User) -> None:
+def _assert_owner_or_admin(rec: FileRecord, current_user: CurrentUser) -> None:
     if rec.owner_id != current_user.id and current_user.role != "admin":
         raise HTTPException(status_code=403, detail="Not allowed")
 
 
+async def _record_upload(
+    db: AsyncSession,
+    saved: SavedUpload,
+    owner_id: int,
+    original_name: str,
+    content_type: str | None,
+) -> FileRecord:
+    try:
+        # a duplicate points at the existing blob, however that is stored
+        await reserve_storage(db, owner_id, saved.size_bytes)
+        saved = await retain_blob(db, saved)
+        rec = FileRecord(
+            owner_id=owner_id,
+            original_name=original_name,
+            stored_name=saved.stored_name,
+            content_type=content_type,
+            size_bytes=saved.size_bytes,
+            sha256=saved.sha256,
+            storage_path=saved.storage_path,
+            codec=saved.codec,
+            stored_size=saved.stored_size,
+        )
+        db.add(rec)
+        await db.flush()
+        await enqueue_ingestion(db, [rec.id])
+        await db.commit()
+    except Exception:
+        await db.rollback()
+        await run_io(discard_upload, saved)
+        raise
+
+    await run_io(finalize_upload, saved)
+    wake_ingestion()
+    await db.refresh(rec)
+    return rec
+
+
 @router.post("/upload", response_model=FileOut, status_code=status.HTTP_201_CREATED)
 async def upload_file(
     uploaded: UploadFile = File(...),
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: CurrentUser = Depends(get_current_active_user),
 ):
 
     if not uploaded or not uploaded.filename:
         raise HTTPException(status_code=400, detail="No file provided")
 
-    stored_name, storage_path, size, sha = await save_upload_file(uploaded)
+    saved = await save_upload_file(uploaded)
+    return await _record_upload(db, saved, current_user.id, uploaded.filename, uploaded.content_type)
+
+
+# --------- Bulk uploads ---------
+async def _record_uploads(
+    db: AsyncSession,
+    entries: list[tuple[SavedUpload, str, str | None]],
+    owner_id: int,
+) -> list[FileOut]:
+    """_record_upload for a whole batch: one multi-row INSERT, one commit."""
+    saved = [e[0] for e in entries]
+    try:
+        await reserve_storage(db, owner_id, sum(s.size_bytes for s in saved))
+        saved = await retain_blobs(db, saved)
+        rows = [
+            {
+                "owner_id": owner_id,
+                "original_name": original_name,
+                "stored_name": s.stored_name,
+                "content_type": content_type,
+                "size_bytes": s.size_bytes,
+                "sha256": s.sha256,
+                "storage_path": s.storage_path,
+                "codec": s.codec,
+                "stored_size": s.stored_size,
+            }
+            for s, (_, original_name, content_type) in zip(saved, entries)
+        ]
+        result = await db.execute(
+            insert(FileRecord).returning(FileRecord.id, FileRecord.created_at, sort_by_parameter_order=True),
+            rows,
+        )
+        created = result.all()
+        await enqueue_ingestion(db, [row.id for row in created])
+        await db.commit()
+    except Exception:
+        await db.rollback()
+        await asyncio.gather(*(run_io(discard_upload, s) for s in saved))
+        raise
+
+    await asyncio.gather(*(run_io(finalize_upload, s) for s in saved if s.staging_path))
+    wake_ingestion()
+    return [FileOut(id=row.id, created_at=row.created_at, **values) for row, values in zip(created, rows)]
+
+
+@router.post("/bulk", response_model=BulkUploadResult)
+async def bulk_upload(
+    files: list[UploadFile] = File(default=[]),
+    archive: UploadFile | None = File(None, description="zip or tar(.gz/.bz2/.xz) unpacked server side"),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: CurrentUser = Depends(get_current_active_user),
+):
+    """Upload many files in one request: multipart parts and/or one archive.
+
+    Parts are hashed and written concurrently, then every accepted file is
+    recorded in a single transaction. Files that fail on their own (e.g. too
+    large) are reported per item and don't affect the rest of the batch.
+    """
+    files = [f for f in files if f.filename]
+    if not files and not (archive and archive.filename):
+        raise HTTPException(status_code=400, detail="No file provided")
+
+    limiter = asyncio.Semaphore(max(BULK_UPLOAD_CONCURRENCY, 1))
+
+    async def _save(uploaded: UploadFile):
+        async with limiter:
+            try:
+                return await save_upload_file(uploaded)
+            except HTTPException as exc:
+                return exc
+
+    outcomes = await asyncio.gather(*(_save(f) for f in files), return_exceptions=True)
+    named: list[tuple[str, str | None, SavedUpload | HTTPException]] = [
+        (f.filename, f.content_type, outcome) for f, outcome in zip(files, outcomes)
+    ]
+
+    try:
+        for outcome in outcomes:
+            # disk or other unexpected errors fail the whole request
+            if isinstance(outcome, BaseException) and not isinstance(outcome, HTTPException):
+                raise outcome
+        if archive and archive.filename:
+            members = await run_io(save_archive, archive.file)
+            named += [(name, mimetypes.guess_type(name)[0], outcome) for name, outcome in members]
+    except BaseException:
+        await asyncio.gather(*(run_io(discard_upload, o) for _, _, o in named if isinstance(o, SavedUpload)))
+        raise
+
+    # files past the quota fail on their own, in upload order
+    room = await storage_room(db, current_user.id)
+    if room is not None:
+        over = []
+        for i, (name, ctype, o) in enumerate(named):
+            if isinstance(o, SavedUpload):
+                if o.size_bytes > room:
+                    over.append(o)
+                    named[i] = (name, ctype, quota_exceeded())
+                else:
+                    room -= o.size_bytes
+        await asyncio.gather(*(run_io(discard_upload, o) for o in over))
+
+    accepted = [(o, name, ctype) for name, ctype, o in named if isinstance(o, SavedUpload)]
+    records = iter(await _record_uploads(db, accepted, current_user.id) if accepted else [])
+
+    items = [
+        BulkUploadItem(filename=name, status="created", file=next(records))
+        if isinstance(o, SavedUpload)
+        else BulkUploadItem(filename=name, status="failed", detail=str(o.detail))
+        for name, _, o in named
+    ]
+    return BulkUploadResult(
+        created=len(accepted),
+        failed=len(items) - len(accepted),
+        items=items,
+    )
+
+
+@router.post("/bulk/delete", response_model=BulkDeleteResult)
+async def bulk_delete(
+    payload: BulkDeleteRequest,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: CurrentUser = Depends(get_current_active_user),
+):
+    """Delete by id list and/or the /files/ filters in one statement.
+
+    Returns right after the commit; the files on disk are removed by the
+    background reclaimer.
+    """
+    filters = _filter_clauses(
+        payload.content_type,
+        payload.min_size,
+        payload.max_size,
+        payload.created_after,
+        payload.created_before,
+        payload.name_prefix,
+    )
+    if payload.ids is None and not filters:
+        raise HTTPException(status_code=400, detail="Give ids or at least one filter")
+
+    is_admin = current_user.role == "admin"
+    if payload.owner_id is not None and payload.owner_id != current_user.id and not is_admin:
+        raise HTTPException(status_code=403, detail="Not allowed")
+
+    criteria = list(filters)
+    if payload.ids is not None:
+        criteria.append(FileRecord.id.in_(payload.ids))
+    # admins may delete anyone's files by id; filters stay scoped to one owner
+    if payload.owner_id is not None:
+        criteria.append(FileRecord.owner_id == payload.owner_id)
+    elif not (is_admin and payload.ids is not None):
+        criteria.append(FileRecord.owner_id == current_user.id)
+
+    deleted = await delete_files(db, *criteria)
+    await db.commit()
+    wake_reclaimer()
+    await run_io(drop_vectors, deleted)
+    return BulkDeleteResult(deleted=len(deleted), ids=sorted(deleted))
+
+
+# --------- Resumable uploads ---------
+# create session -> PUT chunks at ?offset= -> GET status to resume -> complete
+
+_busy_sessions: set[str] = set()
 
-    rec = FileRecord(
+
+async def _get_session_or_404(db: AsyncSession, session_id: str, current_user: CurrentUser) -> UploadSession:
+    session = await db.get(UploadSession, session_id)
+    if not session or session.owner_id != current_user.id:
+        raise HTTPException(status_code=404, detail="Upload session not found")
+    return session
+
+
+@router.post("/uploads", response_model=UploadSessionOut, status_code=status.HTTP_201_CREATED)
+async def create_upload_session(
+    payload: UploadSessionCreate,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: CurrentUser = Depends(get_current_active_user),
+):
+    if MAX_UPLOAD_BYTES is not None and (payload.total_size or 0) > MAX_UPLOAD_BYTES:
+        raise HTTPException(status_code=413, detail="File too large")
+    room = await storage_room(db, current_user.id)
+    if room is not None and (payload.total_size or 0) > room:
+        raise quota_exceeded()
+
+    session_id = uuid.uuid4().hex
+    session = UploadSession(
+        id=session_id,
         owner_id=current_user.id,
-        original_name=uploaded.filename,
-        stored_name=stored_name,
-        content_type=uploaded.content_type,
-        size_bytes=size,
-        sha256=sha,
-        storage_path=storage_path,
+        original_name=payload.filename,
+        content_type=payload.content_type,
+        total_size=payload.total_size,
+        received_bytes=0,
+        staging_path=session_staging_path(session_id),
+    )
+    db.add(session)
+    await db.commit()
+    await db.refresh(session)
+    return session
+
+
+@router.get("/uploads/{session_id}", response_model=UploadSessionOut)
+async def get_upload_session(
+    session_id: str,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: CurrentUser = Depends(get_current_active_user),
+):
+    return await _get_session_or_404(db, session_id, current_user)
+
+
+@router.put("/uploads/{session_id}", response_model=UploadSessionOut)
+async def put_upload_chunk(
+    session_id: str,
+    request: Request,
+    offset: int = Query(..., ge=0),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: CurrentUser = Depends(get_current_active_user),
+):
+    session = await _get_session_or_404(db, session_id, current_user)
+
+    if offset != session.received_bytes:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Expected offset {session.received_bytes}",
+            headers={"Upload-Offset": str(session.received_bytes)},
+        )
+
+    # the quota is only settled on complete; this stops a session from
+    # staging more than could ever be recorded
+    limits = [
+        cap - offset
+        for cap in (MAX_UPLOAD_BYTES, session.total_size, await storage_room(db, current_user.id))
+        if cap is not None
+    ]
+
+    # nothing may be awaited between the check and the add
+    if session_id in _busy_sessions:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Another chunk is in progress")
+    _busy_sessions.add(session_id)
+    try:
+        session.received_bytes = await append_session_chunk(
+            session_id,
+            session.staging_path,
+            offset,
+            request.stream(),
+            min(limits) if limits else None,
+        )
+    finally:
+        _busy_sessions.discard(session_id)
+
+    await db.commit()
+    await db.refresh(session)
+    return session
+
+
+@router.post("/uploads/{session_id}/complete", response_model=FileOut, status_code=status.HTTP_201_CREATED)
+async def complete_upload_session(
+    session_id: str,
+    sha256: str | None = Query(None, description="Optional client-side digest to verify against"),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: CurrentUser = Depends(get_current_active_user),
+):
+    session = await _get_session_or_404(db, session_id, current_user)
+
+    if session_id in _busy_sessions:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Another chunk is in progress")
+    if session.total_size is not None and session.received_bytes != session.total_size:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Received {session.received_bytes} of {session.total_size} bytes",
+            headers={"Upload-Offset": str(session.received_bytes)},
+        )
+
+    # settled again by _record_upload; checked here so a session over quota
+    # keeps its staged bytes instead of losing them to the rollback
+    room = await storage_room(db, current_user.id)
+    if room is not None and session.received_bytes > room:
+        raise quota_exceeded()
+
+    saved = await finish_session_upload(
+        session_id, session.staging_path, session.original_name, session.received_bytes
+    )
+    if sha256 and saved.sha256 and sha256.lower() != saved.sha256:
+        await run_io(discard_upload, saved)
+        await db.delete(session)
+        await db.commit()
+        raise HTTPException(status_code=422, detail="sha256 mismatch, upload discarded")
+
+    original_name, content_type = session.original_name, session.content_type
+    await db.delete(session)
+    try:
+        return await _record_upload(db, saved, current_user.id, original_name, content_type)
+    except HTTPException:
+        # the staged bytes are gone by now (discarded with the rollback), so
+        # the session can't be retried: drop it like a sha256 mismatch
+        await db.delete(session)
+        await db.commit()
+        raise
+
+
+@router.delete("/uploads/{session_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def abort_upload_session(
+    session_id: str,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: CurrentUser = Depends(get_current_active_user),
+):
+    session = await _get_session_or_404(db, session_id, current_user)
+    staging_path = session.staging_path
+    await db.delete(session)
+    await db.commit()
+    await run_io(drop_session, session_id, staging_path)
+    return None
+
+
+# fields returned by /files/ when ?fields= is not given
+DEFAULT_LIST_FIELDS = ("id", "owner_id", "original_name", "content_type", "size_bytes", "sha256", "created_at")
+
+
+def _parse_fields(fields: str | None) -> list[str]:
+    if not fields:
+        return list(DEFAULT_LIST_FIELDS)
+    requested = [f.strip() for f in fields.split(",") if f.strip()]
+    unknown = [f for f in requested if f not in FileListItem.model_fields]
+    if unknown or not requested:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"Unknown fields: {', '.join(unknown) or '(none given)'}",
+        )
+    return list(dict.fromkeys(requested))
+
+
+def _filter_clauses(
+    content_type: str | None = None,
+    min_size: int | None = None,
+    max_size: int | None = None,
+    created_after: datetime | None = None,
+    created_before: datetime | None = None,
+    name_prefix: str | None = None,
+) -> list:
+    clauses = []
+    if content_type is not None:
+        clauses.append(FileRecord.content_type == content_type)
+    if min_size is not None:
+        clauses.append(FileRecord.size_bytes >= min_size)
+    if max_size is not None:
+        clauses.append(FileRecord.size_bytes <= max_size)
+    if created_after is not None:
+        clauses.append(FileRecord.created_at >= created_after)
+    if created_before is not None:
+        clauses.append(FileRecord.created_at < created_before)
+    if name_prefix:
+        clauses.append(FileRecord.original_name.startswith(name_prefix, autoescape=True))
+    return clauses
+
+
+@router.get("/", response_model=FilePage, response_model_exclude_unset=True)
+async def list_my_files(
+    cursor: int | None = Query(None, description="next_cursor from the previous page"),
+    limit: int = Query(50, ge=1, le=500),
+    content_type: str | None = Query(None),
+    min_size: int | None = Query(None, ge=0),
+    max_size: int | None = Query(None, ge=0),
+    created_after: datetime | None = Query(None),
+    created_before: datetime | None = Query(None),
+    name_prefix: str | None = Query(None),
+    fields: str | None = Query(None, description="comma separated, e.g. id,original_name,size_bytes"),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: CurrentUser = Depends(get_current_active_user),
+):
+    names = _parse_fields(fields)
+    columns = [FileRecord.id] + [getattr(FileRecord, n) for n in names if n != "id"]
+
+    query = select(*columns).where(
+        FileRecord.owner_id == current_user.id,
+        *_filter_clauses(content_type, min_size, max_size, created_after, created_before, name_prefix),
+    )
+    if cursor is not None:
+        query = query.where(FileRecord.id < cursor)
+
+    # one extra row tells us whether there is a next page
+    rows = (await db.execute(query.order_by(FileRecord.id.desc()).limit(limit + 1))).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    return FilePage(
+        items=[FileListItem(**{n: row._mapping[n] for n in names}) for row in rows],
+        next_cursor=rows[-1].id if has_more else None,
     )
-    db.add(rec)
-    db.commit()
-    db.refresh(rec)
-    return rec
 
 
-@router.get("/", response_model=list[FileOut])
-def list_my_files(
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user),
+# --------- Search ---------
+# declared before /{file_id} so "search" is not taken for a file id
+@router.get("/search", response_model=SearchPage)
+async def search_files(
+    q: str = Query(..., min_length=1, max_length=500),
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0, le=1000),
+    owner_id: int | None = Query(None, description="admins only; defaults to the caller"),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: CurrentUser = Depends(get_current_active_user),
 ):
-    return (
-        db.query(FileRecord)
-        .filter(FileRecord.owner_id == current_user.id)
-        .order_by(FileRecord.id.desc())
-        .all()
+    if owner_id is not None and owner_id != current_user.id and current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="Not allowed")
+
+    # one extra hit tells us whether there is a next page
+    hits = await lexical_search(db, q, owner_id or current_user.id, limit + 1, offset)
+    has_more = len(hits) > limit
+    hits = hits[:limit]
+
+    records = {}
+    if hits:
+        rows = await db.execute(select(FileRecord).where(FileRecord.id.in_([hit.file_id for hit in hits])))
+        records = {rec.id: rec for rec in rows.scalars()}
+
+    return SearchPage(
+        query=q,
+        items=[
+            SearchHit(
+                file=FileSummary.model_validate(records[hit.file_id]),
+                score=hit.score,
+                name_highlight=hit.name_highlight,
+                chunk_seq=hit.chunk_seq,
+                snippet=hit.snippet,
+            )
+            for hit in hits
+            if hit.file_id in records
+        ],
+        next_offset=offset + limit if has_more else None,
+    )
+
+
+@router.post("/retrieve", response_model=RetrieveResult)
+async def retrieve_passages(
+    payload: RetrieveRequest,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: CurrentUser = Depends(get_current_active_user),
+):
+    """Hybrid (full-text + vector) retrieval for RAG callers: top-k passages,
+    one per file, with file metadata and per-stage timings."""
+    if payload.owner_id is not None and payload.owner_id != current_user.id and current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="Not allowed")
+
+    result = await hybrid_search(
+        db, payload.query, payload.owner_id or current_user.id, payload.k, payload.candidates
+    )
+    return RetrieveResult(
+        query=payload.query,
+        items=[
+            Passage(
+                file=FileSummary.model_validate(p.file),
+                score=p.score,
+                chunk_seq=p.chunk.seq if p.chunk else None,
+                char_start=p.chunk.char_start if p.chunk else None,
+                char_end=p.chunk.char_end if p.chunk else None,
+                text=p.chunk.text if p.chunk else None,
+                snippet=p.snippet,
+                lexical_rank=p.lexical_rank,
+                vector_rank=p.vector_rank,
+                vector_score=p.vector_score,
+            )
+            for p in result.passages
+        ],
+        retrievers=result.retrievers,
+        timings_ms=result.timings_ms,
     )
 
 
 @router.get("/{file_id}", response_model=FileOut)
-def get_file_meta(
+async def get_file_meta(
     file_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: CurrentUser = Depends(get_current_active_user),
 ):
-    rec = _get_file_or_404(db, file_id)
+    rec = await _get_file_or_404(db, file_id)
     _assert_owner_or_admin(rec, current_user)
     return rec
 
 
-@router.get("/{file_id}/download")
-def download_file(
+# --------- Ingestion (text extraction + chunking) ---------
+@router.get("/{file_id}/ingestion", response_model=IngestionJobOut)
+async def get_ingestion_status(
     file_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: CurrentUser = Depends(get_current_active_user),
 ):
-    rec = _get_file_or_404(db, file_id)
+    rec = await _get_file_or_404(db, file_id)
     _assert_owner_or_admin(rec, current_user)
 
-    path = rec.storage_path
-    if not path or not os.path.exists(path):
-        raise HTTPException(status_code=404, detail="File missing on disk")
+    job = (
+        await db.execute(
+            select(IngestionJob).where(IngestionJob.file_id == file_id).order_by(IngestionJob.id.desc()).limit(1)
+        )
+    ).scalars().first()
+    if not job:
+        raise HTTPException(status_code=404, detail="File has not been queued for ingestion")
+    return job
 
-    return FileResponse(
-        path=path,
-        filename=rec.original_name,
-        media_type=rec.content_type or "application/octet-stream",
-    )
 
+@router.post("/{file_id}/ingestion", response_model=IngestionJobOut, status_code=status.HTTP_202_ACCEPTED)
+async def requeue_ingestion(
+    file_id: int,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: CurrentUser = Depends(get_current_active_user),
+):
+    rec = await _get_file_or_404(db, file_id)
+    _assert_owner_or_admin(rec, current_user)
 
-@router.delete("/{file_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_file(
+    job = IngestionJob(file_id=file_id, status="queued", chunk_count=0)
+    db.add(job)
+    await db.commit()
+    await db.refresh(job)
+    wake_ingestion()
+    return job
+
+
+@router.get("/{file_id}/chunks", response_model=ChunkPage)
+async def list_file_chunks(
     file_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user),
+    cursor: int | None = Query(None, description="next_cursor from the previous page"),
+    limit: int = Query(50, ge=1, le=500),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: CurrentUser = Depends(get_current_active_user),
 ):
-    rec = _get_file_or_404(db, file_id)
+    rec = await _get_file_or_404(db, file_id)
     _assert_owner_or_admin(rec, current_user)
 
+    query = select(FileChunk).where(FileChunk.file_id == file_id)
+    if cursor is not None:
+        query = query.where(FileChunk.seq > cursor)
+    chunks = (await db.execute(query.order_by(FileChunk.seq).limit(limit + 1))).scalars().all()
+    has_more = len(chunks) > limit
+    chunks = chunks[:limit]
+
+    return ChunkPage(
+        items=[FileChunkOut.model_validate(c) for c in chunks],
+        next_cursor=chunks[-1].seq if has_more else None,
+    )
+
+
+# --------- Conditional download ---------
+def _etag(rec: FileRecord, encoding: str | None = None) -> str | None:
+    # stored bytes never change under a record, so the content hash is a strong validator;
+    # the encoded representation of a compressed file needs a tag of its own
+    if not rec.sha256:
+        return None
+    return f'"{rec.sha256}-{encoding}"' if encoding else f'"{rec.sha256}"'
+
+
+def _last_modified(rec: FileRecord) -> datetime:
+    created = rec.created_at
+    if created.tzinfo is None:  # SQLite hands back naive UTC
+        created = created.replace(tzinfo=timezone.utc)
+    return created.replace(microsecond=0)
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    if if_none_match.strip() == "*":
+        return True
+    # If-None-Match uses weak comparison (RFC 9110 13.1.2)
+    candidates = (tag.strip() for tag in if_none_match.split(","))
+    return any(tag.removeprefix("W/") == etag for tag in candidates)
+
+
+def _not_modified(request: Request, etag: str | None, last_modified: datetime) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        # when both are sent, If-Modified-Since is ignored
+        return etag is not None and _etag_matches(if_none_match, etag)
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        if since.tzinfo is None:
+            since = since.replace(tzinfo=timezone.utc)
+        return last_modified <= since
+    return False
 
+
+def _content_disposition(filename: str) -> str:
+    # same header FileResponse builds
+    quoted = quote(filename)
+    if quoted != filename:
+        return f"attachment; filename*=utf-8''{quoted}"
+    return f'attachment; filename="{filename}"'
+
+
+async def _stream_stored(path: str, codec: str | None = None, start: int = 0, end: int | None = None):
+    reader = await run_io(open_stored, path, codec, start, end)
     try:
-        if rec.storage_path and os.path.exists(rec.storage_path):
-            os.remove(rec.storage_path)
-    except Exception:
-        pass
+        while block := await run_io(reader.read, CHUNK_SIZE):
+            yield block
+    finally:
+        await run_io(reader.close)
+
+
+async def _stream_parts(path: str, parts: list[tuple[bytes, int, int]], closing: bytes):
+    for head, start, end in parts:
+        yield head
+        async for block in _stream_stored(path, None, start, end):
+            yield block
+        yield b"\r\n"
+    yield closing
+
+
+_BYTE_RANGE = re.compile(r"(\d*)-(\d*)")
+
+
+def _requested_ranges(request: Request, size: int, validators: dict) -> list[tuple[int, int]] | None:
+    """The byte ranges asked for (inclusive), sorted with overlaps merged.
+
+    A malformed header or a stale If-Range get the whole file (None); 416
+    when none of the ranges overlaps the file.
+    """
+    header = request.headers.get("range")
+    if not header:
+        return None
+    if_range = request.headers.get("if-range")
+    if if_range is not None and if_range not in (validators.get("ETag"), validators["Last-Modified"]):
+        return None
+    unit, _, spec = header.partition("=")
+    if unit.strip().lower() != "bytes":
+        return None
+
+    ranges = []
+    for part in spec.split(","):
+        match = _BYTE_RANGE.fullmatch(part.strip())
+        if not match or match.groups() == ("", ""):
+            return None
+        first, last = match.groups()
+        if first:
+            start, end = int(first), min(int(last), size - 1) if last else size - 1
+        else:  # suffix range: the last N bytes
+            start, end = max(size - int(last), 0), size - 1
+        if start < size and start <= end:
+            ranges.append((start, end))
+    if not ranges:
+        raise HTTPException(
+            status_code=status.HTTP_416_RANGE_NOT_SATISFIABLE,
+            headers={"Content-Range": f"bytes */{size}"},
+        )
+
+    ranges.sort()
+    merged = [ranges[0]]
+    for start, end in ranges[1:]:
+        if start <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def _ranged_response(
+    path: str, ranges: list[tuple[int, int]], size: int, media_type: str, headers: dict
+) -> StreamingResponse:
+    """206 with one range as is, several as a multipart/byteranges body."""
+    if len(ranges) == 1:
+        start, end = ranges[0]
+        return StreamingResponse(
+            _stream_stored(path, None, start, end),
+            status_code=status.HTTP_206_PARTIAL_CONTENT,
+            media_type=media_type,
+            headers={**headers, "Content-Length": str(end - start + 1), "Content-Range": f"bytes {start}-{end}/{size}"},
+        )
+
+    boundary = uuid.uuid4().hex
+    parts = [
+        (
+            f"--{boundary}\r\nContent-Type: {media_type}\r\n"
+            f"Content-Range: bytes {start}-{end}/{size}\r\n\r\n".encode("latin-1"),
+            start,
+            end,
+        )
+        for start, end in ranges
+    ]
+    closing = f"--{boundary}--\r\n".encode("latin-1")
+    length = sum(len(head) + end - start + 1 + 2 for head, start, end in parts) + len(closing)
+    return StreamingResponse(
+        _stream_parts(path, parts, closing),
+        status_code=status.HTTP_206_PARTIAL_CONTENT,
+        media_type=f"multipart/byteranges; boundary={boundary}",
+        headers={**headers, "Content-Length": str(length)},
+    )
+
+
+@router.get("/{file_id}/download")
+async def download_file(
+    file_id: int,
+    request: Request,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: CurrentUser = Depends(get_current_active_user),
+):
+    rec = await _get_file_or_404(db, file_id)
+    _assert_owner_or_admin(rec, current_user)
+
+    # whole local files go out through FileResponse; ranges and other backends are streamed
+    path = rec.storage_path
+    local_path = get_backend().local_path(path) if path else None
+    if local_path:
+        try:
+            stat_result = await run_io(os.stat, local_path)
+        except FileNotFoundError:
+            stat_result = None
+    else:
+        stat_result = await run_io(get_backend().stat, path) if path else None
+    if stat_result is None:
+        raise HTTPException(status_code=404, detail="File missing from storage")
+
+    # Compressed files go out as stored when the client takes the codec as a
+    # Content-Encoding, and are decompressed on the fly otherwise.
+    encoding = None
+    if rec.codec:
+        token = HTTP_ENCODINGS[rec.codec]
+        if accepts_encoding(request.headers.get("accept-encoding"), token):
+            encoding = token
+
+    etag = _etag(rec, encoding)
+    last_modified = _last_modified(rec)
+    validators = {
+        "Last-Modified": format_datetime(last_modified, usegmt=True),
+        "Cache-Control": "private, no-cache",
+    }
+    if etag:
+        validators["ETag"] = etag
+    if rec.codec:
+        validators["Vary"] = "Accept-Encoding"
+
+    if _not_modified(request, etag, last_modified):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=validators)
+
+    media_type = rec.content_type or "application/octet-stream"
+    if rec.codec and encoding is None:
+        # no Range support here: offsets would need a decompress-and-skip
+        return StreamingResponse(
+            _stream_stored(path, rec.codec),
+            media_type=media_type,
+            headers={
+                **validators,
+                "Content-Length": str(rec.size_bytes),
+                "Content-Disposition": _content_disposition(rec.original_name),
+                "Accept-Ranges": "none",
+            },
+        )
+    if encoding:
+        validators["Content-Encoding"] = encoding
+
+    size = stat_result.st_size if local_path else stat_result.size
+    ranges = _requested_ranges(request, size, validators)
+    if encoding and ranges and len(ranges) > 1:
+        # one Content-Encoding can't describe the parts of a multipart body
+        ranges = None
+    headers = {**validators, "Content-Disposition": _content_disposition(rec.original_name), "Accept-Ranges": "bytes"}
+    if ranges:
+        return _ranged_response(path, ranges, size, media_type, headers)
+
+    if local_path and "range" not in request.headers:
+        # FileResponse keeps these over its mtime-based defaults and hands the
+        # file to the server via http.response.pathsend when offered. It only
+        # ever gets whole files: Range is answered above, not by Starlette.
+        return FileResponse(
+            path=local_path,
+            filename=rec.original_name,
+            media_type=media_type,
+            headers=validators,
+            stat_result=stat_result,
+        )
+    return StreamingResponse(_stream_stored(path), media_type=media_type, headers={**headers, "Content-Length": str(size)})
+
+
+@router.delete("/{file_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def delete_file(
+    file_id: int,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: CurrentUser = Depends(get_current_active_user),
+):
+    rec = await _get_file_or_404(db, file_id)
+    _assert_owner_or_admin(rec, current_user)
 
-    db.delete(rec)
-    db.commit()
-    return None
\ No newline at end of file
+    await delete_files(db, FileRecord.id == rec.id)
+    await db.commit()
+    wake_reclaimer()
+    await run_io(drop_vectors, [rec.id])
+    return None
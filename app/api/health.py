@@ -1,9 +1,67 @@
 from fastapi import APIRouter, Depends
+from sqlalchemy import func, select
 from sqlalchemy.orm import session, Session
-from app.db.database import get_db
+from app.db.database import get_db, pool_stats
+from app.core.deps import require_admin
+from app.core.security import hashing_stats
+from app.services.reclaimer import reclaim_stats
+from app.services.ingestion import ingestion_stats
+from app.services.compression import STORAGE_COMPRESSION
+from app.models.file import FileRecord
 
 router = APIRouter(prefix="/health", tags=["Health"])
 
+# Only the liveness probe is public; the rest shows internals (and
+# /storage totals across every user), so it is for admins.
+admin_only = [Depends(require_admin)]
+
+
 @router.get("/")
 def health(db: Session = Depends(get_db)):
-    return {"status": "ok"}
\ No newline at end of file
+    return {"status": "ok"}
+
+
+@router.get("/hashing", dependencies=admin_only)
+def hashing():
+    return hashing_stats()
+
+
+
+@router.get("/db", dependencies=admin_only)
+def db_pool():
+    return pool_stats()
+
+
+
+@router.get("/reclaim", dependencies=admin_only)
+def reclaim():
+    return reclaim_stats()
+
+
+@router.get("/ingestion", dependencies=admin_only)
+def ingestion():
+    return ingestion_stats()
+
+
+@router.get("/storage", dependencies=admin_only)
+def storage(db: Session = Depends(get_db)):
+    # per FileRecord, so CAS-shared bytes count once per file referencing them
+    stored = func.coalesce(FileRecord.stored_size, FileRecord.size_bytes)
+    rows = db.execute(
+        select(FileRecord.codec, func.count(), func.sum(FileRecord.size_bytes), func.sum(stored))
+        .group_by(FileRecord.codec)
+    ).all()
+
+    codecs = {}
+    for codec, files, original, on_disk in rows:
+        codecs[codec or "none"] = {"files": files, "original_bytes": original or 0, "stored_bytes": on_disk or 0}
+    original = sum(c["original_bytes"] for c in codecs.values())
+    on_disk = sum(c["stored_bytes"] for c in codecs.values())
+    return {
+        "compression": STORAGE_COMPRESSION,
+        "original_bytes": original,
+        "stored_bytes": on_disk,
+        "saved_bytes": original - on_disk,
+        "ratio": round(on_disk / original, 4) if original else None,
+        "codecs": codecs,
+    }
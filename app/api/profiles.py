@@ -0,0 +1,42 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import FileResponse, PlainTextResponse
+
+from app.core.deps import require_admin
+from app.core.profiling import list_profiles, merged_profile, profile_path
+from app.core.user_cache import CurrentUser
+from app.schemas.profile import ProfileOut
+from app.services.storage import run_io
+
+router = APIRouter(prefix="/profiles", tags=["Profiling"])
+
+
+@router.get("/", response_model=list[ProfileOut])
+async def recent_profiles(
+    route: str | None = Query(None, description="Route template, e.g. /files/{file_id}"),
+    method: str | None = None,
+    limit: int = Query(50, ge=1, le=500),
+    _admin: CurrentUser = Depends(require_admin),
+):
+    return await run_io(list_profiles, route, method, limit)
+
+
+@router.get("/merged", response_class=PlainTextResponse)
+async def merged_profiles(
+    route: str,
+    method: str | None = None,
+    limit: int = Query(100, ge=1, le=500),
+    _admin: CurrentUser = Depends(require_admin),
+):
+    """Collapsed stacks of the newest profiles of one route, summed."""
+    folded = await run_io(merged_profile, route, method, limit)
+    if not folded:
+        raise HTTPException(status_code=404, detail="No profiles for this route")
+    return PlainTextResponse(folded)
+
+
+@router.get("/{profile_id}")
+async def download_profile(profile_id: str, _admin: CurrentUser = Depends(require_admin)):
+    path = await run_io(profile_path, profile_id)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return FileResponse(path, media_type="text/plain", filename=f"{profile_id}.folded")
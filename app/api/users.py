@@ -1,12 +1,19 @@
-from sqlalchemy.orm import Session
+from sqlalchemy import delete, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi import Depends, APIRouter, HTTPException, status, Query
 from pydantic import BaseModel, Field, EmailStr
 
-from app.db.database import get_db
+from app.db.database import get_async_db
 from app.models.user import User
+from app.models.file import FileRecord
+from app.models.upload_session import UploadSession
 from app.schemas.user import UserOut
-from app.core.security import hash_password
+from app.core.security import hash_password_async
 from app.core.deps import get_current_active_user, require_admin
+from app.core.user_cache import CurrentUser, invalidate_user
+from app.services.ingestion import drop_vectors
+from app.services.reclaimer import delete_files, enqueue_reclaim, wake_reclaimer
+from app.services.storage import run_io
 
 router = APIRouter(prefix="/users", tags=["users"])
 
@@ -19,20 +26,20 @@ class UserCreate(BaseModel):
 
 
 # --------- Helpers ---------
-def _ensure_unique_email(db: Session, email: str, exclude_user_id: int | None = None):
-    existing = db.query(User).filter(User.email == email).first()
+async def _ensure_unique_email(db: AsyncSession, email: str, exclude_user_id: int | None = None):
+    existing = (await db.execute(select(User).where(User.email == email))).scalars().first()
     if existing and (exclude_user_id is None or existing.id != exclude_user_id):
         raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Email already exists")
 
 
-def _ensure_unique_username(db: Session, username: str, exclude_user_id: int | None = None):
-    existing = db.query(User).filter(User.username == username).first()
+async def _ensure_unique_username(db: AsyncSession, username: str, exclude_user_id: int | None = None):
+    existing = (await db.execute(select(User).where(User.username == username))).scalars().first()
     if existing and (exclude_user_id is None or existing.id != exclude_user_id):
         raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Username already exists")
 
 
-def _get_user_or_404(db: Session, user_id: int) -> User:
-    user = db.query(User).filter(User.id == user_id).first()
+async def _get_user_or_404(db: AsyncSession, user_id: int) -> User:
+    user = await db.get(User, user_id)
     if not user:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
     return user
@@ -40,17 +47,20 @@ def _get_user_or_404(db: Session, user_id: int) -> User:
 
 # --------- Me endpoints (Any logged-in user) ---------
 @router.get("/me", response_model=UserOut)
-def get_me(current_user: User = Depends(get_current_active_user)):
-    return current_user
+async def get_me(
+    db: AsyncSession = Depends(get_async_db),
+    current_user: CurrentUser = Depends(get_current_active_user),
+):
+    return await _get_user_or_404(db, current_user.id)
 
 
 @router.put("/me", response_model=UserOut)
-def update_me(
+async def update_me(
     email: EmailStr | None = Query(None),
     username: str | None = Query(None),
     password: str | None = Query(None),
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_async_db),
+    identity: CurrentUser = Depends(get_current_active_user),
 ):
     if email is None and username is None and password is None:
         raise HTTPException(
@@ -58,95 +68,102 @@ def update_me(
             detail="At least one field must be provided for update",
         )
 
+    current_user = await _get_user_or_404(db, identity.id)
+
     if email is not None:
-        _ensure_unique_email(db, str(email), exclude_user_id=current_user.id)
+        await _ensure_unique_email(db, str(email), exclude_user_id=current_user.id)
         current_user.email = str(email)
 
     if username is not None:
-        _ensure_unique_username(db, username, exclude_user_id=current_user.id)
+        await _ensure_unique_username(db, username, exclude_user_id=current_user.id)
         current_user.username = username
 
     if password is not None:
         # NOTE: password validation is best in schema, but since this is query-based:
         if len(password) < 6:
             raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail="Password too short")
-        current_user.hashed_password = hash_password(password)
+        current_user.hashed_password = await hash_password_async(password)
 
-    db.commit()
-    db.refresh(current_user)
+    await db.commit()
+    invalidate_user(current_user.id)
+    await db.refresh(current_user)
     return current_user
 
 
 # --------- Admin endpoints (Admin only) ---------
 @router.post("/", response_model=UserOut)
-def create_user(
+async def create_user(
     payload: UserCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
-    _ensure_unique_email(db, str(payload.email))
-    _ensure_unique_username(db, payload.username)
+    await _ensure_unique_email(db, str(payload.email))
+    await _ensure_unique_username(db, payload.username)
 
     new_user = User(
         email=str(payload.email),
         username=payload.username,
-        hashed_password=hash_password(payload.password),
+        hashed_password=await hash_password_async(payload.password),
         is_active=True,
     )
 
     db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
+    await db.commit()
+    await db.refresh(new_user)
     return new_user
 
 
 @router.get("/", response_model=list[UserOut])
-def list_users(
-    db: Session = Depends(get_db),
-    _admin: User = Depends(require_admin),
+async def list_users(
+    db: AsyncSession = Depends(get_async_db),
+    _admin: CurrentUser = Depends(require_admin),
 ):
-    return db.query(User).all()
+    return (await db.execute(select(User))).scalars().all()
 
 
 @router.get("/{user_id}", response_model=UserOut)
-def get_user(
+async def get_user(
     user_id: int,
-    db: Session = Depends(get_db),
-    _admin: User = Depends(require_admin),
+    db: AsyncSession = Depends(get_async_db),
+    _admin: CurrentUser = Depends(require_admin),
 ):
-    return _get_user_or_404(db, user_id)
+    return await _get_user_or_404(db, user_id)
 
 
 @router.put("/{user_id}", response_model=UserOut)
-def update_user_admin(
+async def update_user_admin(
     user_id: int,
     email: EmailStr | None = Query(None),
     username: str | None = Query(None),
     password: str | None = Query(None),
     is_active: bool | None = Query(None),
     role: str | None = Query(None),
-    db: Session = Depends(get_db),
-    _admin: User = Depends(require_admin),
+    storage_quota_bytes: int | None = Query(None, ge=-1, description="-1 resets to the server default"),
+    db: AsyncSession = Depends(get_async_db),
+    _admin: CurrentUser = Depends(require_admin),
 ):
-    user = _get_user_or_404(db, user_id)
+    user = await _get_user_or_404(db, user_id)
 
-    if email is None and username is None and password is None and is_active is None and role is None:
+    if (
+        email is None and username is None and password is None and is_active is None and role is None
+        and storage_quota_bytes is None
+    ):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="At least one field must be provided for update",
         )
 
     if email is not None:
-        _ensure_unique_email(db, str(email), exclude_user_id=user.id)
+        await _ensure_unique_email(db, str(email), exclude_user_id=user.id)
         user.email = str(email)
 
     if username is not None:
-        _ensure_unique_username(db, username, exclude_user_id=user.id)
+        await _ensure_unique_username(db, username, exclude_user_id=user.id)
         user.username = username
 
     if password is not None:
         if len(password) < 6:
             raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail="Password too short")
-        user.hashed_password = hash_password(password)
+        user.hashed_password = await hash_password_async(password)
 
     if is_active is not None:
         user.is_active = is_active
@@ -160,18 +177,34 @@ def update_user_admin(
             )
         user.role = role
 
-    db.commit()
-    db.refresh(user)
+    if storage_quota_bytes is not None:
+        user.storage_quota_bytes = None if storage_quota_bytes == -1 else storage_quota_bytes
+
+    await db.commit()
+    invalidate_user(user.id)
+    await db.refresh(user)
     return user
 
 
 @router.delete("/{user_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_user(
+async def delete_user(
     user_id: int,
-    db: Session = Depends(get_db),
-    _admin: User = Depends(require_admin),
+    db: AsyncSession = Depends(get_async_db),
+    _admin: CurrentUser = Depends(require_admin),
 ):
-    user = _get_user_or_404(db, user_id)
-    db.delete(user)
-    db.commit()
+    user = await _get_user_or_404(db, user_id)
+
+    # the user's files and unfinished uploads go with them; disk cleanup is
+    # left to the reclaimer so this stays quick for large accounts
+    deleted = await delete_files(db, FileRecord.owner_id == user_id)
+    staged = await db.execute(
+        delete(UploadSession).where(UploadSession.owner_id == user_id).returning(UploadSession.staging_path)
+    )
+    await enqueue_reclaim(db, [(None, path) for path in staged.scalars()])
+
+    await db.delete(user)
+    await db.commit()
+    invalidate_user(user_id)
+    wake_reclaimer()
+    await run_io(drop_vectors, deleted)
     return
\ No newline at end of file
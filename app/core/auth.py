@@ -1,27 +1,57 @@
+import hashlib
+import time
 from datetime import datetime, timedelta, timezone
-from jose import jwt
-from sqlalchemy.orm import Session
-from app.core.config import SECRET_KEY, ALGORITHMS, ACCESS_TOKEN_EXPIRE_MINUTES
-from app.core.security import verify_password
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.cache import TTLCache
+from app.core.config import (
+    SECRET_KEY,
+    ALGORITHMS,
+    ACCESS_TOKEN_EXPIRE_MINUTES,
+    JWT_BACKEND,
+    TOKEN_CACHE_TTL_SECONDS,
+    TOKEN_CACHE_MAX_ENTRIES,
+)
+from app.core.jwt_backend import get_backend
+from app.core.security import verify_and_update_password
 from app.models.user import User
 
+_jwt = get_backend(JWT_BACKEND)
+
+# sha256(token) -> verified claims; entries never outlive the token's exp
+_token_cache: TTLCache[bytes, dict] = TTLCache(TOKEN_CACHE_MAX_ENTRIES, TOKEN_CACHE_TTL_SECONDS)
+
 
 def create_access_token(user_id: int, role: str) -> str:
     expires = datetime.now(timezone.utc) + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     payload = {"sub": str(user_id), "role": role, "exp": expires}
-    return jwt.encode(payload, SECRET_KEY, algorithm=ALGORITHMS)
+    return _jwt.encode(payload, SECRET_KEY, algorithm=ALGORITHMS)
 
-def authenticate_user(username: str, password: str, db: Session) -> User | None:
-    user = db.query(User).filter(User.username == username).first()
+async def authenticate_user(username: str, password: str, db: AsyncSession) -> User | None:
+    result = await db.execute(select(User).where(User.username == username))
+    user = result.scalars().first()
     if not user:
         return None
     if not user.is_active:
         return None
-    if not verify_password(password, user.hashed_password):
+
+    ok, new_hash = await verify_and_update_password(password, user.hashed_password)
+    if not ok:
         return None
 
+    if new_hash:
+        # pwd_context parameters changed since this hash was made
+        user.hashed_password = new_hash
+        await db.commit()
+
     return user
 
 
 def decode_token(token: str) -> dict:
-    return jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHMS])
\ No newline at end of file
+    key = hashlib.sha256(token.encode()).digest()
+    claims = _token_cache.get(key)
+    if claims is None:
+        claims = _jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHMS])
+        exp = claims.get("exp")
+        _token_cache.set(key, claims, ttl=exp - time.time() if isinstance(exp, (int, float)) else None)
+    return dict(claims)
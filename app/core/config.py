@@ -1,11 +1,58 @@
 import os
-from dotenv import load_dotenv
 
-load_dotenv()  # loads .env from project root
+# .env from project root; python-dotenv is only imported when there is one
+_ENV_FILE = os.getenv("ENV_FILE", os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), ".env"))
+if os.path.isfile(_ENV_FILE):
+    from dotenv import load_dotenv
+
+    load_dotenv(_ENV_FILE)
 
 SECRET_KEY = os.getenv("SECRET_KEY")
 ALGORITHMS = os.getenv("ALGORITHM", "HS256")
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "60"))
 
+DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./app.db")
+
+# QueuePool sizing, per worker process
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_STATEMENT_TIMEOUT_MS = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "30000"))  # postgres only
+
+# SQLite pragmas applied to every new connection
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+
+# identity cache used by get_current_user (0 disables it)
+USER_CACHE_TTL_SECONDS = float(os.getenv("USER_CACHE_TTL_SECONDS", "30"))
+USER_CACHE_MAX_ENTRIES = int(os.getenv("USER_CACHE_MAX_ENTRIES", "10000"))
+# Invalidations are announced to the other workers through this file (its
+# inode changes); point it at a path every worker on the host shares.
+# Empty disables it and other workers catch up within the TTL.
+USER_CACHE_SYNC_FILE = os.getenv("USER_CACHE_SYNC_FILE", "storage/user_cache.generation")
+
+# "jose" (default) or "hmac" (stdlib fast path, HS* only)
+JWT_BACKEND = os.getenv("JWT_BACKEND", "jose")
+
+# verified claims cache used by decode_token (0 disables it)
+TOKEN_CACHE_TTL_SECONDS = float(os.getenv("TOKEN_CACHE_TTL_SECONDS", "300"))
+TOKEN_CACHE_MAX_ENTRIES = int(os.getenv("TOKEN_CACHE_MAX_ENTRIES", "10000"))
+
+# Argon2 runs on its own pool so a login burst can't starve the threadpool.
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+PASSWORD_HASH_MAX_QUEUE = int(os.getenv("PASSWORD_HASH_MAX_QUEUE", "64"))
+
+# Optional Argon2 cost overrides; existing hashes are upgraded on next login.
+ARGON2_TIME_COST = os.getenv("ARGON2_TIME_COST")
+ARGON2_MEMORY_COST = os.getenv("ARGON2_MEMORY_COST")
+ARGON2_PARALLELISM = os.getenv("ARGON2_PARALLELISM")
+
+# Heavy libraries (argon2, jose, numpy) load on first use.
+# "background" (default) warms them in a thread once the app is up,
+# "blocking" does it before the first request is served, "off" skips it.
+STARTUP_WARMUP = os.getenv("STARTUP_WARMUP", "background")
+
 if not SECRET_KEY:
     raise RuntimeError("SECRET_KEY is missing. Set it in .env")
\ No newline at end of file
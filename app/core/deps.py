@@ -1,20 +1,21 @@
 # app/core/deps.py
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from jose import JWTError
-from sqlalchemy.orm import Session
+from jose.exceptions import JWTError
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.db.database import get_db
+from app.db.database import get_async_db
 from app.models.user import User
 from app.core.auth import decode_token
+from app.core.user_cache import CurrentUser, cache_generation, get_cached_user, remember_user
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
 
 
-def get_current_user(
+async def get_current_user(
     token: str = Depends(oauth2_scheme),
-    db: Session = Depends(get_db),
-) -> User:
+    db: AsyncSession = Depends(get_async_db),
+) -> CurrentUser:
     try:
         payload = decode_token(token)
         user_id_str = payload.get("sub")
@@ -32,7 +33,12 @@ def get_current_user(
             headers={"WWW-Authenticate": "Bearer"},
         )
 
-    user = db.query(User).filter(User.id == user_id).first()
+    cached = get_cached_user(user_id)
+    if cached is not None:
+        return cached
+
+    generation = cache_generation()
+    user = await db.get(User, user_id)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -40,16 +46,24 @@ def get_current_user(
             headers={"WWW-Authenticate": "Bearer"},
         )
 
-    return user
+    return remember_user(user, generation)
 
 
-def get_current_active_user(current_user: User = Depends(get_current_user)) -> User:
+async def get_current_active_user(current_user: CurrentUser = Depends(get_current_user)) -> CurrentUser:
     if not current_user.is_active:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="User is inactive")
     return current_user
 
 
-def require_admin(current_user: User = Depends(get_current_active_user)) -> User:
+async def require_admin(
+    current_user: CurrentUser = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_async_db),
+) -> CurrentUser:
     if current_user.role != "admin":
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin only")
+    # Admin routes are rare enough to confirm against the database: the cache
+    # is only shared between workers on one host.
+    user = await db.get(User, current_user.id)
+    if not user or user.role != "admin" or not user.is_active:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin only")
     return current_user
\ No newline at end of file
@@ -0,0 +1,131 @@
+from __future__ import annotations
+
+import base64
+import hashlib
+import hmac
+import json
+import time
+from calendar import timegm
+from datetime import datetime
+
+from jose.exceptions import ExpiredSignatureError, JWTClaimsError, JWTError
+
+
+def _jose_jwt():
+    # jose.jwt pulls in cryptography's key backends, a noticeable share of
+    # start-up; the exceptions above are a plain module
+    from jose import jwt
+
+    return jwt
+
+
+class JoseBackend:
+    """python-jose, the reference implementation."""
+
+    name = "jose"
+
+    def encode(self, claims: dict, key: str, algorithm: str) -> str:
+        return _jose_jwt().encode(claims, key, algorithm=algorithm)
+
+    def decode(self, token: str, key: str, algorithms: list[str]) -> dict:
+        return _jose_jwt().decode(token, key, algorithms=algorithms)
+
+
+_HMAC_DIGESTS = {
+    "HS256": hashlib.sha256,
+    "HS384": hashlib.sha384,
+    "HS512": hashlib.sha512,
+}
+
+
+def _b64encode(data: bytes) -> bytes:
+    return base64.urlsafe_b64encode(data).rstrip(b"=")
+
+
+def _b64decode(data: str) -> bytes:
+    return base64.urlsafe_b64decode(data + "=" * (-len(data) % 4))
+
+
+class HMACBackend:
+    """Stdlib-only HS256/384/512 encoder/decoder.
+
+    Skips jose's generic JWS/JWK machinery; produces tokens jose can read and
+    reads jose's tokens. Raises jose's exception types so callers catching
+    JWTError keep working.
+    """
+
+    name = "hmac"
+
+    def encode(self, claims: dict, key: str, algorithm: str) -> str:
+        digest = _HMAC_DIGESTS.get(algorithm)
+        if digest is None:
+            raise JWTError(f"Algorithm {algorithm} not supported by the hmac backend")
+
+        claims = dict(claims)
+        for time_claim in ("exp", "iat", "nbf"):
+            if isinstance(claims.get(time_claim), datetime):
+                claims[time_claim] = timegm(claims[time_claim].utctimetuple())
+
+        header = {"alg": algorithm, "typ": "JWT"}
+        signing_input = b".".join(
+            _b64encode(json.dumps(part, separators=(",", ":"), sort_keys=True).encode())
+            for part in (header, claims)
+        )
+        signature = _b64encode(hmac.new(key.encode(), signing_input, digest).digest())
+        return (signing_input + b"." + signature).decode()
+
+    def decode(self, token: str, key: str, algorithms: list[str]) -> dict:
+        try:
+            header_b64, claims_b64, signature_b64 = token.split(".")
+            header = json.loads(_b64decode(header_b64))
+            signature = _b64decode(signature_b64)
+        except (ValueError, TypeError, UnicodeDecodeError):
+            raise JWTError("Invalid token")
+
+        algorithm = header.get("alg") if isinstance(header, dict) else None
+        digest = _HMAC_DIGESTS.get(algorithm)
+        if algorithm not in algorithms or digest is None:
+            raise JWTError("The specified alg value is not allowed")
+
+        signing_input = f"{header_b64}.{claims_b64}".encode()
+        expected = hmac.new(key.encode(), signing_input, digest).digest()
+        if not hmac.compare_digest(expected, signature):
+            raise JWTError("Signature verification failed.")
+
+        try:
+            claims = json.loads(_b64decode(claims_b64))
+        except (ValueError, UnicodeDecodeError):
+            raise JWTError("Invalid payload string")
+        if not isinstance(claims, dict):
+            raise JWTError("Invalid payload string: must be a json object")
+
+        _validate_claims(claims)
+        return claims
+
+
+def _validate_claims(claims: dict) -> None:
+    # same defaults jose.jwt.decode applies when no audience/issuer is given
+    now = timegm(time.gmtime())
+
+    for name in ("iat", "nbf", "exp"):
+        if name in claims and not isinstance(claims[name], (int, float)):
+            raise JWTClaimsError(f"{name} claim must be an integer.")
+
+    if "nbf" in claims and claims["nbf"] > now:
+        raise JWTClaimsError("The token is not yet valid (nbf)")
+    if "exp" in claims and claims["exp"] < now:
+        raise ExpiredSignatureError("Signature has expired.")
+    if "aud" in claims:
+        raise JWTClaimsError("Invalid audience")
+    if "sub" in claims and not isinstance(claims["sub"], str):
+        raise JWTClaimsError("Subject must be a string.")
+
+
+_BACKENDS = {"jose": JoseBackend, "hmac": HMACBackend}
+
+
+def get_backend(name: str):
+    try:
+        return _BACKENDS[name.lower()]()
+    except KeyError:
+        raise RuntimeError(f"Unknown JWT_BACKEND {name!r}; expected one of {sorted(_BACKENDS)}")
@@ -0,0 +1,354 @@
+"""Prometheus-style metrics, served in the text exposition format at /metrics.
+
+Counters, gauges and histograms live in plain dicts in each process; the hot
+path is one uncontended lock and a dict update. Modules define their metrics
+at import time next to the code they measure, and register collectors for
+values that are cheaper to read at scrape time (pool occupancy and the like).
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import threading
+import time
+import uuid
+from bisect import bisect_left
+from pathlib import Path
+from typing import Callable, Optional
+
+import anyio.to_thread
+
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1").lower() not in ("0", "false", "off")
+
+# Each worker process (uvicorn --workers, gunicorn) counts on its own. With
+# METRICS_DIR set to a directory shared by the workers of one deployment,
+# every worker writes a snapshot there each METRICS_FLUSH_SECONDS and
+# /metrics adds them all up, whichever worker answers. Counters and
+# histograms of exited workers keep counting towards the totals; their
+# gauges are dropped once the snapshot is stale. Empty the directory on
+# deploy. Unset: /metrics covers the answering process only.
+METRICS_DIR = os.getenv("METRICS_DIR")
+METRICS_FLUSH_SECONDS = float(os.getenv("METRICS_FLUSH_SECONDS", "5"))
+
+# transfers smaller than this say nothing useful about throughput
+METRICS_THROUGHPUT_MIN_BYTES = int(os.getenv("METRICS_THROUGHPUT_MIN_BYTES", str(64 * 1024)))
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+FAST_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+# 64KB/s .. 4GB/s
+THROUGHPUT_BUCKETS = tuple(float(64 * 1024 * 4**i) for i in range(9))
+
+_REGISTRY: dict[str, "_Metric"] = {}
+_COLLECTORS: list[Callable[[], None]] = []
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, doc: str, labels: tuple[str, ...] = ()):
+        if name in _REGISTRY:
+            raise ValueError(f"metric {name} is already registered")
+        self.name = name
+        self.doc = doc
+        self.labels = labels
+        self._lock = threading.Lock()
+        self._values: dict[tuple, object] = {}
+        _REGISTRY[name] = self
+
+    def _samples(self) -> list:
+        with self._lock:
+            return [[list(k), v] for k, v in self._values.items()]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def set(self, value: float, *labels: str) -> None:
+        with self._lock:
+            self._values[labels] = value
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def dec(self, *labels: str, amount: float = 1.0) -> None:
+        self.inc(*labels, amount=-amount)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, doc: str, labels: tuple[str, ...] = (), buckets: tuple = LATENCY_BUCKETS):
+        super().__init__(name, doc, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, *labels: str) -> None:
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(labels)
+            if entry is None:
+                # per-bucket counts (last one is +Inf) and the sum
+                entry = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            entry[0][i] += 1
+            entry[1] += value
+
+    def _samples(self) -> list:
+        with self._lock:
+            return [[list(k), [list(v[0]), v[1]]] for k, v in self._values.items()]
+
+
+def collector(func: Callable[[], None]) -> Callable[[], None]:
+    """Register ``func`` to update gauges right before every snapshot."""
+    _COLLECTORS.append(func)
+    return func
+
+
+def snapshot() -> dict:
+    """This process's values: {name: [[labels, value], ...]}."""
+    for func in _COLLECTORS:
+        try:
+            func()
+        except Exception:
+            pass  # e.g. no event loop to ask; the gauge keeps its last value
+    return {name: metric._samples() for name, metric in _REGISTRY.items()}
+
+
+# --------- HTTP ---------
+
+HTTP_REQUESTS = Counter("http_requests_total", "Requests answered", ("method", "route", "status"))
+HTTP_LATENCY = Histogram("http_request_duration_seconds", "Time to answer a request", ("method", "route"))
+HTTP_IN_FLIGHT = Gauge("http_requests_in_flight", "Requests being answered")
+HTTP_RECEIVED = Counter("http_request_body_bytes_total", "Request body bytes received (uploads)", ("route",))
+HTTP_SENT = Counter("http_response_body_bytes_total", "Response body bytes sent (downloads)", ("route",))
+HTTP_THROUGHPUT = Histogram(
+    "http_transfer_bytes_per_second",
+    f"Body bytes over request time, for bodies of at least {METRICS_THROUGHPUT_MIN_BYTES} bytes",
+    ("direction", "route"),
+    THROUGHPUT_BUCKETS,
+)
+
+
+def _route(scope) -> str:
+    # the path template, not the raw path, so ids don't blow up the label set
+    route = scope.get("route")
+    return getattr(route, "path", None) or "<unmatched>"
+
+
+class MetricsMiddleware:
+    """Pure ASGI, so streamed bodies are counted as they pass without buffering."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not METRICS_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status = 500  # unless the app starts a response
+        received = sent = 0
+        length = None
+
+        async def counting_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+            return message
+
+        async def counting_send(message):
+            nonlocal status, sent, length
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                length = dict(message.get("headers", ())).get(b"content-length")
+            elif message["type"] == "http.response.body":
+                sent += len(message.get("body", b""))
+            elif message["type"] == "http.response.pathsend" and length:
+                sent += int(length)  # the server sends the file itself
+            await send(message)
+
+        HTTP_IN_FLIGHT.inc()
+        try:
+            await self.app(scope, counting_receive, counting_send)
+        finally:
+            HTTP_IN_FLIGHT.dec()
+            elapsed = time.perf_counter() - start
+            method, route = scope["method"], _route(scope)
+            HTTP_REQUESTS.inc(method, route, str(status))
+            HTTP_LATENCY.observe(elapsed, method, route)
+            if received:
+                HTTP_RECEIVED.inc(route, amount=received)
+                if received >= METRICS_THROUGHPUT_MIN_BYTES:
+                    HTTP_THROUGHPUT.observe(received / elapsed, "upload", route)
+            if sent:
+                HTTP_SENT.inc(route, amount=sent)
+                if sent >= METRICS_THROUGHPUT_MIN_BYTES:
+                    HTTP_THROUGHPUT.observe(sent / elapsed, "download", route)
+
+
+# --------- Thread pools ---------
+
+THREADPOOL_WORKERS = Gauge("threadpool_workers", "Threads a pool may run", ("pool",))
+THREADPOOL_BUSY = Gauge("threadpool_busy", "Threads of a pool running a task", ("pool",))
+THREADPOOL_QUEUED = Gauge("threadpool_queued", "Tasks waiting for a free thread", ("pool",))
+
+
+def pool_gauges(pool: str, workers: int, busy: int, queued: int) -> None:
+    THREADPOOL_WORKERS.set(workers, pool)
+    THREADPOOL_BUSY.set(busy, pool)
+    THREADPOOL_QUEUED.set(queued, pool)
+
+
+@collector
+def _anyio_pool() -> None:
+    # sync endpoints and dependencies run on anyio's default limiter; needs
+    # the event loop, so /metrics and the flush loop call this from it
+    limiter = anyio.to_thread.current_default_thread_limiter()
+    pool_gauges("anyio", limiter.total_tokens, limiter.borrowed_tokens, limiter.statistics().tasks_waiting)
+
+
+# --------- Exposition ---------
+
+_INSTANCE = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+
+
+def _snapshot_path() -> Path:
+    return Path(METRICS_DIR) / f"{_INSTANCE}.json"
+
+
+def _write(values: dict) -> None:
+    target = _snapshot_path()
+    target.parent.mkdir(parents=True, exist_ok=True)
+    tmp = target.with_name(f".{target.name}.tmp")
+    tmp.write_text(json.dumps(values))
+    os.replace(tmp, target)
+
+
+def flush() -> None:
+    """Write this process's snapshot to METRICS_DIR (no-op when unset)."""
+    if METRICS_DIR:
+        _write(snapshot())
+
+
+def _merge(total: dict, values: dict, with_gauges: bool) -> None:
+    for name, samples in values.items():
+        metric = _REGISTRY.get(name)
+        if metric is None or (metric.kind == "gauge" and not with_gauges):
+            continue
+        merged = total.setdefault(name, {})
+        for labels, value in samples:
+            key = tuple(labels)
+            if metric.kind == "histogram":
+                have = merged.get(key)
+                if have is None or len(have[0]) != len(value[0]):
+                    merged[key] = value
+                else:
+                    merged[key] = [[a + b for a, b in zip(have[0], value[0])], have[1] + value[1]]
+            else:
+                merged[key] = merged.get(key, 0.0) + value
+
+
+def _gathered() -> dict:
+    total: dict[str, dict] = {}
+    _merge(total, snapshot(), with_gauges=True)
+    if not METRICS_DIR:
+        return total
+
+    own = _snapshot_path()
+    stale_before = time.time() - max(3 * METRICS_FLUSH_SECONDS, 15)
+    for path in Path(METRICS_DIR).glob("*.json"):
+        if path == own:
+            continue
+        try:
+            mtime = path.stat().st_mtime
+            values = json.loads(path.read_text())
+        except (OSError, ValueError):
+            continue  # being replaced, or removed, right now
+        _merge(total, values, with_gauges=mtime >= stale_before)
+    return total
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: tuple, values: tuple, extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(value)
+
+
+def render() -> str:
+    """All metrics, summed over the workers that share METRICS_DIR."""
+    lines = []
+    for name, values in sorted(_gathered().items()):
+        metric = _REGISTRY[name]
+        lines.append(f"# HELP {name} {metric.doc}")
+        lines.append(f"# TYPE {name} {metric.kind}")
+        for key, value in sorted(values.items()):
+            if metric.kind != "histogram":
+                lines.append(f"{name}{_labels(metric.labels, key)} {_number(value)}")
+                continue
+            counts, total = value
+            cumulative = 0
+            for bound, count in zip((*metric.buckets, "+Inf"), counts):
+                cumulative += count
+                le = 'le="%s"' % (bound if bound == "+Inf" else _number(bound))
+                lines.append(f"{name}_bucket{_labels(metric.labels, key, le)} {cumulative}")
+            lines.append(f"{name}_sum{_labels(metric.labels, key)} {_number(total)}")
+            lines.append(f"{name}_count{_labels(metric.labels, key)} {cumulative}")
+    return "\n".join(lines) + "\n"
+
+
+# --------- Flush loop ---------
+
+_loop_task: Optional[asyncio.Task] = None
+
+
+async def _run() -> None:
+    while True:
+        await asyncio.sleep(METRICS_FLUSH_SECONDS)
+        try:
+            # collect on the loop (the anyio collector needs it), write off it
+            await asyncio.to_thread(_write, snapshot())
+        except Exception:
+            pass  # shared dir unavailable; try again next round
+
+
+def start_metrics() -> None:
+    global _loop_task
+    if _loop_task is None and METRICS_DIR:
+        _loop_task = asyncio.create_task(_run())
+
+
+async def stop_metrics() -> None:
+    global _loop_task
+    if _loop_task is not None:
+        _loop_task.cancel()
+        try:
+            await _loop_task
+        except asyncio.CancelledError:
+            pass
+        _loop_task = None
+    try:
+        flush()  # the final counts of this worker
+    except OSError:
+        pass
@@ -0,0 +1,433 @@
+"""Opt-in sampling profiler for individual requests.
+
+A request is picked at random (PROFILE_SAMPLE_RATE), by route
+(PROFILE_ROUTES) or by the client sending PROFILE_HEADER, which only counts
+from admins or with PROFILE_TOKEN as its value. While it runs, one
+sampler thread records its stack every PROFILE_INTERVAL_MS:
+
+- on the event loop: the live stack of the request's task
+- suspended in an await: the chain of awaiting coroutines, ending in the
+  stack of the upload I/O worker doing its file work if there is one, so
+  the profile is wall-clock time and blocking waits show up too
+
+Each profile is written to PROFILE_DIR as collapsed stacks (one
+``frame;frame;... count`` line per distinct stack), the input of
+flamegraph.pl, speedscope and inferno, next to a small JSON summary.
+"""
+from __future__ import annotations
+
+import asyncio
+import hmac
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Optional
+
+from app.core import metrics
+
+
+# off by default; "on" lets the options below pick requests
+PROFILING = os.getenv("PROFILING", "off").lower() in ("1", "on", "true")
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+# comma separated route templates, optionally with a method: "GET /files/,/files/upload"
+PROFILE_ROUTES = [r.strip() for r in os.getenv("PROFILE_ROUTES", "").split(",") if r.strip()]
+# Requests carrying this header are profiled (empty disables) when they come
+# with an admin bearer token or the header's value is PROFILE_TOKEN; anyone
+# else could otherwise fill the disk and push real profiles past PROFILE_KEEP.
+PROFILE_HEADER = os.getenv("PROFILE_HEADER", "X-Profile").lower()
+PROFILE_TOKEN = os.getenv("PROFILE_TOKEN", "")
+
+# Overhead is bounded by the sampler, not by traffic: one thread, one tick
+# per interval, at most PROFILE_MAX_CONCURRENT requests walked per tick.
+# Requests picked while that many are being profiled run unprofiled.
+PROFILE_INTERVAL_MS = max(float(os.getenv("PROFILE_INTERVAL_MS", "5")), 1.0)
+PROFILE_MAX_CONCURRENT = int(os.getenv("PROFILE_MAX_CONCURRENT", "4"))
+PROFILE_MAX_SECONDS = float(os.getenv("PROFILE_MAX_SECONDS", "60"))  # long transfers stop sampling here
+
+PROFILE_DIR = os.getenv("PROFILE_DIR", "storage/profiles")
+PROFILE_KEEP = int(os.getenv("PROFILE_KEEP", "500"))  # newest profiles kept on disk
+
+_MAX_DEPTH = 256
+
+PROFILES = metrics.Counter("profiles_total", "Requests picked for profiling", ("outcome",))
+
+_current: ContextVar[Optional["_Profile"]] = ContextVar("profile", default=None)
+
+# the running task per event loop; reading it from the sampler thread is a
+# plain dict lookup (CPython keeps it in asyncio.tasks._current_tasks)
+_current_tasks = getattr(asyncio.tasks, "_current_tasks", None)
+
+_ROOT = str(Path(__file__).resolve().parents[2]) + os.sep
+_labels: dict = {}
+
+
+def _label(code) -> str:
+    label = _labels.get(code)
+    if label is None:
+        filename = code.co_filename
+        if "site-packages" + os.sep in filename:
+            filename = filename.rsplit("site-packages" + os.sep, 1)[1]
+        elif filename.startswith(_ROOT):
+            filename = filename[len(_ROOT):]
+        name = getattr(code, "co_qualname", code.co_name)
+        # ";" separates frames in the collapsed format
+        label = _labels[code] = f"{name} ({filename}:{code.co_firstlineno})".replace(";", ":")
+    return label
+
+
+def _thread_stack(frame) -> list:
+    """Frames from the outermost down to ``frame``."""
+    frames = []
+    while frame is not None and len(frames) < _MAX_DEPTH:
+        frames.append(frame)
+        frame = frame.f_back
+    frames.reverse()
+    return frames
+
+
+def _await_chain(coro) -> list:
+    """Frames of ``coro`` and everything it is awaiting, outermost first."""
+    frames = []
+    while coro is not None and len(frames) < _MAX_DEPTH:
+        frame = getattr(coro, "cr_frame", None) or getattr(coro, "gi_frame", None) or getattr(coro, "ag_frame", None)
+        if frame is None:
+            break  # a future, or a coroutine that just finished
+        frames.append(frame)
+        coro = getattr(coro, "cr_await", None) or getattr(coro, "gi_yieldfrom", None) or getattr(coro, "ag_await", None)
+    return frames
+
+
+class _OnThread:
+    """Marks the worker thread running ``func`` as working for ``profile``."""
+
+    def __init__(self, profile: "_Profile", func):
+        self.profile = profile
+        self.func = func
+
+    def __call__(self, *args):
+        ident = threading.get_ident()
+        self.profile.threads.add(ident)
+        try:
+            return self.func(*args)
+        finally:
+            self.profile.threads.discard(ident)
+
+
+_ON_THREAD_CODE = _OnThread.__call__.__code__
+
+
+def for_thread(func):
+    """``func`` as-is, or wrapped so its pool thread is sampled for the current profiled request."""
+    profile = _current.get()
+    return func if profile is None else _OnThread(profile, func)
+
+
+class _Profile:
+    def __init__(self, scope, reason: str, frame):
+        self.id = f"{time.time_ns() // 1_000_000}-{uuid.uuid4().hex[:8]}"
+        self.method = scope["method"]
+        self.path = scope["path"]
+        self.reason = reason
+        self.started_at = datetime.now(timezone.utc)
+        self.started = time.perf_counter()
+        self.loop = asyncio.get_running_loop()
+        self.loop_thread = threading.get_ident()
+        self.task = asyncio.current_task()
+        self.tasks = {self.task}  # plus streaming-response tasks, once they send
+        self.frame = frame  # the middleware's own frame; stacks are cut above it
+        self.threads: set = set()
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self.truncated = False
+
+    def _suspended(self) -> list:
+        chain = _await_chain(self.task.get_coro())
+        for i, frame in enumerate(chain):
+            if frame is self.frame:
+                return chain[i:]
+        return chain
+
+    def sample(self, frames: dict) -> None:
+        if time.perf_counter() - self.started > PROFILE_MAX_SECONDS:
+            self.truncated = True
+            return
+
+        running = _current_tasks.get(self.loop) if _current_tasks is not None else None
+        loop_frame = frames.get(self.loop_thread)
+        if running is not None and running in self.tasks and loop_frame is not None:
+            stack = _thread_stack(loop_frame)
+            if running is self.task:
+                try:
+                    stack = stack[stack.index(self.frame):]
+                except ValueError:
+                    # inside a greenlet (SQLAlchemy's async bridge): its stack
+                    # does not reach back to the coroutines that started it
+                    stack = self._suspended() + stack
+            else:
+                root = running.get_coro()
+                root = getattr(root, "cr_frame", None)
+                if root in stack:
+                    stack = stack[stack.index(root):]
+                stack = self._suspended() + stack
+            labels = [_label(f.f_code) for f in stack]
+        else:
+            labels = [_label(f.f_code) for f in self._suspended()]
+            worker = next(iter(self.threads), None)
+            worker_frame = frames.get(worker) if worker is not None else None
+            if worker_frame is not None:
+                stack = _thread_stack(worker_frame)
+                cut = next((i for i, f in enumerate(stack) if f.f_code is _ON_THREAD_CODE), None)
+                labels.append("<thread>")
+                labels += [_label(f.f_code) for f in stack[cut + 1 if cut is not None else 0:]]
+            else:
+                labels.append("<waiting>")
+        self.stacks[";".join(labels)] += 1
+        self.samples += 1
+
+
+class _Sampler:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._active: set = set()
+        self._wake = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def admit(self, profile: _Profile) -> bool:
+        with self._lock:
+            if len(self._active) >= PROFILE_MAX_CONCURRENT:
+                return False
+            self._active.add(profile)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+                self._thread.start()
+            self._wake.set()
+        return True
+
+    def release(self, profile: _Profile) -> None:
+        with self._lock:
+            self._active.discard(profile)
+
+    def _run(self) -> None:
+        interval = PROFILE_INTERVAL_MS / 1000
+        while True:
+            with self._lock:
+                active = list(self._active)
+                if not active:
+                    self._wake.clear()
+            if not active:
+                self._wake.wait()
+                continue
+
+            started = time.perf_counter()
+            frames = sys._current_frames()
+            for profile in active:
+                try:
+                    profile.sample(frames)
+                except Exception:
+                    pass  # a stack that changed under us; skip the tick
+            del frames
+            time.sleep(max(interval - (time.perf_counter() - started), 0))
+
+
+_sampler = _Sampler()
+
+
+def _route(scope) -> str:
+    route = scope.get("route")
+    return getattr(route, "path", None) or "<unmatched>"
+
+
+_route_matchers: Optional[list] = None
+
+
+def _matches_route(scope) -> bool:
+    # routing happens after the middleware, so match the templates up front
+    global _route_matchers
+    if _route_matchers is None:
+        wanted = {}
+        for entry in PROFILE_ROUTES:
+            method, _, path = entry.rpartition(" ")
+            wanted.setdefault(path, set()).add(method.upper())
+        _route_matchers = [
+            (route.path_regex, wanted[route.path])
+            for route in getattr(scope.get("app"), "routes", ())
+            if getattr(route, "path", None) in wanted and hasattr(route, "path_regex")
+        ]
+    return any(
+        regex.match(scope["path"]) and ("" in methods or scope["method"] in methods)
+        for regex, methods in _route_matchers
+    )
+
+
+async def _is_admin(scope) -> bool:
+    from app.core.auth import decode_token
+    from app.db.database import AsyncSessionLocal
+    from app.models.user import User
+
+    for key, value in scope["headers"]:
+        if key == b"authorization":
+            scheme, _, token = value.decode("latin-1").partition(" ")
+            if scheme.lower() != "bearer" or not token:
+                return False
+            try:
+                user_id = int(decode_token(token).get("sub"))
+            except Exception:
+                return False
+            # confirmed against the database like require_admin: the role claim
+            # and the cache can both outlive a demotion or deactivation
+            async with AsyncSessionLocal() as db:
+                user = await db.get(User, user_id)
+            return user is not None and user.role == "admin" and bool(user.is_active)
+    return False
+
+
+async def _header_allowed(scope, value: bytes) -> bool:
+    if PROFILE_TOKEN and hmac.compare_digest(value, PROFILE_TOKEN.encode()):
+        return True
+    return value not in (b"", b"0") and await _is_admin(scope)
+
+
+async def _reason(scope) -> Optional[str]:
+    if PROFILE_HEADER:
+        name = PROFILE_HEADER.encode()
+        for key, value in scope["headers"]:
+            if key == name and await _header_allowed(scope, value):
+                return "header"
+    if PROFILE_ROUTES and _matches_route(scope):
+        return "route"
+    if PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE:
+        return "sampled"
+    return None
+
+
+class ProfilingMiddleware:
+    """Profiles the requests picked by the PROFILE_* settings; adds an X-Profile-Id header to them."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not PROFILING:
+            await self.app(scope, receive, send)
+            return
+        reason = await _reason(scope)
+        if reason is None:
+            await self.app(scope, receive, send)
+            return
+
+        profile = _Profile(scope, reason, sys._getframe())
+        if not _sampler.admit(profile):
+            PROFILES.inc("busy")
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+
+        async def tagged_send(message):
+            nonlocal status
+            # streaming responses send from a task of their own
+            profile.tasks.add(asyncio.current_task())
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                message = {**message, "headers": [*message.get("headers", ()), (b"x-profile-id", profile.id.encode())]}
+            await send(message)
+
+        token = _current.set(profile)
+        try:
+            await self.app(scope, receive, tagged_send)
+        finally:
+            _current.reset(token)
+            _sampler.release(profile)
+            duration = time.perf_counter() - profile.started
+            PROFILES.inc("captured")
+            try:
+                await asyncio.to_thread(_save, profile, _route(scope), status, duration)
+            except OSError:
+                PROFILES.inc("write_failed")
+
+
+# --------- Storage ---------
+
+_PROFILE_ID = re.compile(r"^[0-9]+-[0-9a-f]{8}$")
+
+
+def _save(profile: _Profile, route: str, status: int, duration: float) -> None:
+    directory = Path(PROFILE_DIR)
+    directory.mkdir(parents=True, exist_ok=True)
+    folded = "".join(f"{stack} {count}\n" for stack, count in profile.stacks.most_common())
+    (directory / f"{profile.id}.folded").write_text(folded)
+    meta = {
+        "id": profile.id,
+        "method": profile.method,
+        "route": route,
+        "path": profile.path,
+        "status": status,
+        "reason": profile.reason,
+        "started_at": profile.started_at.isoformat(),
+        "duration_ms": round(duration * 1000, 3),
+        "samples": profile.samples,
+        "interval_ms": PROFILE_INTERVAL_MS,
+        "truncated": profile.truncated,
+    }
+    # the summary last: listings only show profiles whose stacks are complete
+    tmp = directory / f".{profile.id}.json.tmp"
+    tmp.write_text(json.dumps(meta))
+    os.replace(tmp, directory / f"{profile.id}.json")
+    _prune(directory)
+
+
+def _prune(directory: Path) -> None:
+    summaries = sorted(directory.glob("*.json"), reverse=True)  # ids start with a timestamp
+    for old in summaries[PROFILE_KEEP:]:
+        for path in (old, old.with_suffix(".folded")):
+            path.unlink(missing_ok=True)
+
+
+def list_profiles(route: Optional[str] = None, method: Optional[str] = None, limit: int = 50) -> list[dict]:
+    """Newest first."""
+    out = []
+    directory = Path(PROFILE_DIR)
+    if not directory.is_dir():
+        return out
+    for path in sorted(directory.glob("*.json"), reverse=True):
+        try:
+            meta = json.loads(path.read_text())
+        except (OSError, ValueError):
+            continue  # pruned meanwhile
+        if (route is None or meta["route"] == route) and (method is None or meta["method"] == method.upper()):
+            out.append(meta)
+            if len(out) >= limit:
+                break
+    return out
+
+
+def profile_path(profile_id: str) -> Optional[Path]:
+    if not _PROFILE_ID.match(profile_id):
+        return None
+    path = Path(PROFILE_DIR) / f"{profile_id}.folded"
+    return path if path.is_file() else None
+
+
+def merged_profile(route: str, method: Optional[str] = None, limit: int = 100) -> str:
+    """The newest ``limit`` profiles of ``route`` summed into one collapsed-stack file."""
+    total: Counter = Counter()
+    for meta in list_profiles(route, method, limit):
+        path = profile_path(meta["id"])
+        try:
+            lines = path.read_text().splitlines() if path is not None else []
+        except OSError:
+            continue  # pruned meanwhile
+        for line in lines:
+            stack, _, count = line.rpartition(" ")
+            if stack:
+                total[stack] += int(count)
+    return "".join(f"{stack} {count}\n" for stack, count in total.most_common())
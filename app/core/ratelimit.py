@@ -0,0 +1,315 @@
+"""Token-bucket rate limiting and upload bandwidth throttling.
+
+Requests are keyed by the caller: the user id from the bearer token
+(decode_token, whose claims cache get_current_user then hits) or, without a
+valid token, the client address. RATE_LIMITS holds one bucket per rule and
+caller, written like PROFILE_ROUTES plus the allowance:
+
+    RATE_LIMITS="POST /auth/login=20/60,/files/{file_id}/download=600/60"
+
+i.e. up to 20 requests at once, refilled at 20 per 60 seconds. A request over
+its allowance gets 429 with Retry-After. Independently, the request bodies of
+UPLOAD_BANDWIDTH_ROUTES are metered against a per-caller byte bucket and
+delayed (not rejected) when a caller goes over UPLOAD_BANDWIDTH_BYTES_PER_SECOND.
+
+Buckets live in this process ("memory") or in a small SQLite file shared
+by every worker on the host ("sqlite").
+"""
+from __future__ import annotations
+
+import asyncio
+import math
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import NamedTuple, Optional
+
+from fastapi.responses import JSONResponse
+
+from app.core import metrics
+from app.core.auth import decode_token
+
+# "memory" (default), "sqlite" (shared between workers) or "off"
+RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "memory").lower()
+RATE_LIMIT_DB = os.getenv("RATE_LIMIT_DB", "storage/ratelimit.sqlite3")
+# memory backend: least recently used callers are forgotten past this many
+RATE_LIMIT_MAX_KEYS = int(os.getenv("RATE_LIMIT_MAX_KEYS", "100000"))
+
+# Argon2 makes logins and sign-ups the cheapest way to burn CPU, so they are
+# limited out of the box; an empty RATE_LIMITS turns request limits off.
+RATE_LIMITS = [
+    r.strip() for r in os.getenv("RATE_LIMITS", "POST /auth/login=20/60,POST /users/=10/60").split(",") if r.strip()
+]
+
+# 0 disables throttling; the burst lets short uploads through at full speed
+UPLOAD_BANDWIDTH_BYTES_PER_SECOND = int(os.getenv("UPLOAD_BANDWIDTH_BYTES_PER_SECOND", "0"))
+UPLOAD_BANDWIDTH_BURST_BYTES = int(os.getenv("UPLOAD_BANDWIDTH_BURST_BYTES", str(8 * 1024 * 1024)))
+UPLOAD_BANDWIDTH_ROUTES = [
+    r.strip()
+    for r in os.getenv(
+        "UPLOAD_BANDWIDTH_ROUTES", "POST /files/upload,POST /files/bulk,PUT /files/uploads/{session_id}"
+    ).split(",")
+    if r.strip()
+]
+
+# body bytes charged to the bucket at a time (~4 ASGI messages)
+_SETTLE_BYTES = 256 * 1024
+
+RATE_LIMITED = metrics.Counter("rate_limited_total", "Requests refused with 429", ("rule",))
+UPLOAD_THROTTLED = metrics.Counter(
+    "upload_throttled_seconds_total", "Time uploads were held back by the bandwidth limit"
+)
+
+
+class MemoryBuckets:
+    """Buckets of this process only; each worker enforces the limits on its own."""
+
+    blocking = False
+
+    def __init__(self):
+        self._buckets: OrderedDict[str, tuple[float, float]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key: str, cost: float, capacity: float, rate: float) -> float:
+        """Take ``cost`` tokens; 0.0 on success, else the seconds until there
+        would be enough (nothing is taken then)."""
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (capacity, now))
+            tokens = min(capacity, tokens + (now - updated) * rate)
+            if tokens < cost:
+                return (cost - tokens) / rate
+            self._buckets[key] = (tokens - cost, now)
+            self._buckets.move_to_end(key)
+            while len(self._buckets) > RATE_LIMIT_MAX_KEYS:
+                self._buckets.popitem(last=False)
+        return 0.0
+
+
+class SqliteBuckets:
+    """Buckets in a SQLite file, so every worker on the host draws from the same ones.
+
+    Blocking; one short write transaction per call. Rows whose bucket has
+    refilled are pruned now and then, since a missing row reads as full.
+    """
+
+    blocking = True
+    _PRUNE_EVERY = 1000
+
+    def __init__(self, path: str = RATE_LIMIT_DB):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._db = sqlite3.connect(path, timeout=5, isolation_level=None, check_same_thread=False)
+        # losing the buckets on a crash only resets the limits
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=OFF")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS buckets ("
+            "key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL, full_at REAL NOT NULL"
+            ") WITHOUT ROWID"
+        )
+        self._lock = threading.Lock()
+        self._calls = 0
+
+    def take(self, key: str, cost: float, capacity: float, rate: float) -> float:
+        with self._lock:
+            # wall clock: the other workers' timestamps have to be comparable
+            now = time.time()
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._db.execute("SELECT tokens, updated FROM buckets WHERE key = ?", (key,)).fetchone()
+                tokens = capacity if row is None else min(capacity, row[0] + max(now - row[1], 0.0) * rate)
+                wait = 0.0 if tokens >= cost else (cost - tokens) / rate
+                if not wait:
+                    tokens -= cost
+                    self._db.execute(
+                        "INSERT INTO buckets (key, tokens, updated, full_at) VALUES (?, ?, ?, ?) "
+                        "ON CONFLICT (key) DO UPDATE SET "
+                        "tokens = excluded.tokens, updated = excluded.updated, full_at = excluded.full_at",
+                        (key, tokens, now, now + (capacity - tokens) / rate),
+                    )
+                self._calls += 1
+                if self._calls % self._PRUNE_EVERY == 0:
+                    self._db.execute("DELETE FROM buckets WHERE full_at < ?", (now,))
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+        return wait
+
+
+_BACKENDS = {"memory": MemoryBuckets, "sqlite": SqliteBuckets}
+
+_buckets = None
+_buckets_lock = threading.Lock()
+
+
+def get_buckets():
+    """The configured bucket store, created on first use (None when off)."""
+    global _buckets
+    if _buckets is not None or RATE_LIMIT_BACKEND == "off":
+        return _buckets
+    with _buckets_lock:
+        if _buckets is None:
+            try:
+                _buckets = _BACKENDS[RATE_LIMIT_BACKEND]()
+            except KeyError:
+                raise RuntimeError(
+                    f"Unknown RATE_LIMIT_BACKEND {RATE_LIMIT_BACKEND!r}; expected one of {sorted(_BACKENDS)} or 'off'"
+                )
+        return _buckets
+
+
+async def take(key: str, cost: float, capacity: float, rate: float) -> float:
+    buckets = get_buckets()
+    if buckets is None:
+        return 0.0
+    if buckets.blocking:
+        return await asyncio.to_thread(buckets.take, key, cost, capacity, rate)
+    return buckets.take(key, cost, capacity, rate)
+
+
+class Route(NamedTuple):
+    name: str
+    method: str  # "" matches any method
+    path: str  # route template, e.g. /files/{file_id}/download
+
+
+class Rule(NamedTuple):
+    name: str
+    method: str
+    path: str
+    capacity: float
+    rate: float  # tokens per second
+
+
+def _parse_route(entry: str) -> Route:
+    """``[METHOD ]/path``, as in PROFILE_ROUTES."""
+    entry = entry.strip()
+    method, _, path = entry.rpartition(" ")
+    return Route(entry, method.upper(), path)
+
+
+def _parse_rule(entry: str) -> Rule:
+    """``[METHOD ]/path=count/seconds``; a malformed entry stops start-up."""
+    target, _, allowance = entry.rpartition("=")
+    count, _, seconds = allowance.partition("/")
+    try:
+        capacity, period = float(count), float(seconds)
+    except ValueError:
+        capacity = period = 0.0
+    if not target.strip() or not (0 < capacity < math.inf and 0 < period < math.inf):
+        raise RuntimeError(
+            f"Bad RATE_LIMITS entry {entry!r}; expected '[METHOD ]/path=count/seconds' with both above 0"
+        )
+    route = _parse_route(target)
+    return Rule(*route, capacity, capacity / period)
+
+
+_RULES = [_parse_rule(entry) for entry in RATE_LIMITS]
+_BANDWIDTH_ROUTES = [_parse_route(entry) for entry in UPLOAD_BANDWIDTH_ROUTES]
+
+_matchers: Optional[tuple[list, list]] = None
+
+
+def _match(scope, rules: list):
+    for regex, rule in rules:
+        if (not rule.method or rule.method == scope["method"]) and regex.match(scope["path"]):
+            return rule
+    return None
+
+
+def _rules_for(scope) -> tuple[Optional[Rule], bool]:
+    # routing happens after the middleware, so match the templates up front
+    global _matchers
+    if _matchers is None:
+        routes = [r for r in getattr(scope.get("app"), "routes", ()) if hasattr(r, "path_regex")]
+        _matchers = tuple(
+            [(route.path_regex, rule) for rule in rules for route in routes if route.path == rule.path]
+            for rules in (_RULES, _BANDWIDTH_ROUTES)
+        )
+    limits, bandwidth = _matchers
+    return _match(scope, limits), UPLOAD_BANDWIDTH_BYTES_PER_SECOND > 0 and _match(scope, bandwidth) is not None
+
+
+def _caller(scope) -> str:
+    for name, value in scope["headers"]:
+        if name == b"authorization":
+            scheme, _, token = value.decode("latin-1").partition(" ")
+            if scheme.lower() == "bearer" and token:
+                try:
+                    sub = decode_token(token).get("sub")
+                except Exception:
+                    break  # invalid or expired: the route answers 401, count it by address
+                if sub:
+                    return f"user:{sub}"
+            break
+    client = scope.get("client")
+    return f"ip:{client[0]}" if client else "ip:unknown"
+
+
+async def _throttle(key: str, nbytes: int) -> None:
+    capacity = max(UPLOAD_BANDWIDTH_BURST_BYTES, _SETTLE_BYTES)
+    while nbytes > 0:
+        step = min(nbytes, capacity)
+        wait = await take(key, step, capacity, UPLOAD_BANDWIDTH_BYTES_PER_SECOND)
+        if wait:
+            UPLOAD_THROTTLED.inc(amount=wait)
+            await asyncio.sleep(wait)
+            continue
+        nbytes -= step
+
+
+def _throttled(receive, key: str):
+    """``receive`` that holds the body back once the caller is over their bandwidth.
+
+    Delaying the next read lets the socket buffers fill, so the client is
+    slowed down by TCP itself rather than buffered here.
+    """
+    pending = 0
+
+    async def wrapped():
+        nonlocal pending
+        message = await receive()
+        if message["type"] == "http.request":
+            pending += len(message.get("body", b""))
+            if pending >= _SETTLE_BYTES or (pending and not message.get("more_body", False)):
+                nbytes, pending = pending, 0
+                await _throttle(key, nbytes)
+        return message
+
+    return wrapped
+
+
+class RateLimitMiddleware:
+    """Applies RATE_LIMITS (429 + Retry-After) and the upload bandwidth limit."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or get_buckets() is None:
+            await self.app(scope, receive, send)
+            return
+        rule, throttle = _rules_for(scope)
+        if rule is None and not throttle:
+            await self.app(scope, receive, send)
+            return
+
+        caller = _caller(scope)
+        if rule is not None:
+            wait = await take(f"{rule.name}|{caller}", 1, rule.capacity, rule.rate)
+            if wait:
+                RATE_LIMITED.inc(rule.name)
+                response = JSONResponse(
+                    status_code=429,
+                    content={"detail": "Too many requests, retry later"},
+                    headers={"Retry-After": str(math.ceil(wait))},
+                )
+                await response(scope, receive, send)
+                return
+        if throttle:
+            receive = _throttled(receive, f"upload|{caller}")
+        await self.app(scope, receive, send)
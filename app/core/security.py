@@ -1,9 +1,152 @@
-from passlib.context import CryptContext
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from app.core import metrics
+from app.core.config import (
+    PASSWORD_HASH_WORKERS,
+    PASSWORD_HASH_MAX_QUEUE,
+    ARGON2_TIME_COST,
+    ARGON2_MEMORY_COST,
+    ARGON2_PARALLELISM,
+)
+
+
+def _argon2_settings() -> dict:
+    settings = {}
+    for key, value in (
+        ("argon2__time_cost", ARGON2_TIME_COST),
+        ("argon2__memory_cost", ARGON2_MEMORY_COST),
+        ("argon2__parallelism", ARGON2_PARALLELISM),
+    ):
+        if value:
+            settings[key] = int(value)
+    return settings
+
+
+_pwd_context = None
+_pwd_lock = threading.Lock()
+
+
+def get_pwd_context():
+    """The passlib context, built on first use: passlib and argon2-cffi take a
+    while to import and most worker start-ups never hash a password."""
+    global _pwd_context
+    if _pwd_context is None:
+        with _pwd_lock:
+            if _pwd_context is None:
+                from passlib.context import CryptContext
+
+                context = CryptContext(schemes=["argon2"], deprecated="auto", **_argon2_settings())
+                context.handler("argon2").get_backend()  # loads argon2-cffi
+                _pwd_context = context
+    return _pwd_context
+
+
+class HashingBusy(Exception):
+    """Too many password hashes are already waiting for the hashing pool."""
+
+
+# argon2-cffi releases the GIL, so a sized thread pool gives real parallelism
+# while capping how many CPU/memory-heavy hashes run at once.
+_hash_pool = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="argon2")
+
+HASH_SECONDS = metrics.Histogram(
+    "password_hash_seconds", "Argon2 time per operation", ("op",), (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+)
+HASH_WAIT_SECONDS = metrics.Histogram(
+    "password_hash_wait_seconds", "Time spent queued for the hashing pool", ("op",), metrics.FAST_BUCKETS
+)
+HASH_REJECTED = metrics.Counter("password_hash_rejected_total", "Operations refused with the queue full")
+
+_stats_lock = threading.Lock()
+_stats = {
+    "queued": 0,
+    "running": 0,
+    "completed": 0,
+    "rejected": 0,
+    "wait_seconds_total": 0.0,
+    "wait_seconds_max": 0.0,
+    "run_seconds_total": 0.0,
+}
+
+
+def hashing_stats() -> dict:
+    with _stats_lock:
+        return {"workers": PASSWORD_HASH_WORKERS, "max_queue": PASSWORD_HASH_MAX_QUEUE, **_stats}
+
+
+@metrics.collector
+def _pool_gauges() -> None:
+    with _stats_lock:
+        metrics.pool_gauges("argon2", PASSWORD_HASH_WORKERS, _stats["running"], _stats["queued"])
+
+
+def _admit() -> float:
+    with _stats_lock:
+        if _stats["queued"] >= PASSWORD_HASH_MAX_QUEUE:
+            _stats["rejected"] += 1
+            HASH_REJECTED.inc()
+            raise HashingBusy()
+        _stats["queued"] += 1
+    return time.perf_counter()
+
+
+def _timed(op: str, func, enqueued_at: float, *args):
+    started = time.perf_counter()
+    waited = started - enqueued_at
+    HASH_WAIT_SECONDS.observe(waited, op)
+    with _stats_lock:
+        _stats["queued"] -= 1
+        _stats["running"] += 1
+        _stats["wait_seconds_total"] += waited
+        _stats["wait_seconds_max"] = max(_stats["wait_seconds_max"], waited)
+    try:
+        return func(*args)
+    finally:
+        ran = time.perf_counter() - started
+        HASH_SECONDS.observe(ran, op)
+        with _stats_lock:
+            _stats["running"] -= 1
+            _stats["completed"] += 1
+            _stats["run_seconds_total"] += ran
+
+
+def _submit(op: str, func, *args):
+    enqueued_at = _admit()
+    return _hash_pool.submit(_timed, op, func, enqueued_at, *args)
+
+
+# resolved on the pool thread, so a cold context never loads on the event loop
+def _hash(password: str) -> str:
+    return get_pwd_context().hash(password)
+
+
+def _verify(password: str, hashed: str) -> bool:
+    return get_pwd_context().verify(password, hashed)
+
+
+def _verify_and_update(password: str, hashed: str) -> tuple[bool, str | None]:
+    return get_pwd_context().verify_and_update(password, hashed)
 
-pwd_context = CryptContext(schemes=["argon2"], deprecated="auto")
 
 def hash_password(password: str) -> str:
-    return pwd_context.hash(password)
+    return _submit("hash", _hash, password).result()
 
 def verify_password(password: str, hashed: str) -> bool:
-    return pwd_context.verify(password, hashed)
+    return _submit("verify", _verify, password, hashed).result()
+
+
+async def hash_password_async(password: str) -> str:
+    return await asyncio.wrap_future(_submit("hash", _hash, password))
+
+
+async def verify_and_update_password(password: str, hashed: str) -> tuple[bool, str | None]:
+    """Verify without blocking the event loop.
+
+    The second item is a fresh hash when ``hashed`` was made with older
+    pwd_context parameters and should be stored in its place.
+    """
+    future = _submit("verify", _verify_and_update, password, hashed)
+    return await asyncio.wrap_future(future)
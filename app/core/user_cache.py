@@ -0,0 +1,82 @@
+from __future__ import annotations
+
+import os
+from dataclasses import dataclass
+from typing import Optional
+
+from app.core.cache import TTLCache
+from app.core.config import USER_CACHE_MAX_ENTRIES, USER_CACHE_SYNC_FILE, USER_CACHE_TTL_SECONDS
+
+
+@dataclass(frozen=True)
+class CurrentUser:
+    """What authorization needs about the caller; safe to share across requests."""
+
+    id: int
+    role: str
+    is_active: bool
+
+
+_cache: TTLCache[int, CurrentUser] = TTLCache(USER_CACHE_MAX_ENTRIES, USER_CACHE_TTL_SECONDS)
+
+# (inode, mtime) of USER_CACHE_SYNC_FILE when this worker last looked
+_generation: Optional[tuple[int, int]] = None
+
+
+def _current_generation() -> Optional[tuple[int, int]]:
+    try:
+        st = os.stat(USER_CACHE_SYNC_FILE)
+    except OSError:
+        return None
+    return st.st_ino, st.st_mtime_ns
+
+
+def cache_generation() -> Optional[tuple[int, int]]:
+    """Sync with the other workers: drop every entry once any of them has
+    invalidated a user since we last looked. One stat() per call."""
+    global _generation
+    if not USER_CACHE_SYNC_FILE or not _cache.enabled:
+        return None
+    generation = _current_generation()
+    if generation != _generation:
+        _cache.clear()
+        _generation = generation
+    return generation
+
+
+def get_cached_user(user_id: int) -> CurrentUser | None:
+    cache_generation()
+    return _cache.get(user_id)
+
+
+def remember_user(user, generation: Optional[tuple[int, int]] = None) -> CurrentUser:
+    """Cache ``user``; pass the cache_generation() seen before it was loaded so
+    a row read just before another worker's invalidation isn't kept."""
+    identity = CurrentUser(id=user.id, role=user.role, is_active=bool(user.is_active))
+    if generation == cache_generation():
+        _cache.set(user.id, identity)
+    return identity
+
+
+def _announce() -> None:
+    if not USER_CACHE_SYNC_FILE:
+        return
+    directory = os.path.dirname(USER_CACHE_SYNC_FILE)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    # a fresh inode each time, so two bumps in one mtime tick still differ
+    tmp = f"{USER_CACHE_SYNC_FILE}.{os.getpid()}.tmp"
+    with open(tmp, "w"):
+        pass
+    os.replace(tmp, USER_CACHE_SYNC_FILE)
+
+
+def invalidate_user(user_id: int) -> None:
+    """Forget ``user_id`` here and, through USER_CACHE_SYNC_FILE, in every
+    worker sharing that file. Call after the change has committed."""
+    _cache.pop(user_id)
+    _announce()
+
+
+def clear_user_cache() -> None:
+    _cache.clear()
@@ -0,0 +1,29 @@
+import importlib
+import threading
+
+from app.core.config import STARTUP_WARMUP
+
+# modules only imported on first use; loading them here moves that cost off
+# the first login / search / signup
+_MODULES = (
+    "app.services.embeddings",
+    "app.services.vector_store",
+)
+
+
+def warm_up() -> None:
+    """Import the lazily loaded libraries and build the password context."""
+    from app.core.jwt_backend import _jose_jwt
+    from app.core.security import get_pwd_context
+
+    get_pwd_context()
+    _jose_jwt()
+    for name in _MODULES:
+        importlib.import_module(name)
+
+
+def start_warmup() -> None:
+    if STARTUP_WARMUP == "blocking":
+        warm_up()
+    elif STARTUP_WARMUP == "background":
+        threading.Thread(target=warm_up, name="warmup", daemon=True).start()
@@ -1,40 +1,224 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, declarative_base
-
-SQLALCHEMY_DATABASE_URL = "sqlite:///./app.db"
-
-engine = create_engine(
-    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False})
+import threading
+import time
 
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-
-Base = declarative_base()
+from sqlalchemy import create_engine, event, exc
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+from app.core import metrics
+from app.core.config import (
+    DATABASE_URL,
+    DB_POOL_SIZE,
+    DB_MAX_OVERFLOW,
+    DB_POOL_TIMEOUT,
+    DB_POOL_RECYCLE,
+    DB_STATEMENT_TIMEOUT_MS,
+    SQLITE_BUSY_TIMEOUT_MS,
+    SQLITE_MMAP_SIZE,
+    SQLITE_SYNCHRONOUS,
+)
+
+SQLALCHEMY_DATABASE_URL = DATABASE_URL
+
+DB_QUERY_SECONDS = metrics.Histogram(
+    "db_query_duration_seconds", "Statement execution time", ("engine", "statement"), metrics.FAST_BUCKETS
+)
+DB_QUERY_ERRORS = metrics.Counter("db_query_errors_total", "Statements that raised", ("engine", "statement"))
+DB_POOL_WAIT_SECONDS = metrics.Histogram(
+    "db_pool_wait_seconds", "Time spent waiting for a pooled connection", ("engine",), metrics.FAST_BUCKETS
+)
+DB_POOL_TIMEOUTS = metrics.Counter("db_pool_timeouts_total", "Connection checkouts that timed out", ("engine",))
+DB_POOL_CHECKED_OUT = metrics.Gauge("db_pool_checked_out", "Connections in use", ("engine",))
+DB_POOL_OPEN = metrics.Gauge("db_pool_connections", "Connections open, in use or idle", ("engine",))
+
+
+class _TimedPoolMixin:
+    """Records how long callers wait for a pooled connection."""
+
+    metric_label = ""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._stats_lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+
+    def connect(self):
+        start = time.perf_counter()
+        try:
+            conn = super().connect()
+        except exc.TimeoutError:
+            with self._stats_lock:
+                self.timeouts += 1
+            DB_POOL_TIMEOUTS.inc(self.metric_label)
+            raise
+
+        waited = time.perf_counter() - start
+        DB_POOL_WAIT_SECONDS.observe(waited, self.metric_label)
+        with self._stats_lock:
+            self.checkouts += 1
+            self.wait_seconds_total += waited
+            self.wait_seconds_max = max(self.wait_seconds_max, waited)
+        return conn
+
+
+class TimedQueuePool(_TimedPoolMixin, QueuePool):
+    metric_label = "sync"
+
+
+class TimedAsyncQueuePool(_TimedPoolMixin, AsyncAdaptedQueuePool):
+    metric_label = "async"
+
+
+_ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+}
+
+
+def _async_url(url):
+    return url.set(drivername=_ASYNC_DRIVERS.get(url.get_backend_name(), url.drivername))
+
+
+def _engine_kwargs(url, is_async: bool = False) -> dict:
+    kwargs = {
+        "pool_pre_ping": True,
+        "pool_recycle": DB_POOL_RECYCLE,
+    }
+
+    if url.get_backend_name() == "sqlite":
+        kwargs["connect_args"] = {"check_same_thread": False}
+        if url.database in (None, "", ":memory:"):
+            return kwargs  # in-memory: let SQLAlchemy pick its single-connection pool
+    elif url.get_backend_name() == "postgresql" and DB_STATEMENT_TIMEOUT_MS > 0:
+        if is_async:
+            kwargs["connect_args"] = {"server_settings": {"statement_timeout": str(DB_STATEMENT_TIMEOUT_MS)}}
+        else:
+            kwargs["connect_args"] = {"options": f"-c statement_timeout={DB_STATEMENT_TIMEOUT_MS}"}
+
+    kwargs.update(
+        poolclass=TimedAsyncQueuePool if is_async else TimedQueuePool,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+    )
+    return kwargs
+
+
+_url = make_url(SQLALCHEMY_DATABASE_URL)
+
+engine = create_engine(SQLALCHEMY_DATABASE_URL, **_engine_kwargs(_url))
+
+# Same database through an asyncio driver (aiosqlite / asyncpg), used by the
+# routers so metadata requests don't each tie up a threadpool thread.
+async_engine = create_async_engine(_async_url(_url), **_engine_kwargs(_url, is_async=True))
 
 
-def get_db():
-    db = SessionLocal()
+def _sqlite_pragmas(dbapi_conn, _record):
+    cur = dbapi_conn.cursor()
     try:
-        yield db
+        cur.execute("PRAGMA journal_mode=WAL")
+        cur.execute(f"PRAGMA synchronous={SQLITE_SYNCHRONOUS}")
+        cur.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+        cur.execute(f"PRAGMA mmap_size={SQLITE_MMAP_SIZE}")
     finally:
-        db.close()
+        cur.close()
 
 
+if _url.get_backend_name() == "sqlite":
+    event.listen(engine, "connect", _sqlite_pragmas)
+    event.listen(async_engine.sync_engine, "connect", _sqlite_pragmas)
 
 
+_STATEMENTS = {"select", "insert", "update", "delete"}
 
 
+def _statement_kind(statement: str) -> str:
+    kind = statement.lstrip()[:6].lower()
+    return kind if kind in _STATEMENTS else "other"
 
 
+def _instrument(target, label: str) -> None:
+    # the start time rides on the execution context, so a statement that
+    # raises leaves nothing behind on the connection
+    def before(conn, cursor, statement, parameters, context, executemany):
+        if context is not None:
+            context._metrics_start = time.perf_counter()
 
+    def after(conn, cursor, statement, parameters, context, executemany):
+        start = getattr(context, "_metrics_start", None)
+        if start is not None:
+            DB_QUERY_SECONDS.observe(time.perf_counter() - start, label, _statement_kind(statement))
 
+    def failed(exception_context):
+        if exception_context.statement is not None:
+            DB_QUERY_ERRORS.inc(label, _statement_kind(exception_context.statement))
 
+    event.listen(target, "before_cursor_execute", before)
+    event.listen(target, "after_cursor_execute", after)
+    event.listen(target, "handle_error", failed)
 
 
+if metrics.METRICS_ENABLED:
+    _instrument(engine, "sync")
+    _instrument(async_engine.sync_engine, "async")
 
 
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
 
+Base = declarative_base()
 
 
+def get_db():
+    db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
 
 
+def _pool_stats(pool) -> dict:
+    stats = {"pool": type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        stats.update(
+            size=pool.size(),
+            checked_in=pool.checkedin(),
+            checked_out=pool.checkedout(),
+            overflow=pool.overflow(),
+        )
+    if isinstance(pool, _TimedPoolMixin):
+        with pool._stats_lock:
+            stats.update(
+                checkouts=pool.checkouts,
+                timeouts=pool.timeouts,
+                wait_seconds_total=round(pool.wait_seconds_total, 6),
+                wait_seconds_max=round(pool.wait_seconds_max, 6),
+            )
+    return stats
+
+
+def pool_stats() -> dict:
+    return {
+        "backend": _url.get_backend_name(),
+        "sync": _pool_stats(engine.pool),
+        "async": _pool_stats(async_engine.pool),
+    }
+
+
+@metrics.collector
+def _pool_gauges() -> None:
+    for label, pool in (("sync", engine.pool), ("async", async_engine.pool)):
+        if isinstance(pool, QueuePool):
+            DB_POOL_CHECKED_OUT.set(pool.checkedout(), label)
+            DB_POOL_OPEN.set(pool.size() + pool.overflow(), label)
@@ -1,17 +1,61 @@
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
 from app.api.health import router as health_router
 
 from app.models.user import User
 from app.api.users import router as users_router
 from app.api.auth import router as auth_router
 from app.api.files import router as files_router
-from app.models import file, user
+from app.api.metrics import router as metrics_router
+from app.api.profiles import router as profiles_router
+from app.models import file, user, blob, upload_session, reclaim, chunk, ingestion_job, embedding_cache, search_index
+from app.core.metrics import MetricsMiddleware, start_metrics, stop_metrics
+from app.core.profiling import ProfilingMiddleware
+from app.core.ratelimit import RateLimitMiddleware
+from app.core.security import HashingBusy
+from app.core.warmup import start_warmup
+from app.services.reclaimer import start_reclaimer, stop_reclaimer
+from app.services.ingestion import start_ingestion, stop_ingestion
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    start_reclaimer()
+    start_ingestion()
+    start_metrics()
+    start_warmup()
+    yield
+    await stop_ingestion()
+    await stop_reclaimer()
+    await stop_metrics()
+
+
+app = FastAPI(lifespan=lifespan)
+
+# innermost first: 429s are still counted and profiled
+app.add_middleware(RateLimitMiddleware)
+app.add_middleware(ProfilingMiddleware)
+app.add_middleware(MetricsMiddleware)
+
+
+@app.exception_handler(HashingBusy)
+async def hashing_busy_handler(request: Request, exc: HashingBusy):
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Too many password operations in progress, retry shortly"},
+        headers={"Retry-After": "1"},
+    )
 
-app = FastAPI()
 
 app.include_router(health_router)
 app.include_router(users_router)
 
 app.include_router(auth_router)
 
-app.include_router(files_router)
\ No newline at end of file
+app.include_router(files_router)
+
+app.include_router(metrics_router)
+
+app.include_router(profiles_router)
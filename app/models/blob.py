@@ -0,0 +1,21 @@
+from sqlalchemy import Column, Integer, String, DateTime
+from sqlalchemy.sql import func
+from app.db.database import Base
+
+
+class Blob(Base):
+    __tablename__ = "blobs"
+
+    # content-addressed: one row per distinct sha256, shared by many FileRecords
+    sha256 = Column(String, primary_key=True)
+
+    storage_path = Column(String, nullable=False)
+    size_bytes = Column(Integer, nullable=False)
+
+    # at-rest compression; NULL codec = stored as-is
+    codec = Column(String, nullable=True)
+    stored_size = Column(Integer, nullable=True)
+
+    ref_count = Column(Integer, nullable=False, default=0)
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
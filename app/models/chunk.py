@@ -0,0 +1,24 @@
+from sqlalchemy import Column, Integer, Text, DateTime, ForeignKey, Index
+from sqlalchemy.sql import func
+from app.db.database import Base
+
+
+class FileChunk(Base):
+    __tablename__ = "file_chunks"
+
+    id = Column(Integer, primary_key=True)
+
+    file_id = Column(Integer, ForeignKey("files.id"), nullable=False)
+    seq = Column(Integer, nullable=False)  # position within the file, from 0
+
+    # offsets into the extracted text (not the stored bytes), end exclusive
+    char_start = Column(Integer, nullable=False)
+    char_end = Column(Integer, nullable=False)
+
+    text = Column(Text, nullable=False)
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+    __table_args__ = (
+        Index("ix_file_chunks_file_id_seq", "file_id", "seq", unique=True),
+    )
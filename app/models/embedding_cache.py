@@ -0,0 +1,16 @@
+from sqlalchemy import Column, String, LargeBinary, DateTime
+from sqlalchemy.sql import func
+from app.db.database import Base
+
+
+class EmbeddingCache(Base):
+    __tablename__ = "embedding_cache"
+
+    # one vector per (model, chunk text); model ids include the dimension, so
+    # switching providers never serves vectors from another space
+    model = Column(String, primary_key=True)
+    text_sha256 = Column(String(64), primary_key=True)
+
+    vector = Column(LargeBinary, nullable=False)  # float32, native byte order
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
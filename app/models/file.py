@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Index
 from sqlalchemy.sql import func
 from app.db.database import Base
 
@@ -20,4 +20,14 @@ class FileRecord(Base):
 
     storage_path = Column(String, nullable=False)  # relative path on disk
 
-    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
\ No newline at end of file
+    # at-rest compression (gzip / zstd, NULL = stored as-is); size_bytes is
+    # always the original size, stored_size what the file takes on disk
+    codec = Column(String, nullable=True)
+    stored_size = Column(Integer, nullable=True)
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+    __table_args__ = (
+        # keyset pagination of one owner's files: WHERE owner_id = ? AND id < ? ORDER BY id DESC
+        Index("ix_files_owner_id_id", "owner_id", "id"),
+    )
@@ -0,0 +1,21 @@
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey
+from sqlalchemy.sql import func
+from app.db.database import Base
+
+
+class IngestionJob(Base):
+    __tablename__ = "ingestion_jobs"
+
+    id = Column(Integer, primary_key=True)
+
+    file_id = Column(Integer, ForeignKey("files.id"), index=True, nullable=False)
+
+    # queued -> running -> done | skipped (no text extractor) | failed
+    status = Column(String, index=True, nullable=False, default="queued")
+
+    chunk_count = Column(Integer, nullable=False, default=0)
+    error = Column(String, nullable=True)
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    started_at = Column(DateTime(timezone=True), nullable=True)
+    finished_at = Column(DateTime(timezone=True), nullable=True)
@@ -0,0 +1,22 @@
+from sqlalchemy import Column, Integer, String, DateTime
+from sqlalchemy.sql import func
+from app.db.database import Base
+
+
+class ReclaimTask(Base):
+    __tablename__ = "reclaim_queue"
+
+    # one file on disk waiting to be removed; written in the same transaction
+    # that dropped its last reference, so a crash never loses it
+    id = Column(Integer, primary_key=True)
+
+    storage_path = Column(String, nullable=False)
+    sha256 = Column(String, nullable=True)  # set for blobs, re-checked before removal
+
+    attempts = Column(Integer, nullable=False, default=0)
+    last_error = Column(String, nullable=True)
+
+    # earliest next attempt, pushed back after every failure
+    not_before = Column(DateTime(timezone=True), server_default=func.now(), index=True, nullable=False)
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
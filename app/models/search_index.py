@@ -0,0 +1,47 @@
+from sqlalchemy import DDL, event
+
+from app.models.chunk import FileChunk
+
+# Full-text indexes over files.original_name and file_chunks.text. They are
+# not ORM tables: SQLite uses FTS5 external-content tables kept in step by
+# triggers, Postgres uses generated tsvector columns with GIN indexes. Either
+# way every insert/delete updates the index row by row, nothing is rebuilt.
+# Created here for metadata.create_all (benchmarks, scratch databases) and
+# by migration f1c8d3a5e927 for real deployments.
+
+SQLITE_DDL = [
+    "CREATE VIRTUAL TABLE files_fts USING fts5("
+    "original_name, content='files', content_rowid='id', tokenize='unicode61 remove_diacritics 2')",
+    "CREATE TRIGGER files_fts_ai AFTER INSERT ON files BEGIN "
+    "INSERT INTO files_fts(rowid, original_name) VALUES (new.id, new.original_name); END",
+    "CREATE TRIGGER files_fts_ad AFTER DELETE ON files BEGIN "
+    "INSERT INTO files_fts(files_fts, rowid, original_name) VALUES ('delete', old.id, old.original_name); END",
+    "CREATE TRIGGER files_fts_au AFTER UPDATE OF original_name ON files BEGIN "
+    "INSERT INTO files_fts(files_fts, rowid, original_name) VALUES ('delete', old.id, old.original_name); "
+    "INSERT INTO files_fts(rowid, original_name) VALUES (new.id, new.original_name); END",
+    "CREATE VIRTUAL TABLE file_chunks_fts USING fts5("
+    "text, content='file_chunks', content_rowid='id', tokenize='unicode61 remove_diacritics 2')",
+    "CREATE TRIGGER file_chunks_fts_ai AFTER INSERT ON file_chunks BEGIN "
+    "INSERT INTO file_chunks_fts(rowid, text) VALUES (new.id, new.text); END",
+    "CREATE TRIGGER file_chunks_fts_ad AFTER DELETE ON file_chunks BEGIN "
+    "INSERT INTO file_chunks_fts(file_chunks_fts, rowid, text) VALUES ('delete', old.id, old.text); END",
+    "CREATE TRIGGER file_chunks_fts_au AFTER UPDATE OF text ON file_chunks BEGIN "
+    "INSERT INTO file_chunks_fts(file_chunks_fts, rowid, text) VALUES ('delete', old.id, old.text); "
+    "INSERT INTO file_chunks_fts(rowid, text) VALUES (new.id, new.text); END",
+]
+
+POSTGRES_DDL = [
+    # names split on . _ - so "q3_report.pdf" matches "report"
+    "ALTER TABLE files ADD COLUMN name_tsv tsvector GENERATED ALWAYS AS "
+    "(to_tsvector('simple', regexp_replace(original_name, '[._-]+', ' ', 'g'))) STORED",
+    "CREATE INDEX ix_files_name_tsv ON files USING gin (name_tsv)",
+    "ALTER TABLE file_chunks ADD COLUMN text_tsv tsvector GENERATED ALWAYS AS "
+    "(to_tsvector('simple', text)) STORED",
+    "CREATE INDEX ix_file_chunks_text_tsv ON file_chunks USING gin (text_tsv)",
+]
+
+# file_chunks is created after files, so both tables exist by then
+for _statement in SQLITE_DDL:
+    event.listen(FileChunk.__table__, "after_create", DDL(_statement).execute_if(dialect="sqlite"))
+for _statement in POSTGRES_DDL:
+    event.listen(FileChunk.__table__, "after_create", DDL(_statement).execute_if(dialect="postgresql"))
@@ -0,0 +1,22 @@
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey
+from sqlalchemy.sql import func
+from app.db.database import Base
+
+
+class UploadSession(Base):
+    __tablename__ = "upload_sessions"
+
+    id = Column(String, primary_key=True)  # uuid4 hex, handed to the client
+
+    owner_id = Column(Integer, ForeignKey("users.id"), index=True, nullable=False)
+
+    original_name = Column(String, nullable=False)
+    content_type = Column(String, nullable=True)
+
+    total_size = Column(Integer, nullable=True)  # optional, declared by the client
+    received_bytes = Column(Integer, nullable=False, default=0)
+
+    staging_path = Column(String, nullable=False)
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False)
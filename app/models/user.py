@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Integer, Boolean
+from sqlalchemy import BigInteger, Column, String, Integer, Boolean
 from app.db.database import Base
 
 
@@ -9,4 +9,9 @@ class User(Base):
     username = Column(String, unique=True, index=True)
     hashed_password = Column(String)
     role = Column(String, default="user")
-    is_active = Column(Boolean, default=True)
\ No newline at end of file
+    is_active = Column(Boolean, default=True)
+
+    # sum of size_bytes over the user's files, kept current by app/services/quota.py
+    storage_used_bytes = Column(BigInteger, nullable=False, default=0, server_default="0")
+    # per-user override of STORAGE_QUOTA_BYTES (NULL = the default)
+    storage_quota_bytes = Column(BigInteger, nullable=True)
@@ -1,4 +1,4 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from datetime import datetime
 
 
@@ -11,7 +11,73 @@ class FileOut(BaseModel):
     size_bytes: int
     sha256: str | None
     storage_path: str
+    codec: str | None = None
+    stored_size: int | None = None
     created_at: datetime
 
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+
+class FileSummary(BaseModel):
+    # the default /files/ listing columns: no server-side paths
+    id: int
+    owner_id: int
+    original_name: str
+    content_type: str | None
+    size_bytes: int
+    sha256: str | None
+    created_at: datetime
+
+    class Config:
+        from_attributes = True
+
+
+class FileListItem(BaseModel):
+    # every field optional: /files/?fields= returns only the requested columns
+    id: int | None = None
+    owner_id: int | None = None
+    original_name: str | None = None
+    stored_name: str | None = None
+    content_type: str | None = None
+    size_bytes: int | None = None
+    sha256: str | None = None
+    storage_path: str | None = None
+    codec: str | None = None
+    stored_size: int | None = None
+    created_at: datetime | None = None
+
+
+class FilePage(BaseModel):
+    items: list[FileListItem]
+    next_cursor: int | None = None
+
+
+class BulkUploadItem(BaseModel):
+    filename: str
+    status: str  # "created" or "failed"
+    file: FileOut | None = None
+    detail: str | None = None
+
+
+class BulkUploadResult(BaseModel):
+    created: int
+    failed: int
+    items: list[BulkUploadItem]
+
+
+class BulkDeleteRequest(BaseModel):
+    ids: list[int] | None = Field(None, max_length=10000)
+    owner_id: int | None = None  # admins only; defaults to the caller
+    # same filters as GET /files/
+    content_type: str | None = None
+    min_size: int | None = Field(None, ge=0)
+    max_size: int | None = Field(None, ge=0)
+    created_after: datetime | None = None
+    created_before: datetime | None = None
+    name_prefix: str | None = None
+
+
+class BulkDeleteResult(BaseModel):
+    deleted: int
+    ids: list[int]
@@ -0,0 +1,31 @@
+from pydantic import BaseModel
+from datetime import datetime
+
+
+class IngestionJobOut(BaseModel):
+    id: int
+    file_id: int
+    status: str
+    chunk_count: int
+    error: str | None
+    created_at: datetime
+    started_at: datetime | None
+    finished_at: datetime | None
+
+    class Config:
+        from_attributes = True
+
+
+class FileChunkOut(BaseModel):
+    seq: int
+    char_start: int
+    char_end: int
+    text: str
+
+    class Config:
+        from_attributes = True
+
+
+class ChunkPage(BaseModel):
+    items: list[FileChunkOut]
+    next_cursor: int | None = None
@@ -0,0 +1,16 @@
+from pydantic import BaseModel
+from datetime import datetime
+
+
+class ProfileOut(BaseModel):
+    id: str
+    method: str
+    route: str
+    path: str
+    status: int
+    reason: str
+    started_at: datetime
+    duration_ms: float
+    samples: int
+    interval_ms: float
+    truncated: bool
@@ -0,0 +1,46 @@
+from pydantic import BaseModel, Field
+
+from app.schemas.file import FileSummary
+
+
+class SearchHit(BaseModel):
+    file: FileSummary
+    score: float
+    # matched words wrapped in <mark>...</mark>; the text itself is not escaped
+    name_highlight: str | None = None
+    chunk_seq: int | None = None  # best matching chunk, see /files/{id}/chunks
+    snippet: str | None = None
+
+
+class SearchPage(BaseModel):
+    query: str
+    items: list[SearchHit]
+    next_offset: int | None = None
+
+
+class RetrieveRequest(BaseModel):
+    query: str = Field(..., min_length=1, max_length=2000)
+    k: int = Field(8, ge=1, le=50)
+    candidates: int = Field(50, ge=1, le=500)  # per retriever, before fusion
+    owner_id: int | None = None  # admins only; defaults to the caller
+
+
+class Passage(BaseModel):
+    file: FileSummary
+    score: float  # reciprocal rank fusion score
+    chunk_seq: int | None = None  # None when only the file name matched
+    char_start: int | None = None
+    char_end: int | None = None
+    text: str | None = None
+    snippet: str | None = None
+    lexical_rank: int | None = None
+    vector_rank: int | None = None
+    vector_score: float | None = None  # cosine similarity
+
+
+class RetrieveResult(BaseModel):
+    query: str
+    items: list[Passage]
+    retrievers: list[str]
+    # per stage; lexical and vector overlap, "retrieve" is their wall time
+    timings_ms: dict[str, float]
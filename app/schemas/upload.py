@@ -0,0 +1,20 @@
+from pydantic import BaseModel, Field
+from datetime import datetime
+
+
+class UploadSessionCreate(BaseModel):
+    filename: str = Field(..., min_length=1)
+    content_type: str | None = None
+    total_size: int | None = Field(None, ge=0)
+
+
+class UploadSessionOut(BaseModel):
+    id: str
+    original_name: str
+    content_type: str | None
+    total_size: int | None
+    received_bytes: int
+    created_at: datetime
+
+    class Config:
+        from_attributes = True
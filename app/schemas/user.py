@@ -7,6 +7,8 @@ class UserOut(BaseModel):
     email: str
     role: str
     is_active: bool
+    storage_used_bytes: int = 0
+    storage_quota_bytes: int | None = None  # None = the server default
 
     class Config:
         from_attributes = True
\ No newline at end of file
@@ -0,0 +1,315 @@
+from __future__ import annotations
+
+import os
+import threading
+import uuid
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from pathlib import Path
+from typing import BinaryIO, NamedTuple, Optional, Protocol
+
+
+# Where stored bytes live. Uploads are always staged (hashed, compressed) on
+# local disk first; the backend holds the finished files and blobs.
+# "local": the files sit at their storage_path on this machine (default)
+# "s3":    objects in an S3-compatible bucket (AWS, MinIO, ...), so several
+#          API nodes can share one store. Needs boto3.
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "local").lower()
+
+S3_BUCKET = os.getenv("S3_BUCKET")
+S3_PREFIX = os.getenv("S3_PREFIX", "")
+S3_ENDPOINT_URL = os.getenv("S3_ENDPOINT_URL")  # MinIO / moto / other S3-compatible servers
+S3_REGION = os.getenv("S3_REGION")
+
+# Objects above one part go up as a multipart upload, S3_MAX_CONCURRENCY
+# parts at a time (S3 wants parts of at least 5MB, except the last).
+S3_PART_SIZE = max(int(os.getenv("S3_PART_SIZE", str(8 * 1024 * 1024))), 5 * 1024 * 1024)
+S3_MAX_CONCURRENCY = int(os.getenv("S3_MAX_CONCURRENCY", "4"))
+
+
+class BlobStat(NamedTuple):
+    size: int
+    mtime: float
+
+
+class StorageBackend(Protocol):
+    """Failures surface as OSError (FileNotFoundError for missing keys), the
+    same as disk errors, whatever the backend."""
+
+    name: str
+
+    def put_stream(self, key: str, fileobj: BinaryIO) -> None:
+        """Store everything ``fileobj`` yields under ``key``; readers never see a partial object."""
+        ...
+
+    def put_file(self, key: str, path: str) -> None:
+        """Move the local file ``path`` into the store under ``key``."""
+        ...
+
+    def copy(self, src: str, dst: str) -> None:
+        """Make ``dst`` a copy of ``src``; ``src`` stays readable."""
+        ...
+
+    def open_range(self, key: str, start: int = 0, end: Optional[int] = None) -> BinaryIO:
+        """Readable stream of bytes ``start`` through ``end`` (inclusive, None = to the end).
+
+        Raises FileNotFoundError for a missing key.
+        """
+        ...
+
+    def stat(self, key: str) -> Optional[BlobStat]:
+        """Size and mtime of ``key``, or None when it does not exist."""
+        ...
+
+    def delete(self, key: str) -> None:
+        """Remove ``key``; a missing key is not an error."""
+        ...
+
+    def local_path(self, key: str) -> Optional[str]:
+        """Filesystem path of ``key`` if the backend keeps it on this machine."""
+        ...
+
+
+class _RangeReader:
+    """File object cut off after ``length`` bytes."""
+
+    def __init__(self, f: BinaryIO, length: Optional[int]):
+        self._f = f
+        self._left = length
+
+    def read(self, size: int = -1) -> bytes:
+        if self._left is None:
+            return self._f.read(size)
+        if size < 0 or size > self._left:
+            size = self._left
+        data = self._f.read(size)
+        self._left -= len(data)
+        return data
+
+    def close(self) -> None:
+        self._f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+class LocalBackend:
+    """Plain files; a key is the file's path, exactly what storage_path always held."""
+
+    name = "local"
+
+    def put_stream(self, key: str, fileobj: BinaryIO) -> None:
+        target = Path(key)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        tmp = target.with_name(f".{target.name}.{uuid.uuid4().hex}.tmp")
+        try:
+            with tmp.open("wb") as out:
+                while block := fileobj.read(1024 * 1024):
+                    out.write(block)
+            os.replace(tmp, target)
+        except BaseException:
+            tmp.unlink(missing_ok=True)
+            raise
+
+    def put_file(self, key: str, path: str) -> None:
+        if os.path.abspath(path) == os.path.abspath(key):
+            return  # already in place (uuid uploads are written straight to their key)
+        Path(key).parent.mkdir(parents=True, exist_ok=True)
+        os.replace(path, key)
+
+    def copy(self, src: str, dst: str) -> None:
+        Path(dst).parent.mkdir(parents=True, exist_ok=True)
+        try:
+            # a hard link costs no I/O; files are never modified in place
+            os.link(src, dst)
+        except FileExistsError:
+            pass
+        except OSError:
+            with open(src, "rb") as f:
+                self.put_stream(dst, f)
+
+    def open_range(self, key: str, start: int = 0, end: Optional[int] = None) -> BinaryIO:
+        f = open(key, "rb")
+        if start:
+            f.seek(start)
+        return _RangeReader(f, None if end is None else max(end - start + 1, 0))
+
+    def stat(self, key: str) -> Optional[BlobStat]:
+        try:
+            st = os.stat(key)
+        except FileNotFoundError:
+            return None
+        return BlobStat(st.st_size, st.st_mtime)
+
+    def delete(self, key: str) -> None:
+        try:
+            os.remove(key)
+        except FileNotFoundError:
+            pass
+
+    def local_path(self, key: str) -> Optional[str]:
+        return key
+
+
+class S3Backend:
+    """S3-compatible object store. Keys are storage paths under S3_PREFIX.
+
+    Large objects are sent as multipart uploads with a bounded number of
+    parts in flight, so memory stays at about part size x concurrency no
+    matter how big the file is. A failed upload is aborted, never completed.
+    """
+
+    name = "s3"
+
+    def __init__(
+        self,
+        bucket: Optional[str] = S3_BUCKET,
+        prefix: str = S3_PREFIX,
+        endpoint_url: Optional[str] = S3_ENDPOINT_URL,
+        region: Optional[str] = S3_REGION,
+        part_size: int = S3_PART_SIZE,
+        max_concurrency: int = S3_MAX_CONCURRENCY,
+    ):
+        try:
+            import boto3
+            from botocore.config import Config
+            from botocore.exceptions import BotoCoreError, ClientError
+        except ImportError:
+            raise RuntimeError("STORAGE_BACKEND=s3 needs the boto3 package")
+        if not bucket:
+            raise RuntimeError("STORAGE_BACKEND=s3 needs S3_BUCKET")
+
+        self.bucket = bucket
+        self.prefix = prefix
+        self.part_size = part_size
+        self.max_concurrency = max(max_concurrency, 1)
+        # boto3 clients are thread-safe; size the pool for the part uploads
+        self._client = boto3.client(
+            "s3",
+            endpoint_url=endpoint_url,
+            region_name=region,
+            config=Config(max_pool_connections=max(10, self.max_concurrency * 2)),
+        )
+        self._pool = ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix="s3-part")
+        self._client_errors = (BotoCoreError, ClientError)
+
+    def _key(self, key: str) -> str:
+        return self.prefix + key.replace("\\", "/").lstrip("/")
+
+    @contextmanager
+    def _errors(self, key: str):
+        try:
+            yield
+        except self._client_errors as exc:
+            code = getattr(exc, "response", {}).get("Error", {}).get("Code")
+            if code in ("404", "NoSuchKey", "NotFound"):
+                raise FileNotFoundError(key) from exc
+            raise OSError(f"S3 {key}: {exc}") from exc
+
+    def _read_part(self, fileobj: BinaryIO) -> bytes:
+        # archive members and sockets may return short reads before EOF
+        buf = bytearray()
+        while len(buf) < self.part_size:
+            block = fileobj.read(self.part_size - len(buf))
+            if not block:
+                break
+            buf += block
+        return bytes(buf)
+
+    def put_stream(self, key: str, fileobj: BinaryIO) -> None:
+        first = self._read_part(fileobj)
+        with self._errors(key):
+            if len(first) < self.part_size:
+                self._client.put_object(Bucket=self.bucket, Key=self._key(key), Body=first)
+                return
+
+            upload_id = self._client.create_multipart_upload(Bucket=self.bucket, Key=self._key(key))["UploadId"]
+            try:
+                parts = self._upload_parts(key, upload_id, first, fileobj)
+                self._client.complete_multipart_upload(
+                    Bucket=self.bucket,
+                    Key=self._key(key),
+                    UploadId=upload_id,
+                    MultipartUpload={"Parts": parts},
+                )
+            except BaseException:
+                self._client.abort_multipart_upload(Bucket=self.bucket, Key=self._key(key), UploadId=upload_id)
+                raise
+
+    def _upload_parts(self, key: str, upload_id: str, first: bytes, fileobj: BinaryIO) -> list[dict]:
+        def send(number: int, body: bytes) -> dict:
+            r = self._client.upload_part(
+                Bucket=self.bucket, Key=self._key(key), UploadId=upload_id, PartNumber=number, Body=body
+            )
+            return {"PartNumber": number, "ETag": r["ETag"]}
+
+        parts, pending = [], set()
+        number, block = 1, first
+        try:
+            while block:
+                # reading ahead is bounded by the number of parts in flight
+                if len(pending) >= self.max_concurrency:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    parts += [fut.result() for fut in done]
+                pending.add(self._pool.submit(send, number, block))
+                number += 1
+                block = self._read_part(fileobj)
+            parts += [fut.result() for fut in pending]
+        finally:
+            wait(pending)  # no stray part uploads after an abort
+        return sorted(parts, key=lambda part: part["PartNumber"])
+
+    def put_file(self, key: str, path: str) -> None:
+        with open(path, "rb") as f:
+            self.put_stream(key, f)
+        os.remove(path)
+
+    def copy(self, src: str, dst: str) -> None:
+        # server side; boto3's managed copy switches to multipart copy above 5GB
+        with self._errors(src):
+            self._client.copy({"Bucket": self.bucket, "Key": self._key(src)}, self.bucket, self._key(dst))
+
+    def open_range(self, key: str, start: int = 0, end: Optional[int] = None) -> BinaryIO:
+        extra = {}
+        if start or end is not None:
+            extra["Range"] = f"bytes={start}-{'' if end is None else end}"
+        with self._errors(key):
+            return self._client.get_object(Bucket=self.bucket, Key=self._key(key), **extra)["Body"]
+
+    def stat(self, key: str) -> Optional[BlobStat]:
+        try:
+            with self._errors(key):
+                head = self._client.head_object(Bucket=self.bucket, Key=self._key(key))
+        except FileNotFoundError:
+            return None
+        return BlobStat(head["ContentLength"], head["LastModified"].timestamp())
+
+    def delete(self, key: str) -> None:
+        with self._errors(key):
+            self._client.delete_object(Bucket=self.bucket, Key=self._key(key))
+
+    def local_path(self, key: str) -> Optional[str]:
+        return None
+
+
+_BACKENDS = {"local": LocalBackend, "s3": S3Backend}
+
+_backend: Optional[StorageBackend] = None
+_backend_lock = threading.Lock()
+
+
+def get_backend() -> StorageBackend:
+    """The configured backend, created on first use."""
+    global _backend
+    if _backend is not None:
+        return _backend
+    with _backend_lock:
+        if _backend is None:
+            try:
+                _backend = _BACKENDS[STORAGE_BACKEND]()
+            except KeyError:
+                raise RuntimeError(f"Unknown STORAGE_BACKEND {STORAGE_BACKEND!r}; expected one of {sorted(_BACKENDS)}")
+        return _backend
@@ -0,0 +1,69 @@
+from __future__ import annotations
+
+from typing import Iterable, Iterator, NamedTuple
+
+
+class TextChunk(NamedTuple):
+    seq: int
+    char_start: int  # offsets into the extracted text, end exclusive
+    char_end: int
+    text: str
+
+
+def _cut(buf: str, start: int, size: int) -> int:
+    """End of the window starting at ``start``: last newline, else last space,
+    in the back half of the window; a hard cut at ``size`` otherwise."""
+    end = start + size
+    floor = start + size // 2
+    for sep in ("\n", " "):
+        at = buf.rfind(sep, floor, end)
+        if at != -1:
+            return at + 1
+    return end
+
+
+def chunk_text(pieces: Iterable[str], size: int = 1000, overlap: int = 200) -> Iterator[TextChunk]:
+    """Split streamed text into windows of at most ``size`` characters.
+
+    Consecutive windows share roughly ``overlap`` characters. Only the
+    unfinished tail of the text is buffered, so memory stays bounded by
+    ``size`` plus one input piece regardless of document length.
+    """
+    if size <= 0 or not 0 <= overlap < size:
+        raise ValueError("need size > 0 and 0 <= overlap < size")
+
+    buf = ""
+    base = 0  # document offset of buf[0]
+    pos = 0  # start of the current window within buf
+    emitted_to = 0  # document offset where the last emitted window ended
+    seq = 0
+
+    def window(start: int, end: int):
+        nonlocal seq, emitted_to
+        text = buf[start:end]
+        emitted_to = base + end
+        if text.strip():
+            seq += 1
+            return TextChunk(seq - 1, base + start, base + end, text)
+        return None
+
+    for piece in pieces:
+        buf = buf[pos:] + piece
+        base += pos
+        pos = 0
+
+        while len(buf) - pos > size:
+            end = _cut(buf, pos, size)
+            chunk = window(pos, end)
+            if chunk:
+                yield chunk
+
+            # start the next window ``overlap`` back, on a word boundary if possible
+            nxt = max(end - overlap, pos + 1)
+            space = buf.find(" ", nxt, end)
+            pos = space + 1 if overlap and space != -1 else nxt
+
+    if base + len(buf) > emitted_to:
+        chunk = window(pos, len(buf))
+        if chunk:
+            yield chunk
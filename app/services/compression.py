@@ -0,0 +1,139 @@
+from __future__ import annotations
+
+import gzip
+import os
+import zlib
+from typing import BinaryIO, Optional
+
+
+# At-rest compression of uploaded bytes: "off" (default), "gzip" or "zstd"
+# (needs the zstandard package). Applies to new uploads only; files already
+# stored keep whatever codec they were written with.
+STORAGE_COMPRESSION = os.getenv("STORAGE_COMPRESSION", "off").lower()
+STORAGE_COMPRESSION_LEVEL = (
+    int(os.getenv("STORAGE_COMPRESSION_LEVEL")) if os.getenv("STORAGE_COMPRESSION_LEVEL") else None
+)
+
+# Types neither listed as compressible nor as already compressed are decided
+# by compressing a sample of the first chunk: the upload is compressed only
+# if the sample shrinks to at most COMPRESSION_MIN_RATIO of its size.
+COMPRESSION_MIN_RATIO = float(os.getenv("COMPRESSION_MIN_RATIO", "0.9"))
+COMPRESSION_SAMPLE_BYTES = 64 * 1024
+
+_COMPRESSIBLE = (
+    "text/",
+    "application/json",
+    "application/x-ndjson",
+    "application/xml",
+    "application/javascript",
+    "application/csv",
+    "application/sql",
+    "application/yaml",
+    "image/svg+xml",
+)
+_COMPRESSED = (
+    "image/",
+    "video/",
+    "audio/",
+    "font/woff",
+    "application/zip",
+    "application/gzip",
+    "application/x-gzip",
+    "application/zstd",
+    "application/x-bzip2",
+    "application/x-xz",
+    "application/x-7z-compressed",
+    "application/vnd.rar",
+    "application/pdf",
+    "application/vnd.openxmlformats-officedocument.",
+    "application/epub+zip",
+)
+
+# stored file suffix (CAS blobs) and Content-Encoding token per codec
+SUFFIXES = {"gzip": ".gz", "zstd": ".zst"}
+HTTP_ENCODINGS = {"gzip": "gzip", "zstd": "zstd"}
+
+
+def _zstd():
+    try:
+        import zstandard
+    except ImportError:
+        raise RuntimeError("The zstd codec needs the zstandard package")
+    return zstandard
+
+
+def compressor(codec: str):
+    """Streaming compressor: ``.compress(data)`` per chunk, ``.flush()`` at the end."""
+    if codec == "gzip":
+        # wbits=31 writes a gzip container, so the stored file can go out as-is
+        # with Content-Encoding: gzip
+        level = 6 if STORAGE_COMPRESSION_LEVEL is None else STORAGE_COMPRESSION_LEVEL
+        return zlib.compressobj(level, zlib.DEFLATED, 31)
+    if codec == "zstd":
+        level = 3 if STORAGE_COMPRESSION_LEVEL is None else STORAGE_COMPRESSION_LEVEL
+        return _zstd().ZstdCompressor(level=level).compressobj()
+    raise ValueError(f"Unknown codec {codec!r}")
+
+
+class _GzipReader(gzip.GzipFile):
+    # GzipFile leaves a passed-in fileobj open; this one owns it
+    def close(self) -> None:
+        raw = self.fileobj
+        try:
+            super().close()
+        finally:
+            if raw is not None:
+                raw.close()
+
+
+def decompressing_reader(raw: BinaryIO, codec: Optional[str]) -> BinaryIO:
+    """Readable stream of the original bytes over a stored file's raw stream.
+
+    Closing it closes ``raw``.
+    """
+    if codec is None:
+        return raw
+    if codec == "gzip":
+        return _GzipReader(fileobj=raw, mode="rb")
+    if codec == "zstd":
+        return _zstd().ZstdDecompressor().stream_reader(raw, closefd=True)
+    raise ValueError(f"Unknown codec {codec!r}")
+
+
+def choose_codec(content_type: Optional[str], sample: bytes) -> Optional[str]:
+    """Codec for a new upload, from its declared type and first bytes."""
+    if STORAGE_COMPRESSION == "off" or not sample:
+        return None
+    if STORAGE_COMPRESSION not in SUFFIXES:
+        raise RuntimeError(f"Unknown STORAGE_COMPRESSION {STORAGE_COMPRESSION!r}; expected off, gzip or zstd")
+
+    mime = (content_type or "").split(";")[0].strip().lower()
+    if mime.startswith(_COMPRESSIBLE):
+        return STORAGE_COMPRESSION
+    if mime.startswith(_COMPRESSED):
+        return None
+
+    sample = sample[:COMPRESSION_SAMPLE_BYTES]
+    probe = compressor(STORAGE_COMPRESSION)
+    packed = len(probe.compress(sample)) + len(probe.flush())
+    return STORAGE_COMPRESSION if packed <= len(sample) * COMPRESSION_MIN_RATIO else None
+
+
+def accepts_encoding(accept_encoding: Optional[str], token: str) -> bool:
+    """Whether an Accept-Encoding header allows ``token`` (q > 0)."""
+    if not accept_encoding:
+        return False
+    for item in accept_encoding.split(","):
+        name, _, params = item.strip().partition(";")
+        if name.strip().lower() not in (token, "*"):
+            continue
+        q = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key.lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        return q > 0
+    return False
@@ -0,0 +1,253 @@
+from __future__ import annotations
+
+import hashlib
+import math
+import os
+import queue
+import re
+import threading
+import time
+from concurrent.futures import Future
+from functools import lru_cache
+from typing import Callable, Optional, Protocol, Sequence
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from app.models.embedding_cache import EmbeddingCache
+
+
+# "none" turns vector indexing off; ingestion then only stores text chunks
+EMBEDDING_PROVIDER = os.getenv("EMBEDDING_PROVIDER", "hashing")
+EMBEDDING_DIM = int(os.getenv("EMBEDDING_DIM", "256"))
+
+# Texts from every ingestion worker (and query embedding) go through one
+# queue. A batch takes whatever is queued, up to EMBEDDING_BATCH_SIZE texts,
+# so requests arriving while the provider is busy share the next call.
+# EMBEDDING_BATCH_WAIT_MS > 0 additionally holds a short batch back to let it
+# fill, trading query latency for fewer provider calls.
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "64"))
+EMBEDDING_BATCH_WAIT_MS = float(os.getenv("EMBEDDING_BATCH_WAIT_MS", "0"))
+
+
+class EmbeddingProvider(Protocol):
+    name: str
+    model: str  # cache / vector store key; changes whenever vectors would
+    dim: int
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        """(len(texts), dim) float32, one row per text."""
+        ...
+
+
+_TOKEN = re.compile(r"\w+")
+
+
+@lru_cache(maxsize=1 << 18)
+def _bucket(feature: str, dim: int) -> tuple[int, float]:
+    digest = hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest()
+    value = int.from_bytes(digest, "little")
+    return value % dim, 1.0 if value >> 63 else -1.0
+
+
+class HashingEmbedder:
+    """Deterministic CPU embedder: signed feature hashing of word unigrams and
+    bigrams with log-scaled counts, L2-normalized.
+
+    No model download, no network and the same vector on every machine, so
+    it works offline and in tests. Similarity is lexical overlap, not meaning.
+    """
+
+    name = "hashing"
+
+    def __init__(self, dim: int):
+        if dim <= 0:
+            raise ValueError("dim must be positive")
+        self.dim = dim
+        self.model = f"hashing-v1-{dim}"
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        out = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            tokens = _TOKEN.findall(text.lower())
+            features = tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+            counts: dict[int, float] = {}
+            for feature in features:
+                index, sign = _bucket(feature, self.dim)
+                counts[index] = counts.get(index, 0.0) + sign
+            for index, value in counts.items():
+                out[row, index] = math.copysign(math.log1p(abs(value)), value)
+        norms = np.linalg.norm(out, axis=1, keepdims=True)
+        np.divide(out, norms, out=out, where=norms > 0)
+        return out
+
+
+_PROVIDERS = {"hashing": HashingEmbedder}
+
+
+def get_provider(name: str, dim: int) -> EmbeddingProvider:
+    try:
+        return _PROVIDERS[name.lower()](dim)
+    except KeyError:
+        raise RuntimeError(f"Unknown EMBEDDING_PROVIDER {name!r}; expected one of {sorted(_PROVIDERS)} or 'none'")
+
+
+class MicroBatcher:
+    """Coalesces embed calls from many threads into provider batches.
+
+    ``embed()`` blocks its caller until its own rows are done; a single
+    daemon thread drains the queue, so a provider never sees concurrent calls.
+    Each call is queued as one entry (split at the batch size), so its texts
+    stay together instead of racing the drain thread.
+    """
+
+    def __init__(self, embed: Callable[[Sequence[str]], np.ndarray], batch_size: int, max_wait: float):
+        self._embed = embed
+        self._batch_size = max(batch_size, 1)
+        self._max_wait = max_wait
+        self._queue: queue.Queue = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        self.stats = {"batches": 0, "texts": 0, "errors": 0}
+
+    def _ensure_thread(self) -> None:
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._drain, name="embed-batcher", daemon=True)
+                self._thread.start()
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        if not texts:
+            return np.empty((0, 0), dtype=np.float32)
+        self._ensure_thread()
+        futures = []
+        for start in range(0, len(texts), self._batch_size):
+            fut: Future = Future()
+            self._queue.put((list(texts[start:start + self._batch_size]), fut))
+            futures.append(fut)
+        return np.concatenate([fut.result() for fut in futures])
+
+    def _drain(self) -> None:
+        carry = None  # entry that did not fit the previous batch
+        while True:
+            batch = [carry or self._queue.get()]
+            carry = None
+            size = len(batch[0][0])
+            deadline = time.monotonic() + self._max_wait
+            while size < self._batch_size:
+                timeout = deadline - time.monotonic()
+                try:
+                    item = self._queue.get(timeout=timeout) if timeout > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if size + len(item[0]) > self._batch_size:
+                    carry = item
+                    break
+                batch.append(item)
+                size += len(item[0])
+
+            try:
+                vectors = self._embed([text for texts, _ in batch for text in texts])
+            except Exception as exc:
+                self.stats["errors"] += 1
+                for _, fut in batch:
+                    fut.set_exception(exc)
+                continue
+
+            self.stats["batches"] += 1
+            self.stats["texts"] += size
+            offset = 0
+            for texts, fut in batch:
+                fut.set_result(vectors[offset:offset + len(texts)])
+                offset += len(texts)
+
+
+_provider: Optional[EmbeddingProvider] = None
+_batcher: Optional[MicroBatcher] = None
+_init_lock = threading.Lock()
+_cache_stats = {"cache_hits": 0, "cache_misses": 0}
+
+
+def get_embedder() -> Optional[EmbeddingProvider]:
+    """The configured provider, or None when EMBEDDING_PROVIDER=none."""
+    global _provider, _batcher
+    if EMBEDDING_PROVIDER.lower() == "none":
+        return None
+    with _init_lock:
+        if _provider is None:
+            _provider = get_provider(EMBEDDING_PROVIDER, EMBEDDING_DIM)
+            _batcher = MicroBatcher(_provider.embed, EMBEDDING_BATCH_SIZE, EMBEDDING_BATCH_WAIT_MS / 1000)
+    return _provider
+
+
+def _insert_ignoring_duplicates(db: Session):
+    # another worker may have cached the same text since we looked
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        return postgresql.insert(EmbeddingCache).on_conflict_do_nothing()
+    if dialect == "sqlite":
+        return sqlite.insert(EmbeddingCache).on_conflict_do_nothing()
+    raise RuntimeError(f"Embedding cache does not support the {dialect} dialect")
+
+
+def embed_texts(db: Session, texts: Sequence[str]) -> np.ndarray:
+    """Vectors for ``texts``, from the cache where possible.
+
+    Texts are keyed by their sha256, so repeated chunks, re-uploads and files
+    deduplicated by content are embedded once per model. New vectors are
+    added to ``db`` and persist when the caller commits.
+    """
+    embedder = get_embedder()
+    if embedder is None:
+        raise RuntimeError("Embeddings are disabled (EMBEDDING_PROVIDER=none)")
+
+    keys = [hashlib.sha256(text.encode("utf-8")).hexdigest() for text in texts]
+    cached = {
+        sha: np.frombuffer(blob, dtype=np.float32)
+        for sha, blob in db.execute(
+            select(EmbeddingCache.text_sha256, EmbeddingCache.vector).where(
+                EmbeddingCache.model == embedder.model,
+                EmbeddingCache.text_sha256.in_(set(keys)),
+            )
+        ).all()
+    }
+    cached = {sha: vector for sha, vector in cached.items() if len(vector) == embedder.dim}
+
+    missing = {sha: text for sha, text in zip(keys, texts) if sha not in cached}
+    _cache_stats["cache_hits"] += len(keys) - sum(1 for sha in keys if sha in missing)
+    _cache_stats["cache_misses"] += len(missing)
+
+    if missing:
+        vectors = _batcher.embed(list(missing.values()))
+        fresh = dict(zip(missing, vectors))
+        db.execute(
+            _insert_ignoring_duplicates(db),
+            [{"model": embedder.model, "text_sha256": sha, "vector": vec.astype(np.float32).tobytes()} for sha, vec in fresh.items()],
+        )
+        cached.update(fresh)
+
+    if not keys:
+        return np.empty((0, embedder.dim), dtype=np.float32)
+    return np.stack([cached[sha] for sha in keys])
+
+
+def embed_query(text: str) -> np.ndarray:
+    """Vector for a search query; goes through the batcher but not the cache."""
+    if get_embedder() is None:
+        raise RuntimeError("Embeddings are disabled (EMBEDDING_PROVIDER=none)")
+    return _batcher.embed([text])[0]
+
+
+def embedding_stats() -> dict:
+    embedder = get_embedder()
+    if embedder is None:
+        return {"provider": "none"}
+    return {
+        "provider": embedder.name,
+        "model": embedder.model,
+        "dim": embedder.dim,
+        **_cache_stats,
+        **_batcher.stats,
+    }
@@ -0,0 +1,160 @@
+from __future__ import annotations
+
+import codecs
+import shutil
+import tempfile
+import zipfile
+from html.parser import HTMLParser
+from pathlib import Path
+from typing import BinaryIO, Callable, Iterator, Optional
+from xml.etree.ElementTree import iterparse
+
+from app.services.storage import open_stored
+
+# Text comes out of every extractor as an iterator of pieces, so a document is
+# never held in memory as a whole; the chunker consumes the pieces as they come.
+
+READ_BLOCK = 64 * 1024
+
+
+class UnsupportedFormat(Exception):
+    """The file is not a format we can pull text out of."""
+
+
+def _iter_plain(f: BinaryIO) -> Iterator[str]:
+    # incremental decoder: a multi-byte character split across blocks is fine
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    while block := f.read(READ_BLOCK):
+        text = decoder.decode(block)
+        if text:
+            yield text
+    tail = decoder.decode(b"", final=True)
+    if tail:
+        yield tail
+
+
+class _HTMLText(HTMLParser):
+    _SKIP = {"script", "style", "noscript", "template"}
+    _BREAKS = {"p", "div", "br", "li", "tr", "h1", "h2", "h3", "h4", "h5", "h6", "section", "article"}
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.pieces: list[str] = []
+        self._skipping = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self._SKIP:
+            self._skipping += 1
+        elif tag in self._BREAKS:
+            self.pieces.append("\n")
+
+    def handle_endtag(self, tag):
+        if tag in self._SKIP and self._skipping:
+            self._skipping -= 1
+        elif tag in self._BREAKS:
+            self.pieces.append("\n")
+
+    def handle_data(self, data):
+        if not self._skipping:
+            self.pieces.append(data)
+
+
+def _iter_html(f: BinaryIO) -> Iterator[str]:
+    parser = _HTMLText()
+    for block in _iter_plain(f):
+        parser.feed(block)
+        if parser.pieces:
+            yield "".join(parser.pieces)
+            parser.pieces.clear()
+    parser.close()
+    if parser.pieces:
+        yield "".join(parser.pieces)
+
+
+def _iter_pdf(f: BinaryIO) -> Iterator[str]:
+    try:
+        from pypdf import PdfReader
+    except ImportError:
+        raise UnsupportedFormat("PDF extraction needs the pypdf package")
+
+    # pypdf parses page objects lazily; only one page's text is alive at a time
+    reader = PdfReader(f)
+    for page in reader.pages:
+        text = page.extract_text() or ""
+        if text:
+            yield text + "\n"
+
+
+_W = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+
+
+def _iter_docx(f: BinaryIO) -> Iterator[str]:
+    try:
+        archive = zipfile.ZipFile(f)
+    except zipfile.BadZipFile:
+        raise UnsupportedFormat("Not a valid .docx file")
+
+    with archive, archive.open("word/document.xml") as xml:
+        paragraph: list[str] = []
+        for event, elem in iterparse(xml, events=("end",)):
+            if elem.tag == f"{_W}t" and elem.text:
+                paragraph.append(elem.text)
+            elif elem.tag == f"{_W}tab":
+                paragraph.append("\t")
+            elif elem.tag == f"{_W}p":
+                yield "".join(paragraph) + "\n"
+                paragraph.clear()
+                elem.clear()  # drop the finished paragraph's subtree
+
+
+_BY_SUFFIX: dict[str, Callable[[BinaryIO], Iterator[str]]] = {
+    ".txt": _iter_plain,
+    ".md": _iter_plain,
+    ".markdown": _iter_plain,
+    ".csv": _iter_plain,
+    ".json": _iter_plain,
+    ".html": _iter_html,
+    ".htm": _iter_html,
+    ".pdf": _iter_pdf,
+    ".docx": _iter_docx,
+}
+
+_BY_CONTENT_TYPE: dict[str, Callable[[BinaryIO], Iterator[str]]] = {
+    "text/html": _iter_html,
+    "application/pdf": _iter_pdf,
+    "application/vnd.openxmlformats-officedocument.wordprocessingml.document": _iter_docx,
+}
+
+
+# these seek around the file, which a decompressing reader can't do cheaply
+_NEEDS_SEEK = {_iter_pdf, _iter_docx}
+
+
+def _extract(extractor: Callable[[BinaryIO], Iterator[str]], path: str, codec: Optional[str]) -> Iterator[str]:
+    with open_stored(path, codec) as f:
+        if codec is None or extractor not in _NEEDS_SEEK:
+            yield from extractor(f)
+            return
+        with tempfile.TemporaryFile() as spool:
+            shutil.copyfileobj(f, spool, READ_BLOCK)
+            spool.seek(0)
+            yield from extractor(spool)
+
+
+def iter_text(
+    path: str,
+    original_name: str,
+    content_type: Optional[str] = None,
+    codec: Optional[str] = None,
+) -> Iterator[str]:
+    """Stream the text of a stored file, picking the extractor by name, then type.
+
+    ``codec`` is the file's at-rest compression; text comes out decompressed.
+    """
+    extractor = _BY_SUFFIX.get(Path(original_name).suffix.lower())
+    if extractor is None and content_type:
+        mime = content_type.split(";")[0].strip().lower()
+        extractor = _BY_CONTENT_TYPE.get(mime) or (_iter_plain if mime.startswith("text/") else None)
+    if extractor is None:
+        raise UnsupportedFormat(f"No text extractor for {original_name!r} ({content_type or 'unknown type'})")
+    return _extract(extractor, path, codec)
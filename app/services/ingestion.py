@@ -0,0 +1,260 @@
+from __future__ import annotations
+
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from typing import TYPE_CHECKING, Iterable, Optional
+
+from sqlalchemy import delete, func, insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core import metrics
+from app.db.database import SessionLocal
+from app.models.chunk import FileChunk
+from app.models.file import FileRecord
+from app.models.ingestion_job import IngestionJob
+from app.services.chunking import chunk_text
+from app.services.extract import UnsupportedFormat, iter_text
+from app.services.storage import run_io
+
+if TYPE_CHECKING:
+    from app.services.vector_store import VectorStore
+
+
+# Uploads only queue a job row (same transaction as the FileRecord); a
+# dispatcher per process claims queued jobs and runs them on this pool, so
+# extraction never holds up a request. Claiming is a conditional UPDATE, so
+# several workers can share one queue.
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", "2"))
+INGEST_CHUNK_CHARS = int(os.getenv("INGEST_CHUNK_CHARS", "1000"))
+INGEST_CHUNK_OVERLAP = int(os.getenv("INGEST_CHUNK_OVERLAP", "200"))
+INGEST_POLL_SECONDS = float(os.getenv("INGEST_POLL_SECONDS", "10"))
+# a job "running" for longer than this is assumed lost (worker died) and requeued
+INGEST_STALE_SECONDS = int(os.getenv("INGEST_STALE_SECONDS", "3600"))
+
+# chunks written (and committed) per batch, so a long document shows progress
+# and never sits in one huge transaction
+_INSERT_BATCH = 256
+
+_pool = ThreadPoolExecutor(max_workers=max(INGEST_WORKERS, 1), thread_name_prefix="ingest")
+
+_stats = {"loop_errors": 0, "last_error": None}
+
+_wake: Optional[asyncio.Event] = None
+_loop_task: Optional[asyncio.Task] = None
+_in_flight: set = set()
+
+
+@metrics.collector
+def _pool_gauges() -> None:
+    # jobs are only claimed for free workers, so nothing queues on the pool
+    metrics.pool_gauges("ingest", max(INGEST_WORKERS, 1), len(_in_flight), 0)
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+async def enqueue_ingestion(db: AsyncSession, file_ids: Iterable[int]) -> None:
+    """Queue extraction for ``file_ids``; commits with ``db``."""
+    rows = [{"file_id": file_id, "status": "queued", "chunk_count": 0} for file_id in file_ids]
+    if rows:
+        await db.execute(insert(IngestionJob), rows)
+
+
+def _claim(limit: int) -> list[int]:
+    with SessionLocal() as db:
+        db.execute(
+            update(IngestionJob)
+            .where(
+                IngestionJob.status == "running",
+                IngestionJob.started_at < _now() - timedelta(seconds=INGEST_STALE_SECONDS),
+            )
+            .values(status="queued")
+        )
+        candidates = db.execute(
+            select(IngestionJob.id).where(IngestionJob.status == "queued").order_by(IngestionJob.id).limit(limit)
+        ).scalars().all()
+
+        claimed = []
+        for job_id in candidates:
+            taken = db.execute(
+                update(IngestionJob)
+                .where(IngestionJob.id == job_id, IngestionJob.status == "queued")
+                .values(status="running", started_at=_now(), error=None)
+            )
+            if taken.rowcount:
+                claimed.append(job_id)
+        db.commit()
+        return claimed
+
+
+def _finish(db, job_id: int, status: str, chunk_count: int = 0, error: Optional[str] = None) -> None:
+    db.execute(
+        update(IngestionJob)
+        .where(IngestionJob.id == job_id)
+        .values(status=status, chunk_count=chunk_count, error=error, finished_at=_now())
+    )
+    db.commit()
+
+
+def vector_store() -> Optional[VectorStore]:
+    """Store for the configured embedding model (None with embeddings off)."""
+    # embeddings and the store load numpy; import on first use (or in the
+    # start-up warm-up) so workers don't pay for it before serving
+    from app.services.embeddings import get_embedder
+    from app.services.vector_store import get_vector_store
+
+    embedder = get_embedder()
+    return get_vector_store(embedder.model, embedder.dim) if embedder is not None else None
+
+
+def drop_vectors(file_ids: Iterable[int]) -> None:
+    """Tombstone the vectors of ``file_ids``; call once their deletion has committed."""
+    store = vector_store()
+    file_ids = list(file_ids)
+    if store is not None and file_ids:
+        store.remove_files(file_ids)
+
+
+def _drop_chunks(db, file_id: int) -> None:
+    db.execute(delete(FileChunk).where(FileChunk.file_id == file_id))
+    db.commit()
+    drop_vectors([file_id])
+
+
+def run_job(job_id: int) -> str:
+    """Extract and chunk one file. Blocking; returns the final job status."""
+    from app.services.embeddings import embed_texts
+
+    with SessionLocal() as db:
+        file_id = db.execute(select(IngestionJob.file_id).where(IngestionJob.id == job_id)).scalar()
+        rec = db.get(FileRecord, file_id) if file_id is not None else None
+        if rec is None:
+            if file_id is not None:
+                _finish(db, job_id, "failed", error="File no longer exists")
+            return "failed"
+
+        # commits expire rec, and reloading it fails once the file is deleted
+        owner_id = rec.owner_id
+
+        # re-runs replace whatever an earlier run stored
+        _drop_chunks(db, file_id)
+
+        store = vector_store()
+        count, rows = 0, []
+
+        def flush() -> None:
+            nonlocal count
+            # embed before writing so the write transaction stays short;
+            # cache rows for new texts commit together with the chunks
+            vectors = embed_texts(db, [row["text"] for row in rows]) if store is not None else None
+            chunk_ids = db.execute(
+                insert(FileChunk).returning(FileChunk.id, sort_by_parameter_order=True), rows
+            ).scalars().all()
+            count += len(rows)
+            rows.clear()
+            db.execute(update(IngestionJob).where(IngestionJob.id == job_id).values(chunk_count=count))
+            db.commit()
+            if store is not None:
+                n = len(chunk_ids)
+                store.add(chunk_ids, [file_id] * n, [owner_id] * n, vectors)
+
+        try:
+            pieces = iter_text(rec.storage_path, rec.original_name, rec.content_type, rec.codec)
+            for chunk in chunk_text(pieces, INGEST_CHUNK_CHARS, INGEST_CHUNK_OVERLAP):
+                rows.append({"file_id": file_id, **chunk._asdict()})
+                if len(rows) >= _INSERT_BATCH:
+                    flush()
+            if rows:
+                flush()
+        except UnsupportedFormat as exc:
+            db.rollback()
+            _drop_chunks(db, file_id)
+            status, error = "skipped", str(exc)
+        except Exception as exc:
+            db.rollback()
+            _drop_chunks(db, file_id)
+            status, error = "failed", f"{type(exc).__name__}: {exc}"
+        else:
+            status, error = "done", None
+
+        # the file may have been deleted while we were writing its chunks
+        if db.execute(select(FileRecord.id).where(FileRecord.id == file_id)).scalar() is None:
+            _drop_chunks(db, file_id)
+            status, error, count = "failed", "File was deleted during ingestion", 0
+
+        _finish(db, job_id, status, count if status == "done" else 0, error)
+        return status
+
+
+async def _run() -> None:
+    loop = asyncio.get_running_loop()
+
+    def _done(fut) -> None:
+        _in_flight.discard(fut)
+        if _wake is not None:
+            _wake.set()
+
+    while True:
+        _wake.clear()
+        free = max(INGEST_WORKERS, 1) - len(_in_flight)
+        if free > 0:
+            try:
+                for job_id in await run_io(_claim, free):
+                    fut = loop.run_in_executor(_pool, run_job, job_id)
+                    _in_flight.add(fut)
+                    fut.add_done_callback(_done)
+            except Exception as exc:
+                # database unavailable etc.; queued jobs stay queued, retry next round
+                _stats["loop_errors"] += 1
+                _stats["last_error"] = repr(exc)
+
+        try:
+            await asyncio.wait_for(_wake.wait(), INGEST_POLL_SECONDS)
+        except asyncio.TimeoutError:
+            pass
+
+
+def wake_ingestion() -> None:
+    """Look for queued jobs now instead of at the next poll (no-op if not running)."""
+    if _wake is not None:
+        _wake.set()
+
+
+def start_ingestion() -> None:
+    global _wake, _loop_task
+    if _loop_task is None:
+        _wake = asyncio.Event()
+        _loop_task = asyncio.create_task(_run())
+
+
+async def stop_ingestion() -> None:
+    global _wake, _loop_task
+    if _loop_task is not None:
+        _loop_task.cancel()
+        try:
+            await _loop_task
+        except asyncio.CancelledError:
+            pass
+    # jobs still on the pool finish on their own; ones cut off by process exit
+    # are requeued once INGEST_STALE_SECONDS have passed
+    _wake, _loop_task = None, None
+
+
+def ingestion_stats() -> dict:
+    from app.services.embeddings import embedding_stats
+
+    with SessionLocal() as db:
+        by_status = dict(db.execute(select(IngestionJob.status, func.count()).group_by(IngestionJob.status)).all())
+    store = vector_store()
+    return {
+        "jobs": by_status,
+        "in_flight": len(_in_flight),
+        "workers": INGEST_WORKERS,
+        "running": _loop_task is not None,
+        **_stats,
+        "embeddings": embedding_stats(),
+        "vectors": store.stats() if store is not None else None,
+    }
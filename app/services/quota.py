@@ -0,0 +1,74 @@
+from __future__ import annotations
+
+import os
+from collections import Counter
+from typing import Iterable, Optional
+
+from fastapi import HTTPException
+from sqlalchemy import case, func, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.user import User
+
+
+# Default per-user storage quota in bytes (unset = unlimited); admins can
+# override it per user (users.storage_quota_bytes). Counted on size_bytes,
+# the original size, whether or not the bytes are deduplicated or compressed.
+STORAGE_QUOTA_BYTES: Optional[int] = (
+    int(os.getenv("STORAGE_QUOTA_BYTES")) if os.getenv("STORAGE_QUOTA_BYTES") else None
+)
+
+# users.storage_used_bytes is never recomputed with a SUM over files: every
+# insert and delete of FileRecords adjusts it in the same transaction.
+_quota = (
+    func.coalesce(User.storage_quota_bytes, STORAGE_QUOTA_BYTES)
+    if STORAGE_QUOTA_BYTES is not None
+    else User.storage_quota_bytes
+)
+
+
+def quota_exceeded() -> HTTPException:
+    return HTTPException(status_code=413, detail="Storage quota exceeded")
+
+
+async def storage_room(db: AsyncSession, user_id: int) -> Optional[int]:
+    """Bytes ``user_id`` may still store, None when unlimited."""
+    row = (await db.execute(select(User.storage_used_bytes, _quota).where(User.id == user_id))).first()
+    if row is None or row[1] is None:
+        return None
+    return max(row[1] - row[0], 0)
+
+
+async def reserve_storage(db: AsyncSession, user_id: int, nbytes: int) -> None:
+    """Count ``nbytes`` of new files against ``user_id``; commits with ``db``.
+
+    Check and increment are one conditional UPDATE, so concurrent uploads
+    can't both squeeze into the last bit of room. Raises 413 when over.
+    """
+    if not nbytes:
+        return
+    result = await db.execute(
+        update(User)
+        .where(User.id == user_id, or_(_quota.is_(None), User.storage_used_bytes + nbytes <= _quota))
+        .values(storage_used_bytes=User.storage_used_bytes + nbytes)
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount != 1:
+        raise quota_exceeded()
+
+
+async def release_storage(db: AsyncSession, freed: Iterable[tuple[int, int]]) -> None:
+    """Give back the ``(owner_id, size_bytes)`` of deleted files; commits with ``db``."""
+    per_owner: Counter = Counter()
+    for owner_id, size in freed:
+        per_owner[owner_id] += size or 0
+    for owner_id, nbytes in per_owner.items():
+        if nbytes:
+            await db.execute(
+                update(User)
+                .where(User.id == owner_id)
+                .values(storage_used_bytes=case(
+                    (User.storage_used_bytes > nbytes, User.storage_used_bytes - nbytes), else_=0
+                ))
+                .execution_options(synchronize_session=False)
+            )
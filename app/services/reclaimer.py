@@ -0,0 +1,160 @@
+from __future__ import annotations
+
+import asyncio
+import os
+from datetime import datetime, timedelta, timezone
+from typing import Iterable, Optional
+
+from sqlalchemy import delete, func, insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.database import SessionLocal
+from app.models.chunk import FileChunk
+from app.models.file import FileRecord
+from app.models.ingestion_job import IngestionJob
+from app.models.reclaim import ReclaimTask
+from app.services.quota import release_storage
+from app.services.storage import release_blobs, run_io, unlink_if_unreferenced
+
+
+# Deletes only touch the database: the files they release are queued in
+# reclaim_queue (same transaction) and removed from disk here, in the
+# background, with retries. Every worker process runs one loop; removal is
+# idempotent, so two workers picking the same task is harmless.
+RECLAIM_INTERVAL_SECONDS = float(os.getenv("RECLAIM_INTERVAL_SECONDS", "30"))
+RECLAIM_BATCH = int(os.getenv("RECLAIM_BATCH", "200"))
+RECLAIM_MAX_BACKOFF_SECONDS = int(os.getenv("RECLAIM_MAX_BACKOFF_SECONDS", "3600"))
+
+_ID_BATCH = 500
+
+_stats = {"reclaimed": 0, "skipped": 0, "failed": 0, "loop_errors": 0, "last_error": None}
+
+_wake: Optional[asyncio.Event] = None
+_loop_task: Optional[asyncio.Task] = None
+
+
+async def enqueue_reclaim(db: AsyncSession, released: Iterable[tuple[Optional[str], str]]) -> int:
+    """Queue ``(sha256, storage_path)`` pairs for removal; commits with ``db``."""
+    rows = [
+        {"storage_path": path, "sha256": sha256_hex, "attempts": 0}
+        for sha256_hex, path in dict.fromkeys(released)
+        if path
+    ]
+    if rows:
+        await db.execute(insert(ReclaimTask), rows)
+    return len(rows)
+
+
+async def delete_files(db: AsyncSession, *criteria) -> list[int]:
+    """Delete every FileRecord matching ``criteria`` in one statement.
+
+    Their chunks and ingestion jobs go too, blob references and the
+    owners' storage usage are released and the freed files queued, all in
+    the same transaction. The caller commits, then calls wake_reclaimer().
+    """
+    rows = (
+        await db.execute(
+            delete(FileRecord)
+            .where(*criteria)
+            .returning(
+                FileRecord.id, FileRecord.owner_id, FileRecord.size_bytes, FileRecord.sha256, FileRecord.storage_path
+            )
+        )
+    ).all()
+    file_ids = [row.id for row in rows]
+    for start in range(0, len(file_ids), _ID_BATCH):
+        batch = file_ids[start:start + _ID_BATCH]
+        await db.execute(delete(FileChunk).where(FileChunk.file_id.in_(batch)))
+        await db.execute(delete(IngestionJob).where(IngestionJob.file_id.in_(batch)))
+
+    await release_storage(db, [(row.owner_id, row.size_bytes) for row in rows])
+    released = await release_blobs(db, [(row.sha256, row.storage_path) for row in rows])
+    await enqueue_reclaim(db, released)
+    return file_ids
+
+
+def reclaim_due(limit: int = RECLAIM_BATCH) -> int:
+    """Work through up to ``limit`` due tasks. Blocking; returns how many were tried."""
+    with SessionLocal() as db:
+        tasks = db.execute(
+            select(ReclaimTask.id, ReclaimTask.storage_path, ReclaimTask.sha256, ReclaimTask.attempts)
+            .where(ReclaimTask.not_before <= func.now())
+            .order_by(ReclaimTask.id)
+            .limit(limit)
+        ).all()
+
+        done: list[int] = []
+        for task in tasks:
+            try:
+                removed = unlink_if_unreferenced(db, task.storage_path, task.sha256)
+            except OSError as exc:
+                attempts = task.attempts + 1
+                backoff = min(2 ** attempts, RECLAIM_MAX_BACKOFF_SECONDS)
+                db.execute(
+                    update(ReclaimTask)
+                    .where(ReclaimTask.id == task.id)
+                    .values(
+                        attempts=attempts,
+                        last_error=f"{type(exc).__name__}: {exc}",
+                        not_before=datetime.now(timezone.utc) + timedelta(seconds=backoff),
+                    )
+                )
+                _stats["failed"] += 1
+                _stats["last_error"] = f"{task.storage_path}: {exc}"
+            else:
+                done.append(task.id)
+                _stats["reclaimed" if removed else "skipped"] += 1
+
+        if done:
+            db.execute(delete(ReclaimTask).where(ReclaimTask.id.in_(done)))
+        db.commit()
+        return len(tasks)
+
+
+async def _run() -> None:
+    while True:
+        _wake.clear()
+        try:
+            while await run_io(reclaim_due) >= RECLAIM_BATCH:
+                pass
+        except Exception as exc:
+            # database unavailable etc.; the queue is durable, try again next round
+            _stats["loop_errors"] += 1
+            _stats["last_error"] = repr(exc)
+
+        try:
+            await asyncio.wait_for(_wake.wait(), RECLAIM_INTERVAL_SECONDS)
+        except asyncio.TimeoutError:
+            pass
+
+
+def wake_reclaimer() -> None:
+    """Start a pass now instead of at the next interval (no-op if not running)."""
+    if _wake is not None:
+        _wake.set()
+
+
+def start_reclaimer() -> None:
+    global _wake, _loop_task
+    if _loop_task is None:
+        _wake = asyncio.Event()
+        _loop_task = asyncio.create_task(_run())
+
+
+async def stop_reclaimer() -> None:
+    global _wake, _loop_task
+    if _loop_task is not None:
+        _loop_task.cancel()
+        try:
+            await _loop_task
+        except asyncio.CancelledError:
+            pass
+    _wake, _loop_task = None, None
+
+
+def reclaim_stats() -> dict:
+    with SessionLocal() as db:
+        pending, retrying = db.execute(
+            select(func.count(), func.count().filter(ReclaimTask.attempts > 0)).select_from(ReclaimTask)
+        ).one()
+    return {"pending": pending, "retrying": retrying, "running": _loop_task is not None, **_stats}
@@ -0,0 +1,155 @@
+"""Move stored files into the current UPLOAD_LAYOUT, online.
+
+    python -m app.services.relayout [--batch 500] [--grace 600] [--dry-run]
+
+Runs next to live API workers. Files are walked by id in batches; for each
+file not yet at its layout path the bytes are copied (a hard link on local
+disk, a server-side copy on S3), then the row is repointed with a
+compare-and-set UPDATE and the old path is queued in reclaim_queue,
+``--grace`` seconds out so downloads that already read the old path finish
+first. The API's reclaimer does the removal. CAS blobs move once, with the
+Blob row and every FileRecord sharing them in the same transaction.
+
+Interrupting is safe: a re-run skips what already moved and an orphaned
+copy from a half-done batch is overwritten or ignored.
+"""
+from __future__ import annotations
+
+import argparse
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Optional
+
+from sqlalchemy import insert, select, update
+
+from app.db.database import SessionLocal
+from app.models.blob import Blob
+from app.models.file import FileRecord
+from app.models.reclaim import ReclaimTask
+from app.services.backends import get_backend
+from app.services.storage import BLOB_DIR, UPLOAD_DIR, UPLOAD_LAYOUT, layout_path
+
+
+def _target(storage_path: str, directory: str) -> str:
+    return str(layout_path(directory, Path(storage_path).name))
+
+
+def _move_batch(db, rows, grace: float, dry_run: bool, stats: dict) -> None:
+    backend = get_backend()
+    blobs = dict(
+        db.execute(
+            select(Blob.sha256, Blob.storage_path).where(Blob.sha256.in_({r.sha256 for r in rows if r.sha256}))
+        ).all()
+    )
+
+    # (sha256 or None, old, new, file id or None for a blob)
+    moves: list[tuple[Optional[str], str, str, Optional[int]]] = []
+    repoint: list[tuple[str, str, str, int]] = []
+    seen_blobs = set()
+    misplaced = 0
+    for row in rows:
+        blob_path = blobs.get(row.sha256) if row.sha256 else None
+        if blob_path == row.storage_path:
+            new = _target(row.storage_path, BLOB_DIR)
+            misplaced += new != row.storage_path
+            if new != row.storage_path and row.sha256 not in seen_blobs:
+                seen_blobs.add(row.sha256)
+                moves.append((row.sha256, row.storage_path, new, None))
+        elif blob_path is not None:
+            # adopted the blob's old path just before an earlier run moved it
+            misplaced += 1
+            repoint.append((row.sha256, row.storage_path, blob_path, row.id))
+        else:
+            new = _target(row.storage_path, UPLOAD_DIR)
+            misplaced += new != row.storage_path
+            if new != row.storage_path:
+                moves.append((None, row.storage_path, new, row.id))
+
+    stats["checked"] += len(rows)
+    stats["misplaced"] += misplaced
+    if dry_run:
+        return
+
+    copied = []
+    for sha, old, new, file_id in moves:
+        try:
+            backend.copy(old, new)
+        except FileNotFoundError:
+            stats["missing"] += 1  # deleted meanwhile, or lost; leave the row alone
+            continue
+        copied.append((sha, old, new, file_id))
+
+    reclaim, unused = [], []
+    not_before = datetime.now(timezone.utc) + timedelta(seconds=grace)
+    for sha, old, new, file_id in copied:
+        if file_id is None:
+            moved = db.execute(
+                update(Blob).where(Blob.sha256 == sha, Blob.storage_path == old).values(storage_path=new)
+            ).rowcount
+            if moved:
+                db.execute(
+                    update(FileRecord)
+                    .where(FileRecord.sha256 == sha, FileRecord.storage_path == old)
+                    .values(storage_path=new)
+                )
+        else:
+            moved = db.execute(
+                update(FileRecord).where(FileRecord.id == file_id, FileRecord.storage_path == old).values(storage_path=new)
+            ).rowcount
+        if moved:
+            reclaim.append({"storage_path": old, "sha256": sha, "attempts": 0, "not_before": not_before})
+        else:
+            unused.append(new)  # the file or blob went away while we copied
+    for sha, old, new, file_id in repoint:
+        if db.execute(
+            update(FileRecord).where(FileRecord.id == file_id, FileRecord.storage_path == old).values(storage_path=new)
+        ).rowcount:
+            reclaim.append({"storage_path": old, "sha256": sha, "attempts": 0, "not_before": not_before})
+
+    if reclaim:
+        db.execute(insert(ReclaimTask), reclaim)
+    db.commit()
+
+    for new in unused:
+        backend.delete(new)
+    stats["moved"] += len(reclaim)
+
+
+def relayout(batch: int = 500, grace: float = 600, dry_run: bool = False, pause: float = 0.0) -> dict:
+    # checked / misplaced count files, moved counts paths (a CAS blob is one
+    # path however many files share it)
+    stats = {"checked": 0, "misplaced": 0, "moved": 0, "missing": 0}
+    last_id = 0
+    with SessionLocal() as db:
+        while True:
+            rows = db.execute(
+                select(FileRecord.id, FileRecord.sha256, FileRecord.storage_path)
+                .where(FileRecord.id > last_id)
+                .order_by(FileRecord.id)
+                .limit(batch)
+            ).all()
+            if not rows:
+                break
+            last_id = rows[-1].id
+            _move_batch(db, rows, grace, dry_run, stats)
+            if pause:
+                time.sleep(pause)  # leave the disk / database some room for live traffic
+    return stats
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Move stored files into the current UPLOAD_LAYOUT")
+    parser.add_argument("--batch", type=int, default=500, help="files per transaction")
+    parser.add_argument("--grace", type=float, default=600, help="seconds before old paths are reclaimed")
+    parser.add_argument("--pause", type=float, default=0.0, help="seconds to sleep between batches")
+    parser.add_argument("--dry-run", action="store_true", help="only count misplaced files")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    stats = relayout(args.batch, args.grace, args.dry_run, args.pause)
+    print(f"{stats} in {time.perf_counter() - start:.1f}s (layout={UPLOAD_LAYOUT})")
+
+
+if __name__ == "__main__":
+    main()
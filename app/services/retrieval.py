@@ -0,0 +1,163 @@
+from __future__ import annotations
+
+import asyncio
+import os
+import time
+from typing import TYPE_CHECKING, NamedTuple, Optional
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.chunk import FileChunk
+from app.models.file import FileRecord
+from app.services.ingestion import vector_store
+from app.services.search import chunk_snippets, lexical_search
+
+if TYPE_CHECKING:
+    from app.services.vector_store import Hit
+
+
+# Hybrid retrieval: lexical (full-text) and vector search run concurrently,
+# each returns its best chunk per file, and the two file rankings are merged
+# with reciprocal rank fusion: score = sum over retrievers of 1 / (k + rank).
+HYBRID_RRF_K = int(os.getenv("HYBRID_RRF_K", "60"))
+
+# Vector hits below this cosine similarity are dropped: every chunk has
+# *some* similarity to any query, and without a floor unrelated files would
+# fill the list. The default suits the hashing provider; raise it for
+# learned embeddings, whose unrelated pairs often score 0.2 or more.
+HYBRID_MIN_SIMILARITY = float(os.getenv("HYBRID_MIN_SIMILARITY", "0.1"))
+
+# vector hits are per chunk; fetch this many per wanted file so that
+# several chunks of one file do not crowd out the rest
+VECTOR_OVERFETCH = 4
+
+
+class Passage(NamedTuple):
+    file: FileRecord
+    score: float  # fused RRF score
+    chunk: Optional[FileChunk]  # None for a file matched only by its name
+    snippet: Optional[str]
+    lexical_rank: Optional[int]
+    vector_rank: Optional[int]
+    vector_score: Optional[float]
+
+
+class HybridResult(NamedTuple):
+    passages: list[Passage]
+    retrievers: list[str]
+    timings_ms: dict[str, float]
+
+
+def _ms(start: float) -> float:
+    return round((time.perf_counter() - start) * 1000, 3)
+
+
+async def _vector_ranking(query: str, owner_id: int, n: int, timings: dict) -> list[Hit]:
+    from app.services.embeddings import embed_query
+
+    store = vector_store()
+    start = time.perf_counter()
+    # CPU work; the default executor keeps it off the upload I/O pool
+    vector = await asyncio.to_thread(embed_query, query)
+    timings["embed"] = _ms(start)
+
+    start = time.perf_counter()
+    hits = await asyncio.to_thread(store.search, vector, n * VECTOR_OVERFETCH, owner_id)
+    best: dict[int, Hit] = {}
+    for hit in hits:  # best first, so the first hit per file is its best chunk
+        if hit.score < HYBRID_MIN_SIMILARITY:
+            break
+        best.setdefault(hit.file_id, hit)
+    timings["vector"] = _ms(start)
+    return list(best.values())[:n]
+
+
+async def _lexical_ranking(db: AsyncSession, query: str, owner_id: int, n: int, timings: dict):
+    start = time.perf_counter()
+    # snippets are fetched after fusion, for the few chunks that survive it
+    hits = await lexical_search(db, query, owner_id, limit=n, snippets=False)
+    timings["lexical"] = _ms(start)
+    return hits
+
+
+async def hybrid_search(db: AsyncSession, query: str, owner_id: int, k: int = 8, candidates: int = 50) -> HybridResult:
+    """Top ``k`` passages of ``owner_id``'s files for ``query``, one per file."""
+    total = time.perf_counter()
+    timings: dict[str, float] = {}
+
+    use_vectors = vector_store() is not None
+    retrievers = ["lexical", "vector"] if use_vectors else ["lexical"]
+
+    start = time.perf_counter()
+    if use_vectors:
+        lexical, vector = await asyncio.gather(
+            _lexical_ranking(db, query, owner_id, candidates, timings),
+            _vector_ranking(query, owner_id, candidates, timings),
+        )
+    else:
+        lexical, vector = await _lexical_ranking(db, query, owner_id, candidates, timings), []
+    timings["retrieve"] = _ms(start)  # wall time of both retrievers together
+
+    start = time.perf_counter()
+    fused: dict[int, dict] = {}
+
+    def entry(file_id: int) -> dict:
+        return fused.setdefault(file_id, {
+            "score": 0.0, "lexical_rank": None, "vector_rank": None,
+            "lexical_chunk": None, "vector_chunk": None, "vector_score": None,
+        })
+
+    for rank, hit in enumerate(lexical, 1):
+        e = entry(hit.file_id)
+        e["score"] += 1.0 / (HYBRID_RRF_K + rank)
+        e.update(lexical_rank=rank, lexical_chunk=hit.chunk_id)
+    for rank, hit in enumerate(vector, 1):
+        e = entry(hit.file_id)
+        e["score"] += 1.0 / (HYBRID_RRF_K + rank)
+        e.update(vector_rank=rank, vector_chunk=hit.chunk_id, vector_score=hit.score)
+
+    top = sorted(fused.items(), key=lambda item: (-item[1]["score"], -item[0]))[:k]
+
+    # the passage comes from whichever retriever ranked the file higher
+    chosen = {}
+    for file_id, e in top:
+        lexical_wins = e["lexical_chunk"] is not None and (
+            e["vector_rank"] is None or e["lexical_rank"] <= e["vector_rank"]
+        )
+        chosen[file_id] = e["lexical_chunk"] if lexical_wins else e["vector_chunk"]
+    timings["fusion"] = _ms(start)
+
+    start = time.perf_counter()
+    files, chunks, snippets = {}, {}, {}
+    if top:
+        # also drops vectors of files deleted since they were indexed
+        rows = await db.execute(
+            select(FileRecord).where(FileRecord.id.in_([file_id for file_id, _ in top]), FileRecord.owner_id == owner_id)
+        )
+        files = {rec.id: rec for rec in rows.scalars()}
+        chunk_ids = [chunk_id for chunk_id in chosen.values() if chunk_id is not None]
+        if chunk_ids:
+            rows = await db.execute(select(FileChunk).where(FileChunk.id.in_(chunk_ids)))
+            chunks = {chunk.id: chunk for chunk in rows.scalars()}
+            # empty for chunks only the vector side found and the words miss
+            snippets = await chunk_snippets(db, query, chunk_ids)
+    timings["hydrate"] = _ms(start)
+
+    passages = []
+    for file_id, e in top:
+        if file_id not in files:
+            continue
+        chunk = chunks.get(chosen[file_id])
+        passages.append(Passage(
+            file=files[file_id],
+            score=e["score"],
+            chunk=chunk,
+            snippet=snippets.get(chunk.id) if chunk is not None else None,
+            lexical_rank=e["lexical_rank"],
+            vector_rank=e["vector_rank"],
+            vector_score=e["vector_score"],
+        ))
+
+    timings["total"] = _ms(total)
+    return HybridResult(passages, retrievers, timings)
@@ -0,0 +1,180 @@
+from __future__ import annotations
+
+import os
+import re
+from typing import NamedTuple, Optional
+
+from sqlalchemy import bindparam, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+
+# Lexical search over file names and chunk text, using the full-text indexes
+# from app/models/search_index.py. SQLite ranks with FTS5's bm25(); Postgres
+# has no BM25 built in and uses ts_rank_cd (cover density) instead.
+
+# a name match counts this much more than the best matching chunk
+SEARCH_NAME_WEIGHT = float(os.getenv("SEARCH_NAME_WEIGHT", "2.0"))
+SEARCH_SNIPPET_TOKENS = int(os.getenv("SEARCH_SNIPPET_TOKENS", "24"))
+MAX_QUERY_TERMS = 32
+
+HIGHLIGHT_OPEN, HIGHLIGHT_CLOSE = "<mark>", "</mark>"
+
+
+class LexicalHit(NamedTuple):
+    file_id: int
+    score: float  # higher is better; only comparable within one result list
+    name_highlight: Optional[str]  # set when the name matched
+    chunk_id: Optional[int]  # best matching chunk, if any
+    chunk_seq: Optional[int]
+    snippet: Optional[str]
+
+
+_TERM = re.compile(r"\w+")
+
+
+def query_terms(query: str) -> list[str]:
+    """Words of a user query. Everything else (FTS5 / tsquery operators,
+    quotes, punctuation) is dropped, so any input is a valid query."""
+    return _TERM.findall(query.lower())[:MAX_QUERY_TERMS]
+
+
+# ---- SQLite FTS5 ----
+# bm25() is not allowed inside a window function, hence the CTE
+_SQLITE_CHUNKS = text("""
+    WITH scored AS MATERIALIZED (
+        SELECT rowid AS id, bm25(file_chunks_fts) AS score
+        FROM file_chunks_fts
+        WHERE file_chunks_fts MATCH :q
+    )
+    SELECT id, file_id, seq, -score FROM (
+        SELECT s.id, c.file_id, c.seq, s.score,
+               row_number() OVER (PARTITION BY c.file_id ORDER BY s.score) AS rn
+        FROM scored s
+        JOIN file_chunks c ON c.id = s.id
+        JOIN files f ON f.id = c.file_id
+        WHERE f.owner_id = :owner_id
+    ) WHERE rn = 1
+    ORDER BY score LIMIT :n
+""")
+
+_SQLITE_NAMES = text("""
+    SELECT f.id, -bm25(files_fts), highlight(files_fts, 0, :open, :close)
+    FROM files_fts
+    JOIN files f ON f.id = files_fts.rowid
+    WHERE files_fts MATCH :q AND f.owner_id = :owner_id
+    ORDER BY bm25(files_fts) LIMIT :n
+""")
+
+# snippets only for the chunks that made the page
+_SQLITE_SNIPPETS = text("""
+    SELECT rowid, snippet(file_chunks_fts, 0, :open, :close, '…', :tokens)
+    FROM file_chunks_fts
+    WHERE file_chunks_fts MATCH :q AND rowid IN :ids
+""").bindparams(bindparam("ids", expanding=True))
+
+
+# ---- Postgres tsvector ----
+_PG_CHUNKS = text("""
+    SELECT id, file_id, seq, score FROM (
+        SELECT c.id, c.file_id, c.seq, ts_rank_cd(c.text_tsv, q) AS score,
+               row_number() OVER (PARTITION BY c.file_id ORDER BY ts_rank_cd(c.text_tsv, q) DESC) AS rn
+        FROM file_chunks c
+        JOIN files f ON f.id = c.file_id,
+        to_tsquery('simple', :q) q
+        WHERE c.text_tsv @@ q AND f.owner_id = :owner_id
+    ) best WHERE rn = 1
+    ORDER BY score DESC LIMIT :n
+""")
+
+_PG_NAMES = text("""
+    SELECT f.id, ts_rank_cd(f.name_tsv, q), ts_headline('simple', f.original_name, q, :options)
+    FROM files f, to_tsquery('simple', :q) q
+    WHERE f.name_tsv @@ q AND f.owner_id = :owner_id
+    ORDER BY 2 DESC LIMIT :n
+""")
+
+_PG_SNIPPETS = text("""
+    SELECT c.id, ts_headline('simple', c.text, to_tsquery('simple', :q), :options)
+    FROM file_chunks c
+    WHERE c.id IN :ids
+""").bindparams(bindparam("ids", expanding=True))
+
+
+_MARKS = f'StartSel="{HIGHLIGHT_OPEN}", StopSel="{HIGHLIGHT_CLOSE}"'
+
+
+def _dialect_query(db: AsyncSession, terms: list[str]) -> tuple[str, str]:
+    dialect = db.bind.dialect.name
+    if dialect == "sqlite":
+        return dialect, " ".join(f'"{term}"' for term in terms)
+    if dialect == "postgresql":
+        return dialect, " & ".join(terms)
+    raise RuntimeError(f"Full-text search does not support the {dialect} dialect")
+
+
+async def chunk_snippets(db: AsyncSession, query: str, chunk_ids: list[int]) -> dict[int, str]:
+    """Highlighted snippet per chunk id, for chunks that match ``query``."""
+    terms = query_terms(query)
+    if not terms or not chunk_ids:
+        return {}
+    dialect, q = _dialect_query(db, terms)
+    if dialect == "sqlite":
+        statement, extra = _SQLITE_SNIPPETS, {"open": HIGHLIGHT_OPEN, "close": HIGHLIGHT_CLOSE, "tokens": SEARCH_SNIPPET_TOKENS}
+    else:
+        statement, extra = _PG_SNIPPETS, {"options": f"{_MARKS}, MaxWords={SEARCH_SNIPPET_TOKENS}, MinWords=5"}
+    return dict((await db.execute(statement, {"q": q, "ids": chunk_ids, **extra})).all())
+
+
+async def lexical_search(
+    db: AsyncSession,
+    query: str,
+    owner_id: int,
+    limit: int = 20,
+    offset: int = 0,
+    snippets: bool = True,
+) -> list[LexicalHit]:
+    """Files of ``owner_id`` matching every word of ``query``, best first.
+
+    Each file appears once, scored by its best chunk plus a weighted name
+    match, with a highlighted snippet of that chunk (skipped with
+    ``snippets=False``, for callers that only keep a few hits).
+    """
+    terms = query_terms(query)
+    if not terms:
+        return []
+
+    n = offset + limit
+    dialect, q = _dialect_query(db, terms)
+    params = {"q": q, "owner_id": owner_id, "n": n}
+    if dialect == "sqlite":
+        chunks = (await db.execute(_SQLITE_CHUNKS, params)).all()
+        names = (await db.execute(_SQLITE_NAMES, {**params, "open": HIGHLIGHT_OPEN, "close": HIGHLIGHT_CLOSE})).all()
+    else:
+        chunks = (await db.execute(_PG_CHUNKS, params)).all()
+        names = (await db.execute(_PG_NAMES, {**params, "options": f"{_MARKS}, HighlightAll=true"})).all()
+
+    merged: dict[int, dict] = {}
+    for chunk_id, file_id, seq, score in chunks:
+        merged[file_id] = {"score": float(score), "chunk_id": chunk_id, "chunk_seq": seq, "name": None}
+    for file_id, score, highlighted in names:
+        entry = merged.setdefault(file_id, {"score": 0.0, "chunk_id": None, "chunk_seq": None, "name": None})
+        entry["score"] += SEARCH_NAME_WEIGHT * float(score)
+        entry["name"] = highlighted
+
+    ranked = sorted(merged.items(), key=lambda item: (-item[1]["score"], -item[0]))[offset:n]
+
+    found = {}
+    if snippets:
+        found = await chunk_snippets(db, query, [entry["chunk_id"] for _, entry in ranked if entry["chunk_id"] is not None])
+
+    return [
+        LexicalHit(
+            file_id=file_id,
+            score=entry["score"],
+            name_highlight=entry["name"],
+            chunk_id=entry["chunk_id"],
+            chunk_seq=entry["chunk_seq"],
+            snippet=found.get(entry["chunk_id"]),
+        )
+        for file_id, entry in ranked
+    ]
@@ -1,17 +1,52 @@
 from __future__ import annotations
 
+import asyncio
 import os
 import re
 import uuid
 import hashlib
+import mimetypes
+import tarfile
+import threading
+import zipfile
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Tuple, Optional
+from typing import AsyncIterator, BinaryIO, Callable, Iterable, Iterator, NamedTuple, Optional, TypeVar
 
 from fastapi import UploadFile, HTTPException
+from sqlalchemy import case, delete, insert, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
 
+from app.core import metrics, profiling
+from app.models.blob import Blob
+from app.models.file import FileRecord
+from app.services.backends import get_backend
+from app.services.compression import SUFFIXES, choose_codec, compressor, decompressing_reader
 
+T = TypeVar("T")
+
+
+# Local staging area for incoming bytes and the key prefix stored files get
+# in the backend (app/services/backends.py); with the default local backend
+# that is simply where the files live.
 UPLOAD_DIR = os.getenv("UPLOAD_DIR", "storage/uploads")
 
+# "uuid": one file per upload (default)
+# "cas":  content-addressed blobs keyed by sha256 and shared between uploads
+STORAGE_MODE = os.getenv("STORAGE_MODE", "uuid").lower()
+
+BLOB_DIR = os.getenv("BLOB_DIR", os.path.join(UPLOAD_DIR, "blobs"))
+
+# "sharded": new files go to <dir>/ab/cd/<name>, fanned out on the first
+# characters of their random (uuid) or content-hash (CAS) name, so no
+# directory grows past a few dozen entries even at millions of files.
+# "flat": straight into <dir>, the old layout. Existing files keep their
+# storage_path either way; app/services/relayout.py moves them over.
+UPLOAD_LAYOUT = os.getenv("UPLOAD_LAYOUT", "sharded").lower()
+
 
 MAX_UPLOAD_BYTES: Optional[int] = (
     int(os.getenv("MAX_UPLOAD_BYTES")) if os.getenv("MAX_UPLOAD_BYTES") else None
@@ -20,6 +55,38 @@ MAX_UPLOAD_BYTES: Optional[int] = (
 
 CHUNK_SIZE = 1024 * 1024  # 1MB
 
+# Hashing and disk writes run on this pool instead of the event loop.
+# 0 keeps the old inline behaviour (useful for benchmarking only).
+UPLOAD_IO_WORKERS = int(os.getenv("UPLOAD_IO_WORKERS", "4"))
+
+# Chunks read from the network but not yet written. When the disk falls behind
+# the reader waits here, so a fast client can't balloon memory.
+UPLOAD_PIPELINE_DEPTH = int(os.getenv("UPLOAD_PIPELINE_DEPTH", "4"))
+
+
+# Parts of one /files/bulk request hashed and written at the same time, and the
+# most files a single archive may expand to.
+BULK_UPLOAD_CONCURRENCY = int(os.getenv("BULK_UPLOAD_CONCURRENCY", "8"))
+BULK_MAX_FILES = int(os.getenv("BULK_MAX_FILES", "10000"))
+
+
+# Serializes "is the blob file still needed?" checks against uploads that are
+# about to rely on it. Only covers this process; see finalize_upload().
+_blob_lock = threading.Lock()
+
+
+class SavedUpload(NamedTuple):
+    stored_name: str
+    storage_path: str
+    size_bytes: int
+    sha256: Optional[str]
+    # CAS mode: bytes stay here until the FileRecord is committed
+    staging_path: Optional[str] = None
+    # at-rest codec (app/services/compression.py); size_bytes stays the
+    # original size, stored_size is what the file takes on disk
+    codec: Optional[str] = None
+    stored_size: Optional[int] = None
+
 
 def _safe_filename(name: str) -> str:
 
@@ -29,48 +96,224 @@ def _safe_filename(name: str) -> str:
     return name or "file"
 
 
-async def save_upload_file(uploaded: UploadFile) -> Tuple[str, str, int, Optional[str]]:
+_io_pool = (
+    ThreadPoolExecutor(max_workers=UPLOAD_IO_WORKERS, thread_name_prefix="upload-io")
+    if UPLOAD_IO_WORKERS > 0
+    else None
+)
 
-    if not uploaded or not uploaded.filename:
-        raise HTTPException(status_code=400, detail="No file provided")
 
-    original = _safe_filename(uploaded.filename)
+# calls submitted and not yet finished; only touched on the event loop
+_io_pending = 0
 
 
-    suffix = Path(original).suffix.lower()
+async def run_io(func: Callable[..., T], *args) -> T:
+    """Run blocking file work on the upload I/O pool."""
+    global _io_pending
+    if _io_pool is None:
+        return func(*args)
+    _io_pending += 1
+    try:
+        return await asyncio.get_running_loop().run_in_executor(_io_pool, profiling.for_thread(func), *args)
+    finally:
+        _io_pending -= 1
 
 
-    stored_name = f"{uuid.uuid4().hex}{suffix}"
+@metrics.collector
+def _io_pool_gauges() -> None:
+    if _io_pool is not None:
+        workers = UPLOAD_IO_WORKERS
+        metrics.pool_gauges("upload-io", workers, min(_io_pending, workers), max(_io_pending - workers, 0))
 
-    base_dir = Path(UPLOAD_DIR)
-    base_dir.mkdir(parents=True, exist_ok=True)
 
-    dest_path = base_dir / stored_name
+class _BlockingSink:
+    """Destination file plus running sha256. Only touched from the I/O pool.
 
-    hasher = hashlib.sha256()
+    With ``compress=True`` the codec is picked from the content type and the
+    first chunk; the hash is always over the original bytes, so sha256 (and
+    with it ETags and CAS dedup) does not depend on how a file is stored.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        append: bool = False,
+        hasher=None,
+        content_type: Optional[str] = None,
+        compress: bool = False,
+    ):
+        self.path = path
+        self.append = append
+        self.hasher = hasher or hashlib.sha256()
+        self.content_type = content_type
+        self.codec: Optional[str] = None
+        self.stored_size = 0
+        self._undecided = compress
+        self._encoder = None
+        self._f = None
+
+    def open(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._f = self.path.open("ab" if self.append else "wb")
+
+    def write(self, chunk: bytes) -> None:
+        # hashlib drops the GIL for large buffers, so this overlaps with the loop
+        self.hasher.update(chunk)
+        if self._undecided:
+            self._undecided = False
+            self.codec = choose_codec(self.content_type, chunk)
+            self._encoder = compressor(self.codec) if self.codec else None
+        if self._encoder is not None:
+            chunk = self._encoder.compress(chunk)
+        self._f.write(chunk)
+        self.stored_size += len(chunk)
+
+    def close(self) -> None:
+        if self._f is not None:
+            if self._encoder is not None:
+                tail = self._encoder.flush()
+                self._f.write(tail)
+                self.stored_size += len(tail)
+                self._encoder = None
+            self._f.close()
+            self._f = None
+
+    def discard(self) -> None:
+        self.close()
+        if not self.append:
+            self.path.unlink(missing_ok=True)
+
+
+async def _iter_upload(uploaded: UploadFile) -> AsyncIterator[bytes]:
+    while True:
+        chunk = await uploaded.read(CHUNK_SIZE)
+        if not chunk:
+            return
+        yield chunk
+
+
+async def _coalesce(chunks: AsyncIterator[bytes], size: int = CHUNK_SIZE) -> AsyncIterator[bytes]:
+    # raw request bodies arrive in ~64KB messages; batch them up so each hop
+    # to the I/O pool carries a useful amount of work
+    buf = bytearray()
+    async for chunk in chunks:
+        buf += chunk
+        if len(buf) >= size:
+            yield bytes(buf)
+            buf.clear()
+    if buf:
+        yield bytes(buf)
+
+
+async def _pump(chunks: AsyncIterator[bytes], sink: _BlockingSink, limit: Optional[int] = MAX_UPLOAD_BYTES) -> int:
+    """Stream ``chunks`` into ``sink``; network reads overlap with disk writes.
+
+    A single writer task drains a bounded queue so chunks land in order; the
+    reader blocks on ``queue.put`` when the writer is behind (backpressure).
+    """
+    queue: asyncio.Queue = asyncio.Queue(maxsize=max(UPLOAD_PIPELINE_DEPTH, 1))
+    failure: list[BaseException] = []
+
+    async def _drain() -> None:
+        while True:
+            chunk = await queue.get()
+            if chunk is None:
+                return
+            if failure:
+                continue  # keep consuming so the reader never blocks forever
+            try:
+                await run_io(sink.write, chunk)
+            except BaseException as exc:
+                failure.append(exc)
+
+    await run_io(sink.open)
+    writer = asyncio.create_task(_drain())
     total = 0
 
     try:
-        with dest_path.open("wb") as f:
-            while True:
-                chunk = await uploaded.read(CHUNK_SIZE)
-                if not chunk:
-                    break
-
-                total += len(chunk)
-                if MAX_UPLOAD_BYTES is not None and total > MAX_UPLOAD_BYTES:
-
-                    try:
-                        f.close()
-                        if dest_path.exists():
-                            dest_path.unlink()
-                    except Exception:
-                        pass
-                    raise HTTPException(status_code=413, detail="File too large")
-
-                hasher.update(chunk)
-                f.write(chunk)
+        async for chunk in chunks:
+            if failure:
+                break
+            if not chunk:
+                continue
+
+            total += len(chunk)
+            if limit is not None and total > limit:
+                raise HTTPException(status_code=413, detail="File too large")
+
+            await queue.put(chunk)
+    except BaseException:
+        await queue.put(None)
+        await writer
+        await run_io(sink.discard)
+        raise
+
+    await queue.put(None)
+    await writer
+
+    if failure:
+        await run_io(sink.discard)
+        raise failure[0]
+
+    await run_io(sink.close)
+    return total
+
+
+def layout_path(directory: str, name: str) -> Path:
+    """Where a file called ``name`` goes under ``directory`` in the current layout."""
+    if UPLOAD_LAYOUT == "flat":
+        return Path(directory) / name
+    return Path(directory) / name[:2] / name[2:4] / name
+
+
+def _blob_path(sha256_hex: str, codec: Optional[str] = None) -> Path:
+    return layout_path(BLOB_DIR, f"{sha256_hex}{SUFFIXES.get(codec, '')}")
+
+
+def _remove_quietly(path: Optional[str]) -> None:
+    try:
+        if path and os.path.exists(path):
+            os.remove(path)
+    except Exception:
+        pass
+
+
+def _staging_target(original_name: str) -> tuple[str, Path]:
+    stored_name = f"{uuid.uuid4().hex}{Path(_safe_filename(original_name)).suffix.lower()}"
+    if STORAGE_MODE == "cas":
+        # short-lived; stays flat
+        return stored_name, Path(UPLOAD_DIR) / f"{stored_name}.part"
+    return stored_name, layout_path(UPLOAD_DIR, stored_name)
+
 
+def _stored_upload(stored_name: str, dest_path: Path, total: int, sha256_hex: Optional[str], sink: _BlockingSink) -> SavedUpload:
+    codec, stored_size = sink.codec, sink.stored_size
+    if STORAGE_MODE == "cas" and sha256_hex:
+        return SavedUpload(
+            stored_name, str(_blob_path(sha256_hex, codec)), total, sha256_hex, str(dest_path), codec, stored_size
+        )
+
+    # CAS: nothing to deduplicate for empty uploads, keep them as plain files.
+    # uuid uploads are written straight to their final path, which the local
+    # backend leaves alone; other backends copy them out of staging.
+    final_path = layout_path(UPLOAD_DIR, stored_name)
+    get_backend().put_file(str(final_path), str(dest_path))
+
+    # رجّع path كـ string طبيعي للـ OS (ويندوز \ ، لينكس /)
+    return SavedUpload(stored_name, str(final_path), total, sha256_hex, None, codec, stored_size)
+
+
+async def save_upload_file(uploaded: UploadFile) -> SavedUpload:
+
+    if not uploaded or not uploaded.filename:
+        raise HTTPException(status_code=400, detail="No file provided")
+
+    stored_name, dest_path = _staging_target(uploaded.filename)
+
+    sink = _BlockingSink(dest_path, content_type=uploaded.content_type, compress=True)
+
+    try:
+        total = await _pump(_iter_upload(uploaded), sink)
     finally:
 
         try:
@@ -78,7 +321,358 @@ async def save_upload_file(uploaded: UploadFile) -> Tuple[str, str, int, Optiona
         except Exception:
             pass
 
-    sha256_hex = hasher.hexdigest() if total > 0 else None
+    sha256_hex = sink.hasher.hexdigest() if total > 0 else None
+    return await run_io(_stored_upload, stored_name, dest_path, total, sha256_hex, sink)
 
-    # رجّع path كـ string طبيعي للـ OS (ويندوز \ ، لينكس /)
-    return stored_name, str(dest_path), total, sha256_hex
\ No newline at end of file
+
+# --------- Archives ---------
+def _save_stream(fileobj: BinaryIO, original_name: str, limit: Optional[int]) -> SavedUpload:
+    """Blocking counterpart of save_upload_file for a file-like source."""
+    stored_name, dest_path = _staging_target(original_name)
+    sink = _BlockingSink(dest_path, content_type=mimetypes.guess_type(original_name)[0], compress=True)
+    sink.open()
+    total = 0
+    try:
+        while block := fileobj.read(CHUNK_SIZE):
+            total += len(block)
+            if limit is not None and total > limit:
+                raise HTTPException(status_code=413, detail="File too large")
+            sink.write(block)
+    except BaseException:
+        sink.discard()
+        raise
+    sink.close()
+    return _stored_upload(stored_name, dest_path, total, sink.hasher.hexdigest() if total else None, sink)
+
+
+def _archive_members(fileobj: BinaryIO) -> Iterator[tuple[str, BinaryIO]]:
+    if zipfile.is_zipfile(fileobj):
+        fileobj.seek(0)
+        with zipfile.ZipFile(fileobj) as zf:
+            for info in zf.infolist():
+                if not info.is_dir():
+                    with zf.open(info) as member:
+                        yield info.filename, member
+        return
+
+    fileobj.seek(0)
+    # "r|*" reads the tar (optionally gz/bz2/xz) front to back without seeking
+    with tarfile.open(fileobj=fileobj, mode="r|*") as tf:
+        for info in tf:
+            if info.isfile():
+                yield info.name, tf.extractfile(info)
+
+
+def save_archive(
+    fileobj: BinaryIO,
+    limit: Optional[int] = MAX_UPLOAD_BYTES,
+    max_files: int = BULK_MAX_FILES,
+) -> list[tuple[str, SavedUpload | HTTPException]]:
+    """Unpack a zip or tar archive member by member into upload storage.
+
+    Blocking; run it on the I/O pool. Members are streamed straight into their
+    sinks, never extracted to a temporary tree. Oversized members are reported
+    per member; an unreadable archive discards everything saved so far.
+    """
+    results: list[tuple[str, SavedUpload | HTTPException]] = []
+    try:
+        for name, member in _archive_members(fileobj):
+            if len(results) >= max_files:
+                raise HTTPException(status_code=413, detail=f"Archive holds more than {max_files} files")
+            try:
+                results.append((name, _save_stream(member, name, limit)))
+            except HTTPException as exc:
+                results.append((name, exc))
+    except BaseException as exc:
+        for _, saved in results:
+            if isinstance(saved, SavedUpload):
+                discard_upload(saved)
+        if isinstance(exc, (zipfile.BadZipFile, tarfile.TarError, EOFError)):
+            raise HTTPException(status_code=400, detail="Not a readable zip or tar archive")
+        raise
+    return results
+
+
+# --------- Resumable upload sessions ---------
+# Session uploads are stored uncompressed: chunks are appended at arbitrary
+# offsets across requests (and workers), which a compressed stream can't do.
+# Running sha256 per session, so finishing a multi-GB upload doesn't re-read
+# it. Keyed by session id and only valid at the recorded offset; a miss (other
+# worker, restart, failed chunk) rebuilds the state from the staged bytes.
+_session_hashers: dict[str, tuple[int, hashlib._Hash]] = {}
+
+
+def session_staging_path(session_id: str) -> str:
+    return str(Path(UPLOAD_DIR) / "sessions" / f"{session_id}.part")
+
+
+def _rebuild_session_hasher(staging_path: str, offset: int):
+    """Hash the first ``offset`` staged bytes and cut off anything after them."""
+    path = Path(staging_path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    hasher = hashlib.sha256()
+    with path.open("a+b") as f:
+        f.seek(0)
+        remaining = offset
+        while remaining > 0:
+            block = f.read(min(CHUNK_SIZE, remaining))
+            if not block:
+                raise HTTPException(status_code=409, detail="Staged upload data is incomplete")
+            hasher.update(block)
+            remaining -= len(block)
+        f.truncate(offset)
+    return hasher
+
+
+async def _session_hasher(session_id: str, staging_path: str, offset: int):
+    cached = _session_hashers.pop(session_id, None)
+    if cached is not None and cached[0] == offset:
+        return cached[1]
+    return await run_io(_rebuild_session_hasher, staging_path, offset)
+
+
+async def append_session_chunk(
+    session_id: str,
+    staging_path: str,
+    offset: int,
+    chunks: AsyncIterator[bytes],
+    limit: Optional[int] = None,
+) -> int:
+    """Append one chunk at ``offset``; returns the new offset."""
+    hasher = await _session_hasher(session_id, staging_path, offset)
+    sink = _BlockingSink(Path(staging_path), append=True, hasher=hasher)
+    written = await _pump(_coalesce(chunks), sink, limit)
+    _session_hashers[session_id] = (offset + written, hasher)
+    return offset + written
+
+
+async def finish_session_upload(
+    session_id: str,
+    staging_path: str,
+    original_name: str,
+    size: int,
+) -> SavedUpload:
+    """Turn a fully received session into a SavedUpload, like save_upload_file."""
+    hasher = await _session_hasher(session_id, staging_path, size)
+    sha256_hex = hasher.hexdigest() if size > 0 else None
+
+    stored_name = f"{uuid.uuid4().hex}{Path(_safe_filename(original_name)).suffix.lower()}"
+
+    if STORAGE_MODE == "cas" and sha256_hex:
+        return SavedUpload(stored_name, str(_blob_path(sha256_hex)), size, sha256_hex, staging_path, None, size)
+
+    final_path = layout_path(UPLOAD_DIR, stored_name)
+    await run_io(get_backend().put_file, str(final_path), staging_path)
+    return SavedUpload(stored_name, str(final_path), size, sha256_hex, None, None, size)
+
+
+def drop_session(session_id: str, staging_path: str) -> None:
+    _session_hashers.pop(session_id, None)
+    _remove_quietly(staging_path)
+
+
+def _adopt(saved: SavedUpload, storage_path: str, codec: Optional[str], stored_size: Optional[int]) -> SavedUpload:
+    # an existing blob wins, with whatever codec it was stored under
+    return saved._replace(storage_path=storage_path, codec=codec, stored_size=stored_size)
+
+
+async def _retain(db: AsyncSession, saved: SavedUpload, count: int = 1) -> SavedUpload:
+    bump = (
+        update(Blob)
+        .where(Blob.sha256 == saved.sha256)
+        .values(ref_count=Blob.ref_count + count)
+        .returning(Blob.storage_path, Blob.codec, Blob.stored_size)
+    )
+    existing = (await db.execute(bump)).first()
+    if existing:
+        return _adopt(saved, *existing)
+
+    try:
+        async with db.begin_nested():
+            db.add(
+                Blob(
+                    sha256=saved.sha256,
+                    storage_path=saved.storage_path,
+                    size_bytes=saved.size_bytes,
+                    codec=saved.codec,
+                    stored_size=saved.stored_size,
+                    ref_count=count,
+                )
+            )
+    except IntegrityError:
+        # another upload of the same content created the row first
+        return _adopt(saved, *(await db.execute(bump)).one())
+    return saved
+
+
+async def retain_blob(db: AsyncSession, saved: SavedUpload) -> SavedUpload:
+    """Take a reference on the blob behind a CAS upload (no-op otherwise).
+
+    Returns the upload as it should be recorded: pointing at the existing
+    blob when the content is already stored.
+    """
+    if saved.staging_path:
+        return await _retain(db, saved)
+    return saved
+
+
+_BLOB_BATCH = 500
+
+
+async def retain_blobs(db: AsyncSession, uploads: list[SavedUpload]) -> list[SavedUpload]:
+    """retain_blob for many uploads with one UPDATE and one INSERT per batch."""
+    counts = Counter(u.sha256 for u in uploads if u.staging_path)
+    first = {u.sha256: u for u in reversed(uploads) if u.staging_path}
+    shas = list(counts)
+    stored: dict[str, tuple[str, Optional[str], Optional[int]]] = {}
+
+    for start in range(0, len(shas), _BLOB_BATCH):
+        batch = shas[start:start + _BLOB_BATCH]
+        bumped = await db.execute(
+            update(Blob)
+            .where(Blob.sha256.in_(batch))
+            .values(ref_count=Blob.ref_count + case({sha: counts[sha] for sha in batch}, value=Blob.sha256))
+            .returning(Blob.sha256, Blob.storage_path, Blob.codec, Blob.stored_size)
+        )
+        for sha, storage_path, codec, stored_size in bumped:
+            stored[sha] = (storage_path, codec, stored_size)
+        missing = set(batch).difference(stored)
+        if not missing:
+            continue
+
+        try:
+            async with db.begin_nested():
+                await db.execute(
+                    insert(Blob),
+                    [
+                        {
+                            "sha256": sha,
+                            "storage_path": first[sha].storage_path,
+                            "size_bytes": first[sha].size_bytes,
+                            "codec": first[sha].codec,
+                            "stored_size": first[sha].stored_size,
+                            "ref_count": counts[sha],
+                        }
+                        for sha in missing
+                    ],
+                )
+        except IntegrityError:
+            # raced with a concurrent upload of some of this content
+            for sha in missing:
+                kept = await _retain(db, first[sha], counts[sha])
+                stored[sha] = (kept.storage_path, kept.codec, kept.stored_size)
+            continue
+        for sha in missing:
+            stored[sha] = (first[sha].storage_path, first[sha].codec, first[sha].stored_size)
+
+    return [_adopt(u, *stored[u.sha256]) if u.staging_path else u for u in uploads]
+
+
+def finalize_upload(saved: SavedUpload) -> None:
+    """Move staged CAS bytes into place once the referencing row is committed.
+
+    If the blob already exists the staged copy is simply dropped, which is what
+    turns a duplicate upload into a metadata-only insert.
+    """
+    if not saved.staging_path:
+        return
+
+    backend = get_backend()
+    with _blob_lock:
+        if backend.stat(saved.storage_path) is not None:
+            _remove_quietly(saved.staging_path)
+            return
+    # Outside the lock: a transfer to a remote backend can take a while. The
+    # committed Blob row already keeps unlink_if_unreferenced() off this key.
+    backend.put_file(saved.storage_path, saved.staging_path)
+
+
+def discard_upload(saved: SavedUpload) -> None:
+    """Drop the bytes of an upload whose FileRecord was never committed."""
+    if saved.staging_path:
+        _remove_quietly(saved.staging_path)
+        return
+    try:
+        get_backend().delete(saved.storage_path)
+    except Exception:
+        pass
+
+
+def open_stored(storage_path: str, codec: Optional[str] = None, start: int = 0, end: Optional[int] = None) -> BinaryIO:
+    """Readable stream of a stored file, from whichever backend holds it.
+
+    With ``codec`` the stream yields the original (decompressed) bytes and
+    ``start``/``end`` must be left alone: they address stored bytes.
+    """
+    raw = get_backend().open_range(storage_path, start, end)
+    return decompressing_reader(raw, codec)
+
+
+async def release_blobs(
+    db: AsyncSession,
+    refs: Iterable[tuple[Optional[str], str]],
+) -> list[tuple[Optional[str], str]]:
+    """Drop one reference per ``(sha256, storage_path)`` of deleted FileRecords.
+
+    Returns the pairs whose bytes are no longer needed once the surrounding
+    transaction commits. Blobs still referenced elsewhere are left out; files
+    without a Blob row (uuid mode, pre-CAS, empty) are always included.
+    """
+    released: list[tuple[Optional[str], str]] = []
+    by_sha: dict[str, Counter] = {}
+    for sha256_hex, storage_path in refs:
+        if sha256_hex:
+            by_sha.setdefault(sha256_hex, Counter())[storage_path] += 1
+        else:
+            released.append((sha256_hex, storage_path))
+
+    shas = list(by_sha)
+    for start in range(0, len(shas), _BLOB_BATCH):
+        batch = shas[start:start + _BLOB_BATCH]
+        blob_paths = dict((await db.execute(select(Blob.sha256, Blob.storage_path).where(Blob.sha256.in_(batch)))).all())
+
+        drops: dict[str, int] = {}
+        for sha in batch:
+            for storage_path, count in by_sha[sha].items():
+                if blob_paths.get(sha) == storage_path:
+                    drops[sha] = count
+                else:
+                    released.append((sha, storage_path))
+        if not drops:
+            continue
+
+        await db.execute(
+            update(Blob)
+            .where(Blob.sha256.in_(drops))
+            .values(ref_count=Blob.ref_count - case(drops, value=Blob.sha256))
+        )
+        gone = await db.execute(
+            delete(Blob)
+            .where(Blob.sha256.in_(drops), Blob.ref_count <= 0)
+            .returning(Blob.sha256, Blob.storage_path)
+        )
+        released.extend(tuple(row) for row in gone)
+
+    return released
+
+
+def unlink_if_unreferenced(db: Session, storage_path: str, sha256_hex: Optional[str] = None) -> bool:
+    """Remove a released file unless a new upload has re-referenced its blob.
+
+    Blocking (call from the I/O pool). A file that is already gone counts as
+    removed; any other backend error is raised to the caller.
+    """
+    with _blob_lock:
+        if sha256_hex:
+            current = db.execute(select(Blob.storage_path).where(Blob.sha256 == sha256_hex)).scalar()
+            if current == storage_path:
+                return False
+            # a blob moved by relayout stays while an upload that adopted
+            # the old path just before the move still points at it
+            still_used = db.execute(
+                select(FileRecord.id).where(FileRecord.sha256 == sha256_hex, FileRecord.storage_path == storage_path).limit(1)
+            ).scalar()
+            if still_used is not None:
+                return False
+        get_backend().delete(storage_path)
+        return True
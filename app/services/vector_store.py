@@ -0,0 +1,439 @@
+from __future__ import annotations
+
+import argparse
+import contextlib
+import json
+import math
+import os
+import threading
+from pathlib import Path
+from typing import Iterable, NamedTuple, Optional, Sequence
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: single process only
+    fcntl = None
+
+
+VECTOR_DIR = os.getenv("VECTOR_DIR", "storage/vectors")
+
+# Rows scored per matrix product; bounds the temporary score buffer to
+# VECTOR_SEARCH_BLOCK * queries floats however large the store grows.
+VECTOR_SEARCH_BLOCK = int(os.getenv("VECTOR_SEARCH_BLOCK", "65536"))
+
+# IVF lists probed per query once an index is built (more = better recall, slower)
+VECTOR_IVF_NPROBE = int(os.getenv("VECTOR_IVF_NPROBE", "8"))
+
+
+class Hit(NamedTuple):
+    chunk_id: int
+    file_id: int
+    owner_id: int
+    score: float  # cosine similarity
+
+
+# column files next to vectors.f32, one fixed-size record per row
+_COLUMNS = {
+    "chunk_ids": np.int64,
+    "file_ids": np.int64,
+    "owner_ids": np.int64,
+    "alive": np.uint8,
+}
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def _top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the k largest scores along the last axis, best first."""
+    k = min(k, scores.shape[-1])
+    if k <= 0:
+        return np.empty(scores.shape[:-1] + (0,), dtype=np.int64)
+    if k < scores.shape[-1]:
+        part = np.argpartition(-scores, k - 1, axis=-1)[..., :k]
+    else:
+        part = np.broadcast_to(np.arange(scores.shape[-1]), scores.shape[:-1] + (scores.shape[-1],))
+    order = np.argsort(-np.take_along_axis(scores, part, axis=-1), axis=-1, kind="stable")
+    return np.take_along_axis(part, order, axis=-1)
+
+
+class VectorStore:
+    """Append-only float32 matrix of unit vectors, memory-mapped from ``path``.
+
+    Rows are added at the end (one write per column file, then the row count
+    in meta.json is bumped, so a crash mid-append just drops the partial rows)
+    and deleted by tombstone. Search is an exact blocked matrix product with
+    argpartition, or an IVF probe once build_ivf() has run.
+
+    Writers hold a thread lock plus an flock on the directory, so several
+    worker processes can share one store. Readers never lock: they remap when
+    meta.json changes and otherwise work on the arrays mapped when the search
+    started.
+    """
+
+    def __init__(self, path: str | os.PathLike, dim: int):
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.dim = dim
+        self._lock = threading.Lock()
+        self._owner_rows: dict[int, np.ndarray] = {}
+        self._meta_mtime = None
+
+        with self._writing():
+            self._truncate_to_count()
+
+    # ---- files ----
+    def _file(self, name: str) -> Path:
+        return self.path / name
+
+    def _load_meta(self) -> None:
+        try:
+            meta = json.loads(self._file("meta.json").read_text())
+            self._meta_mtime = self._file("meta.json").stat().st_mtime_ns
+        except FileNotFoundError:
+            meta = {"dim": self.dim, "count": 0, "ivf_built": 0}
+        if meta["dim"] != self.dim:
+            raise ValueError(f"{self.path} holds {meta['dim']}-d vectors, not {self.dim}-d")
+        self.count = meta["count"]
+        self._ivf_built = meta.get("ivf_built", 0)
+        self._load_ivf()
+        self._remap()
+
+    def _write_meta(self) -> None:
+        tmp = self._file("meta.json.tmp")
+        tmp.write_text(json.dumps({"dim": self.dim, "count": self.count, "ivf_built": self._ivf_built}))
+        os.replace(tmp, self._file("meta.json"))
+        self._meta_mtime = self._file("meta.json").stat().st_mtime_ns
+
+    def _refresh(self) -> None:
+        """Pick up rows, tombstones or an index written by another process."""
+        try:
+            mtime = self._file("meta.json").stat().st_mtime_ns
+        except FileNotFoundError:
+            mtime = None
+        if mtime != self._meta_mtime or not hasattr(self, "_maps"):
+            self._load_meta()
+
+    @contextlib.contextmanager
+    def _writing(self):
+        with self._lock, open(self._file("lock"), "a") as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            self._refresh()
+            yield
+
+    def _column_files(self) -> dict[str, tuple[Path, type, int]]:
+        files = {"vectors": (self._file("vectors.f32"), np.float32, self.dim)}
+        files.update({name: (self._file(f"{name}.bin"), dtype, 1) for name, dtype in _COLUMNS.items()})
+        if self._ivf_built:
+            files["ivf_lists"] = (self._file("ivf_lists.bin"), np.int32, 1)
+        return files
+
+    def _truncate_to_count(self) -> None:
+        for path, dtype, width in self._column_files().values():
+            expected = self.count * width * np.dtype(dtype).itemsize
+            with open(path, "ab") as f:
+                if f.tell() != expected:
+                    f.truncate(expected)
+
+    def _remap(self) -> None:
+        maps = {}
+        for name, (path, dtype, width) in self._column_files().items():
+            shape = (self.count, width) if width > 1 else (self.count,)
+            if self.count == 0:
+                maps[name] = np.empty(shape, dtype=dtype)
+            else:
+                mode = "r+" if name == "alive" else "r"
+                maps[name] = np.memmap(path, dtype=dtype, mode=mode, shape=shape)
+        self._maps = maps
+        self._owner_rows = {}
+
+    # ---- writes ----
+    def add(
+        self,
+        chunk_ids: Sequence[int],
+        file_ids: Sequence[int],
+        owner_ids: Sequence[int],
+        vectors: np.ndarray,
+    ) -> None:
+        vectors = np.ascontiguousarray(_normalize(np.asarray(vectors, dtype=np.float32)), dtype=np.float32)
+        n = len(chunk_ids)
+        if vectors.shape != (n, self.dim) or len(file_ids) != n or len(owner_ids) != n:
+            raise ValueError("chunk_ids, file_ids, owner_ids and vectors must describe the same rows")
+        if n == 0:
+            return
+
+        columns = {
+            "vectors": vectors,
+            "chunk_ids": np.asarray(chunk_ids, dtype=np.int64),
+            "file_ids": np.asarray(file_ids, dtype=np.int64),
+            "owner_ids": np.asarray(owner_ids, dtype=np.int64),
+            "alive": np.ones(n, dtype=np.uint8),
+        }
+
+        with self._writing():
+            if self._ivf_built:
+                columns["ivf_lists"] = self._assign(vectors)
+            for name, (path, _, _) in self._column_files().items():
+                with open(path, "ab") as f:
+                    f.write(columns[name].tobytes())
+            self.count += n
+            self._write_meta()
+            self._remap()
+
+    def remove_files(self, file_ids: Iterable[int]) -> int:
+        """Tombstone every row of ``file_ids``; returns how many rows were hit."""
+        ids = np.fromiter(file_ids, dtype=np.int64)
+        with self._writing():
+            alive = self._maps["alive"]
+            if not len(ids) or not len(alive):
+                return 0
+            hit = np.isin(self._maps["file_ids"], ids) & (alive == 1)
+            count = int(hit.sum())
+            if count:
+                alive[hit] = 0
+                alive.flush()
+                self._write_meta()  # tells other processes to drop their owner caches
+                self._owner_rows = {}
+            return count
+
+    # ---- exact search ----
+    def _rows_for(self, maps: dict, owner_id: Optional[int]) -> Optional[np.ndarray]:
+        """Live row numbers visible to ``owner_id`` (None: all rows, if none are dead)."""
+        if owner_id is None:
+            alive = maps["alive"] == 1
+            return None if alive.all() else np.flatnonzero(alive)
+
+        rows = self._owner_rows.get(owner_id)
+        if rows is None:
+            rows = np.flatnonzero((maps["owner_ids"] == owner_id) & (maps["alive"] == 1))
+            if maps is self._maps:
+                self._owner_rows[owner_id] = rows
+        return rows
+
+    def _exact(self, maps: dict, queries: np.ndarray, k: int, rows: Optional[np.ndarray]):
+        vectors = maps["vectors"]
+
+        # Gathering rows copies them; when they are most of the store it is
+        # cheaper to scan it in place and mask out everything else.
+        mask = None
+        if rows is not None and len(rows) * 2 >= len(vectors):
+            mask = np.zeros(len(vectors), dtype=bool)
+            mask[rows] = True
+            rows = None
+
+        total = len(vectors) if rows is None else len(rows)
+        best_rows, best_scores = [], []
+
+        for start in range(0, total, VECTOR_SEARCH_BLOCK):
+            stop = min(start + VECTOR_SEARCH_BLOCK, total)
+            block_rows = np.arange(start, stop) if rows is None else rows[start:stop]
+            block = vectors[start:stop] if rows is None else vectors[block_rows]
+            scores = queries @ block.T  # (queries, block)
+            if mask is not None:
+                scores[:, ~mask[start:stop]] = -np.inf
+            top = _top_k(scores, k)
+            best_rows.append(block_rows[top])
+            best_scores.append(np.take_along_axis(scores, top, axis=1))
+
+        if not best_rows:
+            empty = np.empty((len(queries), 0))
+            return empty.astype(np.int64), empty
+        cand_rows = np.concatenate(best_rows, axis=1)
+        cand_scores = np.concatenate(best_scores, axis=1)
+        top = _top_k(cand_scores, k)
+        return np.take_along_axis(cand_rows, top, axis=1), np.take_along_axis(cand_scores, top, axis=1)
+
+    # ---- IVF ----
+    def _load_ivf(self) -> None:
+        self._centroids = self._ivf_order = self._ivf_offsets = None
+        if not self._ivf_built:
+            return
+        self._centroids = np.load(self._file("ivf_centroids.npy"))
+        self._ivf_order = np.load(self._file("ivf_order.npy"), mmap_mode="r")
+        self._ivf_offsets = np.load(self._file("ivf_offsets.npy"))
+
+    def _assign(self, vectors: np.ndarray, centroids: Optional[np.ndarray] = None) -> np.ndarray:
+        centroids = self._centroids if centroids is None else centroids
+        lists = np.empty(len(vectors), dtype=np.int32)
+        for start in range(0, len(vectors), VECTOR_SEARCH_BLOCK):
+            block = np.asarray(vectors[start:start + VECTOR_SEARCH_BLOCK])
+            lists[start:start + len(block)] = np.argmax(block @ centroids.T, axis=1)
+        return lists
+
+    def build_ivf(self, nlist: Optional[int] = None, iterations: int = 10, sample: int = 64, seed: int = 0) -> None:
+        """Cluster the current rows into ``nlist`` inverted lists (spherical k-means
+        on ``sample`` rows per list, default sqrt(rows) lists).
+
+        Rows added later are assigned to the nearest existing centroid and
+        searched through a small unsorted tail until the next rebuild.
+        """
+        with self._writing():
+            vectors = self._maps["vectors"]
+            n = len(vectors)
+            if n == 0:
+                raise ValueError("nothing to index")
+            nlist = max(1, min(nlist or int(math.sqrt(n)), n))
+
+            rng = np.random.default_rng(seed)
+            train = np.asarray(vectors[np.sort(rng.choice(n, size=min(n, nlist * sample), replace=False))])
+            centroids = train[rng.choice(len(train), size=nlist, replace=False)].copy()
+            for _ in range(iterations):
+                labels = self._assign(train, centroids)
+                sums = np.zeros_like(centroids)
+                np.add.at(sums, labels, train)
+                empty = np.bincount(labels, minlength=nlist) == 0
+                sums[empty] = centroids[empty]  # keep clusters that lost all points
+                centroids = _normalize(sums).astype(np.float32)
+
+            lists = self._assign(vectors, centroids)
+            order = np.argsort(lists, kind="stable").astype(np.int64)
+            offsets = np.concatenate(([0], np.cumsum(np.bincount(lists, minlength=nlist)))).astype(np.int64)
+
+            # Other processes have these mapped: each file is written aside and
+            # renamed over the old one, so they keep reading the old inode until
+            # the new meta.json sends them to the new files.
+            for name, write in (
+                ("ivf_centroids.npy", lambda f: np.save(f, centroids)),
+                ("ivf_order.npy", lambda f: np.save(f, order)),
+                ("ivf_offsets.npy", lambda f: np.save(f, offsets)),
+                ("ivf_lists.bin", lambda f: f.write(lists.tobytes())),
+            ):
+                tmp = self._file(name + ".tmp")
+                with open(tmp, "wb") as f:
+                    write(f)
+                os.replace(tmp, self._file(name))
+            self._ivf_built = n
+            self._write_meta()
+            self._load_ivf()
+            self._remap()
+
+    def _ivf_candidates(self, maps: dict, query: np.ndarray, nprobe: int, owner_id: Optional[int]) -> np.ndarray:
+        probes = _top_k(self._centroids @ query, nprobe)
+        parts = [self._ivf_order[self._ivf_offsets[p]:self._ivf_offsets[p + 1]] for p in probes]
+        built = self._ivf_built
+        tail_lists = maps["ivf_lists"][built:]
+        if len(tail_lists):
+            parts.append(built + np.flatnonzero(np.isin(tail_lists, probes)))
+        rows = np.concatenate(parts) if parts else np.empty(0, dtype=np.int64)
+
+        keep = maps["alive"][rows] == 1
+        if owner_id is not None:
+            keep &= maps["owner_ids"][rows] == owner_id
+        return rows[keep]
+
+    # ---- search ----
+    def search_batch(
+        self,
+        queries: np.ndarray,
+        k: int = 10,
+        owner_id: Optional[int] = None,
+        nprobe: Optional[int] = None,
+    ) -> list[list[Hit]]:
+        """Top-``k`` rows per query by cosine similarity.
+
+        ``owner_id`` restricts results to that owner's files (None: everyone,
+        admins only). ``nprobe=0`` forces an exact scan when an IVF index exists.
+        """
+        self._refresh()
+        maps = self._maps
+        queries = _normalize(np.atleast_2d(np.asarray(queries, dtype=np.float32)))
+        if queries.shape[1] != self.dim:
+            raise ValueError(f"expected {self.dim}-d queries")
+
+        nprobe = VECTOR_IVF_NPROBE if nprobe is None else nprobe
+        use_ivf = self._ivf_built and nprobe > 0
+        if use_ivf and owner_id is not None:
+            # The probed lists hold about nprobe/nlist of the store and only the
+            # owner's share of that survives the filter: an owner with fewer rows
+            # than that would get a handful of hits, and scanning their rows
+            # exactly costs no more than the probe.
+            per_probe = self.count * nprobe / len(self._centroids)
+            use_ivf = len(self._rows_for(maps, owner_id)) > per_probe
+        if use_ivf:
+            results = []
+            for query in queries:
+                rows = self._ivf_candidates(maps, query, nprobe, owner_id)
+                top_rows, top_scores = self._exact(maps, query[None, :], k, rows)
+                results.append((top_rows[0], top_scores[0]))
+        else:
+            rows = self._rows_for(maps, owner_id)
+            top_rows, top_scores = self._exact(maps, queries, k, rows)
+            results = list(zip(top_rows, top_scores))
+
+        out = []
+        for rows, scores in results:
+            found = np.isfinite(scores)  # masked rows fill up a short result
+            rows, scores = rows[found], scores[found]
+            # one gather per column; indexing a memmap row by row is slow
+            columns = zip(
+                maps["chunk_ids"][rows].tolist(),
+                maps["file_ids"][rows].tolist(),
+                maps["owner_ids"][rows].tolist(),
+                scores.tolist(),
+            )
+            out.append([Hit(*column) for column in columns])
+        return out
+
+    def search(self, query: np.ndarray, k: int = 10, owner_id: Optional[int] = None, nprobe: Optional[int] = None) -> list[Hit]:
+        return self.search_batch(query, k, owner_id, nprobe)[0]
+
+    def stats(self) -> dict:
+        self._refresh()
+        alive = self._maps["alive"]
+        return {
+            "dim": self.dim,
+            "rows": self.count,
+            "live_rows": int(np.count_nonzero(alive)) if len(alive) else 0,
+            "ivf_lists": 0 if self._centroids is None else len(self._centroids),
+            "ivf_built_rows": self._ivf_built,
+        }
+
+
+_stores: dict[str, VectorStore] = {}
+_stores_lock = threading.Lock()
+
+
+def get_vector_store(name: str, dim: int) -> VectorStore:
+    """Process-wide store under VECTOR_DIR/<name>, one per embedding model."""
+    with _stores_lock:
+        store = _stores.get(name)
+        if store is None:
+            store = _stores[name] = VectorStore(Path(VECTOR_DIR) / name, dim)
+        return store
+
+
+def main() -> None:
+    """Build or rebuild the IVF index of the configured embedding model's store.
+
+        python -m app.services.vector_store build-ivf [--nlist N] [--iterations 10]
+
+    Safe next to live workers: the build holds the store's write lock and
+    renames the new index files into place, so workers keep searching the old
+    index until their next search picks the new one up.
+    """
+    parser = argparse.ArgumentParser(description="Vector store maintenance")
+    commands = parser.add_subparsers(dest="command", required=True)
+    build = commands.add_parser("build-ivf", help="cluster the current rows into IVF lists")
+    build.add_argument("--nlist", type=int, default=None, help="lists to build (default sqrt(rows))")
+    build.add_argument("--iterations", type=int, default=10, help="k-means iterations")
+    build.add_argument("--sample", type=int, default=64, help="training rows per list")
+    args = parser.parse_args()
+
+    from app.services.ingestion import vector_store
+
+    store = vector_store()
+    if store is None:
+        parser.error("embeddings are disabled (EMBEDDING_PROVIDER), there is no vector store")
+    if args.command == "build-ivf":
+        store.build_ivf(args.nlist, args.iterations, args.sample)
+    print(store.stats())
+
+
+if __name__ == "__main__":
+    main()
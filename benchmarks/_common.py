@@ -0,0 +1,131 @@
+"""Shared helpers for the scripts in this folder.
+
+Every benchmark runs against a throw-away working directory so it never
+touches ./app.db or storage/uploads of a dev checkout.
+"""
+from __future__ import annotations
+
+import contextlib
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+
+BENCH_PASSWORD = "bench-password"
+
+
+def prepare_workdir(**env: str) -> Path:
+    """Create a temp dir, chdir into it and point the app's env vars at it.
+
+    Must run before anything under ``app`` is imported.
+    """
+    workdir = Path(tempfile.mkdtemp(prefix="kb-bench-"))
+    os.environ.setdefault("SECRET_KEY", "bench-secret")
+    # every simulated client logs in from the same address
+    os.environ.setdefault("RATE_LIMITS", "")
+    os.environ["UPLOAD_DIR"] = str(workdir / "uploads")
+    os.environ.update(env)
+    os.chdir(workdir)
+    if str(REPO_ROOT) not in sys.path:
+        sys.path.insert(0, str(REPO_ROOT))
+    return workdir
+
+
+def create_schema() -> None:
+    from app.db.database import Base, engine
+    from app.models import blob, chunk, embedding_cache, file, ingestion_job, reclaim, search_index, upload_session, user  # noqa: F401
+
+    Base.metadata.create_all(bind=engine)
+
+
+def seed_user(username: str, role: str = "user") -> int:
+    from app.core.security import hash_password
+    from app.db.database import SessionLocal
+    from app.models.user import User
+
+    db = SessionLocal()
+    try:
+        user = User(
+            email=f"{username}@bench.local",
+            username=username,
+            hashed_password=hash_password(BENCH_PASSWORD),
+            role=role,
+            is_active=True,
+        )
+        db.add(user)
+        db.commit()
+        return user.id
+    finally:
+        db.close()
+
+
+def token_for(user_id: int, role: str = "user") -> str:
+    from app.core.auth import create_access_token
+
+    return create_access_token(user_id=user_id, role=role)
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+@contextlib.contextmanager
+def uvicorn_server(workdir: Path, env: dict[str, str] | None = None, workers: int = 1):
+    """Run ``app.main:app`` under uvicorn in a subprocess; yields the base URL."""
+    port = free_port()
+    proc_env = {**os.environ, **(env or {}), "PYTHONPATH": str(REPO_ROOT)}
+    cmd = [
+        sys.executable, "-m", "uvicorn", "app.main:app",
+        "--host", "127.0.0.1", "--port", str(port),
+        "--workers", str(workers), "--log-level", "warning",
+    ]
+    proc = subprocess.Popen(cmd, cwd=workdir, env=proc_env)
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        deadline = time.monotonic() + 30
+        while True:
+            with contextlib.suppress(OSError):
+                with socket.create_connection(("127.0.0.1", port), timeout=0.2):
+                    break
+            if proc.poll() is not None or time.monotonic() > deadline:
+                raise RuntimeError("uvicorn did not start")
+            time.sleep(0.05)
+        yield base_url
+    finally:
+        proc.terminate()
+        proc.wait(timeout=10)
+
+
+def percentile(values: list[float], pct: float) -> float:
+    if not values:
+        return float("nan")
+    ordered = sorted(values)
+    k = (len(ordered) - 1) * pct / 100
+    lo = int(k)
+    hi = min(lo + 1, len(ordered) - 1)
+    return ordered[lo] + (ordered[hi] - ordered[lo]) * (k - lo)
+
+
+def latency_summary(samples_s: list[float]) -> dict[str, float]:
+    ms = [s * 1000 for s in samples_s]
+    return {
+        "count": len(ms),
+        "p50_ms": round(percentile(ms, 50), 2),
+        "p95_ms": round(percentile(ms, 95), 2),
+        "p99_ms": round(percentile(ms, 99), 2),
+        "max_ms": round(max(ms), 2) if ms else float("nan"),
+    }
+
+
+def print_table(rows: list[dict], columns: list[str]) -> None:
+    widths = {c: max(len(c), *(len(str(r.get(c, ""))) for r in rows)) for c in columns}
+    print("  ".join(c.ljust(widths[c]) for c in columns))
+    for r in rows:
+        print("  ".join(str(r.get(c, "")).ljust(widths[c]) for c in columns))
@@ -0,0 +1,375 @@
+"""End-to-end API benchmark: req/s, latency percentiles and memory per endpoint.
+
+Seeds --users users and --files FileRecords (each with a synthetic blob of
+--blob-size bytes on disk), then runs every scenario with --concurrency
+clients, in-process (httpx ASGI transport, no sockets) and/or against a
+uvicorn subprocess over a real socket (--mode). Scenarios: login, list,
+metadata, upload at each of --upload-sizes, full download, range download
+and delete.
+
+Results are printed and saved as JSON (--out); --compare takes an earlier
+result file and shows the change per scenario, so a branch can be checked
+against main:
+
+    python benchmarks/api_suite.py --out main.json
+    python benchmarks/api_suite.py --compare main.json
+
+Memory is the RSS of the process serving the requests after each scenario
+and its peak so far (for in-process runs that includes the clients).
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+import uuid
+from datetime import datetime, timezone
+from pathlib import Path
+
+from _common import (
+    BENCH_PASSWORD,
+    REPO_ROOT,
+    create_schema,
+    latency_summary,
+    prepare_workdir,
+    print_table,
+    token_for,
+    uvicorn_server,
+)
+
+
+_SIZES = {"k": 1024, "m": 1024 * 1024}
+
+
+def _size(text: str) -> int:
+    text = text.strip().lower()
+    return int(text[:-1]) * _SIZES[text[-1]] if text[-1] in _SIZES else int(text)
+
+
+# --------- Seeding ---------
+
+def _seed_users(count: int) -> list[tuple[int, str]]:
+    from sqlalchemy import insert
+
+    from app.core.security import hash_password
+    from app.db.database import SessionLocal
+    from app.models.user import User
+
+    hashed = hash_password(BENCH_PASSWORD)  # one Argon2 run, shared by every user
+    rows = [
+        {"email": f"u{i}@bench.local", "username": f"u{i}", "hashed_password": hashed, "role": "user", "is_active": True}
+        for i in range(count)
+    ]
+    with SessionLocal() as db:
+        ids = db.execute(insert(User).returning(User.id, sort_by_parameter_order=True), rows).scalars().all()
+        db.commit()
+    return [(user_id, f"u{i}") for i, user_id in enumerate(ids)]
+
+
+def _seed_files(owner_ids: list[int], count: int, blob_size: int) -> list[tuple[int, int]]:
+    """``count`` FileRecords spread over the owners, each with its own blob. Returns (file id, owner id)."""
+    import hashlib
+
+    from sqlalchemy import insert
+
+    from app.db.database import SessionLocal
+    from app.models.file import FileRecord
+    from app.services.storage import UPLOAD_DIR, layout_path
+
+    out = []
+    with SessionLocal() as db:
+        for start in range(0, count, 1000):
+            rows = []
+            for i in range(start, min(start + 1000, count)):
+                name = f"{uuid.uuid4().hex}.bin"
+                path = layout_path(UPLOAD_DIR, name)
+                path.parent.mkdir(parents=True, exist_ok=True)
+                data = os.urandom(blob_size)
+                path.write_bytes(data)
+                rows.append({
+                    "owner_id": owner_ids[i % len(owner_ids)],
+                    "original_name": f"doc-{i}.bin",
+                    "stored_name": name,
+                    "content_type": "application/octet-stream",
+                    "size_bytes": blob_size,
+                    "sha256": hashlib.sha256(data).hexdigest(),
+                    "storage_path": str(path),
+                })
+            ids = db.execute(insert(FileRecord).returning(FileRecord.id, sort_by_parameter_order=True), rows).scalars().all()
+            out += [(file_id, row["owner_id"]) for file_id, row in zip(ids, rows)]
+            db.commit()
+    return out
+
+
+# --------- Memory ---------
+
+def _proc_status(pid: int) -> dict[str, int]:
+    out = {}
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                key, _, value = line.partition(":")
+                if key in ("VmRSS", "VmHWM"):
+                    out[key] = int(value.split()[0]) * 1024
+    except OSError:
+        pass
+    return out
+
+
+def _descendants(pid: int) -> list[int]:
+    parents: dict[int, list[int]] = {}
+    for entry in os.listdir("/proc") if os.path.isdir("/proc") else ():
+        if entry.isdigit():
+            try:
+                with open(f"/proc/{entry}/stat") as f:
+                    ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+            except (OSError, IndexError, ValueError):
+                continue
+            parents.setdefault(ppid, []).append(int(entry))
+    out, todo = [], [pid]
+    while todo:
+        for child in parents.get(todo.pop(), ()):
+            out.append(child)
+            todo.append(child)
+    return out
+
+
+def _memory(pids: list[int]) -> dict:
+    """RSS and peak RSS in MB, summed over ``pids`` (Linux only; None elsewhere)."""
+    stats = [_proc_status(pid) for pid in pids]
+    if not any(stats):
+        return {"rss_mb": None, "peak_rss_mb": None}
+    return {
+        "rss_mb": round(sum(s.get("VmRSS", 0) for s in stats) / 2**20, 1),
+        "peak_rss_mb": round(sum(s.get("VmHWM", 0) for s in stats) / 2**20, 1),
+    }
+
+
+# --------- Scenarios ---------
+
+class _Context:
+    def __init__(self, users, files, tokens, payloads, blob_size):
+        self.users = users            # [(user id, username)]
+        self.files = files            # [(file id, owner id)], never deleted
+        self.tokens = tokens          # user id -> bearer token
+        self.payloads = payloads      # label -> upload body
+        self.blob_size = blob_size
+        self.doomed: list = []        # [(file id, owner id)] for the delete scenario
+
+    def auth(self, user_id: int) -> dict:
+        return {"Authorization": f"Bearer {self.tokens[user_id]}"}
+
+
+def _scenarios(ctx: _Context, args) -> list[tuple[str, int, object]]:
+    """(name, request count, async fn(client, rng) -> response)."""
+    async def login(client, rng):
+        _, username = rng.choice(ctx.users)
+        return await client.post("/auth/login", data={"username": username, "password": BENCH_PASSWORD})
+
+    async def list_files(client, rng):
+        user_id, _ = rng.choice(ctx.users)
+        return await client.get("/files/", params={"limit": 50}, headers=ctx.auth(user_id))
+
+    async def metadata(client, rng):
+        file_id, owner = rng.choice(ctx.files)
+        return await client.get(f"/files/{file_id}", headers=ctx.auth(owner))
+
+    async def download(client, rng):
+        file_id, owner = rng.choice(ctx.files)
+        return await client.get(f"/files/{file_id}/download", headers=ctx.auth(owner))
+
+    async def range_download(client, rng):
+        file_id, owner = rng.choice(ctx.files)
+        start = rng.randrange(max(ctx.blob_size - 4096, 1))
+        headers = {**ctx.auth(owner), "Range": f"bytes={start}-{start + 4095}"}
+        return await client.get(f"/files/{file_id}/download", headers=headers)
+
+    def upload(label: str):
+        async def run(client, rng):
+            user_id, _ = rng.choice(ctx.users)
+            files = {"uploaded": (f"up-{label}.bin", ctx.payloads[label], "application/octet-stream")}
+            return await client.post("/files/upload", files=files, headers=ctx.auth(user_id))
+        return run
+
+    async def delete(client, rng):
+        file_id, owner = ctx.doomed.pop()
+        return await client.delete(f"/files/{file_id}", headers=ctx.auth(owner))
+
+    scenarios = [
+        ("login", args.login_requests, login),
+        ("list", args.requests, list_files),
+        ("metadata", args.requests, metadata),
+        *((f"upload {label}", args.write_requests, upload(label)) for label in ctx.payloads),
+        ("download", args.requests, download),
+        ("range download", args.requests, range_download),
+        ("delete", args.write_requests, delete),
+    ]
+    wanted = {s.strip() for s in args.only.split(",")} if args.only else None
+    return [s for s in scenarios if wanted is None or s[0] in wanted or s[0].split()[0] in wanted]
+
+
+async def _drive(client, fn, total: int, concurrency: int, seed: int) -> dict:
+    latencies: list[float] = []
+    errors: dict[int, int] = {}
+    remaining = iter(range(total))
+
+    async def worker(n: int):
+        rng = random.Random(seed * 1000 + n)
+        for _ in remaining:
+            start = time.perf_counter()
+            r = await fn(client, rng)
+            latencies.append(time.perf_counter() - start)
+            if r.status_code >= 400:
+                errors[r.status_code] = errors.get(r.status_code, 0) + 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(n) for n in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    return {
+        "req_s": round(total / elapsed, 1) if elapsed else None,
+        **latency_summary(latencies),
+        "errors": sum(errors.values()),
+        "error_statuses": errors,
+    }
+
+
+async def _run_all(client, ctx: _Context, args, mode: str, pids) -> list[dict]:
+    rows = []
+    for seed, (name, total, fn) in enumerate(_scenarios(ctx, args)):
+        if total <= 0:
+            continue
+        if name == "delete":
+            owner_ids = [user_id for user_id, _ in ctx.users]
+            ctx.doomed = await asyncio.to_thread(_seed_files, owner_ids, total + args.warmup, ctx.blob_size)
+        for _ in range(args.warmup):
+            await fn(client, random.Random(-1))
+        result = await _drive(client, fn, total, args.concurrency, seed)
+        rows.append({"mode": mode, "scenario": name, "requests": total, **result, **_memory(pids())})
+        print(f"  {mode:10} {name:16} {result['req_s']:>8} req/s  p95 {result['p95_ms']} ms", file=sys.stderr)
+    return rows
+
+
+async def _in_process(ctx: _Context, args) -> list[dict]:
+    import httpx
+    from app.main import app
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        return await _run_all(client, ctx, args, "in-process", lambda: [os.getpid()])
+
+
+async def _over_socket(base_url: str, ctx: _Context, args, pids) -> list[dict]:
+    import httpx
+
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=base_url, timeout=None, limits=limits) as client:
+        return await _run_all(client, ctx, args, f"uvicorn x{args.workers}", pids)
+
+
+# --------- Results ---------
+
+def _git_commit() -> str | None:
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT, capture_output=True, text=True)
+    except OSError:
+        return None
+    return out.stdout.strip() or None
+
+
+def _compare(rows: list[dict], baseline_path: Path) -> None:
+    baseline = {(r["mode"], r["scenario"]): r for r in json.loads(baseline_path.read_text())["results"]}
+    table = []
+    for row in rows:
+        old = baseline.get((row["mode"], row["scenario"]))
+        if old is None or not old.get("req_s") or not old.get("p95_ms"):
+            continue
+        table.append({
+            "mode": row["mode"],
+            "scenario": row["scenario"],
+            "req/s": f"{old['req_s']} -> {row['req_s']}",
+            "req/s change": f"{row['req_s'] / old['req_s'] - 1:+.1%}",
+            "p95 ms": f"{old['p95_ms']} -> {row['p95_ms']}",
+            "p95 change": f"{row['p95_ms'] / old['p95_ms'] - 1:+.1%}",
+        })
+    print()
+    print(f"vs {baseline_path}:")
+    print_table(table, ["mode", "scenario", "req/s", "req/s change", "p95 ms", "p95 change"])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--files", type=int, default=5000, help="seeded FileRecords (plus blobs)")
+    parser.add_argument("--blob-size", default="16k", help="bytes per seeded blob (k/m suffixes)")
+    parser.add_argument("--upload-sizes", default="4k,256k,4m")
+    parser.add_argument("--mode", choices=("inprocess", "socket", "both"), default="both")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers in socket mode")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=2000, help="per read scenario")
+    parser.add_argument("--write-requests", type=int, default=200, help="per upload size, and deletes")
+    parser.add_argument("--login-requests", type=int, default=50)
+    parser.add_argument("--warmup", type=int, default=5, help="unrecorded requests before each scenario")
+    parser.add_argument("--only", help="comma separated scenarios, e.g. list,download,upload")
+    parser.add_argument("--out", help="result file (default: bench-results/api_suite-<time>.json)")
+    parser.add_argument("--compare", help="earlier result file to compare against")
+    args = parser.parse_args()
+
+    stamp = datetime.now(timezone.utc)
+    out = Path(args.out or f"bench-results/api_suite-{stamp:%Y%m%d-%H%M%S}.json").resolve()
+    baseline = Path(args.compare).resolve() if args.compare else None
+
+    workdir = prepare_workdir()
+    create_schema()
+    blob_size = _size(args.blob_size)
+
+    started = time.perf_counter()
+    users = _seed_users(args.users)
+    owner_ids = [user_id for user_id, _ in users]
+    files = _seed_files(owner_ids, args.files, blob_size)
+    print(f"seeded {len(users)} users, {len(files)} files in {time.perf_counter() - started:.1f}s", file=sys.stderr)
+
+    ctx = _Context(
+        users,
+        files,
+        {user_id: token_for(user_id) for user_id in owner_ids},
+        {label.strip(): os.urandom(_size(label)) for label in args.upload_sizes.split(",") if label.strip()},
+        blob_size,
+    )
+
+    rows = []
+    if args.mode in ("inprocess", "both"):
+        rows += asyncio.run(_in_process(ctx, args))
+    if args.mode in ("socket", "both"):
+        with uvicorn_server(workdir, workers=args.workers) as base_url:
+            rows += asyncio.run(_over_socket(base_url, ctx, args, lambda: _descendants(os.getpid())))
+
+    print()
+    print_table(rows, ["mode", "scenario", "requests", "req_s", "p50_ms", "p95_ms", "p99_ms", "errors", "rss_mb", "peak_rss_mb"])
+
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps({
+        "created_at": stamp.isoformat(),
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "args": vars(args),
+        "env": {
+            k: v for k, v in os.environ.items()
+            if k.startswith(("STORAGE_", "UPLOAD_", "DB_", "PASSWORD_", "METRICS_")) and k != "UPLOAD_DIR"
+        },
+        "results": rows,
+    }, indent=2))
+    print(f"\nsaved {out}")
+    if baseline is not None:
+        _compare(rows, baseline)
+
+
+if __name__ == "__main__":
+    main()
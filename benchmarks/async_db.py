@@ -0,0 +1,109 @@
+"""Metadata throughput: sync Session (threadpool) vs AsyncSession routes.
+
+Mounts two otherwise identical routes on a scratch FastAPI app, one using
+``get_db`` and one using ``get_async_db``, seeds --files rows and drives both
+with --concurrency in-flight requests through the ASGI transport.
+
+    python benchmarks/async_db.py --requests 5000 --concurrency 500
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import time
+
+from _common import create_schema, prepare_workdir, print_table, seed_user
+
+
+def _build_app(owner_id: int):
+    from fastapi import Depends, FastAPI
+    from sqlalchemy import select
+    from sqlalchemy.ext.asyncio import AsyncSession
+    from sqlalchemy.orm import Session
+
+    from app.db.database import get_async_db, get_db
+    from app.models.file import FileRecord
+    from app.schemas.file import FileOut
+
+    bench = FastAPI()
+
+    @bench.get("/sync", response_model=list[FileOut])
+    def sync_list(db: Session = Depends(get_db)):
+        return (
+            db.query(FileRecord)
+            .filter(FileRecord.owner_id == owner_id)
+            .order_by(FileRecord.id.desc())
+            .limit(20)
+            .all()
+        )
+
+    @bench.get("/async", response_model=list[FileOut])
+    async def async_list(db: AsyncSession = Depends(get_async_db)):
+        result = await db.execute(
+            select(FileRecord)
+            .where(FileRecord.owner_id == owner_id)
+            .order_by(FileRecord.id.desc())
+            .limit(20)
+        )
+        return result.scalars().all()
+
+    return bench
+
+
+async def _drive(bench, path: str, total: int, concurrency: int) -> float:
+    import httpx
+
+    remaining = iter(range(total))
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=bench), base_url="http://bench") as client:
+        await client.get(path)
+
+        async def worker():
+            for _ in remaining:
+                (await client.get(path)).raise_for_status()
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        return total / (time.perf_counter() - start)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=3000)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--files", type=int, default=200)
+    args = parser.parse_args()
+
+    # A sync Session keeps its connection until get_db's cleanup gets a
+    # threadpool slot, and those slots are taken by requests waiting for a
+    # connection. Below one connection per in-flight request the sync path
+    # stalls until DB_POOL_TIMEOUT, so give both paths that many.
+    prepare_workdir(DB_POOL_SIZE=str(args.concurrency), DB_MAX_OVERFLOW="0")
+    create_schema()
+    owner_id = seed_user("bench")
+
+    from app.db.database import SessionLocal
+    from app.models.file import FileRecord
+
+    with SessionLocal() as db:
+        db.add_all(
+            FileRecord(
+                owner_id=owner_id,
+                original_name=f"doc-{i}.txt",
+                stored_name=f"doc-{i}.txt",
+                size_bytes=i,
+                storage_path=f"doc-{i}.txt",
+            )
+            for i in range(args.files)
+        )
+        db.commit()
+
+    bench = _build_app(owner_id)
+    rows = []
+    for path in ("/sync", "/async"):
+        rps = asyncio.run(_drive(bench, path, args.requests, args.concurrency))
+        rows.append({"path": path, "concurrency": args.concurrency, "req/s": f"{rps:.0f}"})
+    print_table(rows, ["path", "concurrency", "req/s"])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""Corpus import: one POST /files/upload per file vs /files/bulk batches.
+
+Generates --files small documents and imports them three ways through the
+ASGI transport: per-file uploads (--concurrency in flight), multipart batches
+of --batch parts, and the same batches packed as one zip each.
+
+    python benchmarks/bulk_upload.py --files 5000 --batch 500
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import io
+import os
+import time
+import zipfile
+
+from _common import create_schema, prepare_workdir, print_table, seed_user, token_for
+
+
+def _corpus(count: int, size: int) -> list[tuple[str, bytes]]:
+    return [(f"doc-{i}.txt", os.urandom(size // 2).hex().encode()) for i in range(count)]
+
+
+def _zip(docs: list[tuple[str, bytes]]) -> bytes:
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w") as zf:
+        for name, data in docs:
+            zf.writestr(name, data)
+    return buf.getvalue()
+
+
+async def _run(mode: str, docs, token: str, batch: int, concurrency: int) -> float:
+    import httpx
+    from app.main import app
+
+    headers = {"Authorization": f"Bearer {token}"}
+    batches = [docs[i:i + batch] for i in range(0, len(docs), batch)]
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench", timeout=None) as client:
+
+        async def single():
+            remaining = iter(docs)
+
+            async def worker():
+                for name, data in remaining:
+                    r = await client.post("/files/upload", headers=headers, files={"uploaded": (name, data, "text/plain")})
+                    r.raise_for_status()
+
+            await asyncio.gather(*(worker() for _ in range(concurrency)))
+
+        async def bulk():
+            for part in batches:
+                files = [("files", (name, data, "text/plain")) for name, data in part]
+                r = await client.post("/files/bulk", headers=headers, files=files)
+                r.raise_for_status()
+
+        async def archive():
+            for part in batches:
+                files = {"archive": ("batch.zip", _zip(part), "application/zip")}
+                r = await client.post("/files/bulk", headers=headers, files=files)
+                r.raise_for_status()
+
+        start = time.perf_counter()
+        await {"single": single, "bulk": bulk, "archive": archive}[mode]()
+        return len(docs) / (time.perf_counter() - start)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--files", type=int, default=2000)
+    parser.add_argument("--size", type=int, default=4096, help="bytes per document")
+    parser.add_argument("--batch", type=int, default=500, help="files per /files/bulk request (max 1000)")
+    parser.add_argument("--concurrency", type=int, default=16, help="in-flight single uploads")
+    args = parser.parse_args()
+
+    prepare_workdir()
+    create_schema()
+    token = token_for(seed_user("bench"))
+    docs = _corpus(args.files, args.size)
+
+    rows = []
+    for mode in ("single", "bulk", "archive"):
+        rate = asyncio.run(_run(mode, docs, token, args.batch, args.concurrency))
+        rows.append({"mode": mode, "files": args.files, "files/s": f"{rate:.0f}"})
+    print_table(rows, ["mode", "files", "files/s"])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+"""Hybrid retrieval (POST /files/retrieve): latency per stage and precision.
+
+Builds a synthetic corpus of --files documents, each drawn from one of
+--topics word pools plus shared filler, with --chunks chunks per file. Chunks
+are written straight to the database (the full-text triggers index them) and
+embedded into the vector store the same way ingestion does. Then --queries
+three-word topic queries go through the API via the ASGI transport, and the
+per-stage timings the endpoint reports are summarized. "retrieve" is the wall
+time of the lexical and vector stages, which run concurrently; compare it
+with "serial", their sum. precision@k is the share of returned files that
+belong to the query's topic.
+
+    python benchmarks/hybrid_search.py --files 5000 --queries 300
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import random
+import time
+
+from _common import create_schema, latency_summary, prepare_workdir, print_table, seed_user, token_for
+
+
+def _words(rng: random.Random, count: int, length: int = 7) -> list[str]:
+    letters = "abcdefghijklmnopqrstuvwxyz"
+    return ["".join(rng.choice(letters) for _ in range(length)) for _ in range(count)]
+
+
+def _build_corpus(args, owner_id: int, rng: random.Random):
+    from sqlalchemy import insert
+
+    from app.db.database import SessionLocal
+    from app.models.chunk import FileChunk
+    from app.models.file import FileRecord
+    from app.services.embeddings import embed_texts
+    from app.services.ingestion import vector_store
+
+    filler = _words(rng, 2000)
+    pools = [_words(rng, 40) for _ in range(args.topics)]
+    store = vector_store()
+    topic_of: dict[int, int] = {}
+
+    with SessionLocal() as db:
+        for start in range(0, args.files, 500):
+            batch = range(start, min(start + 500, args.files))
+            topics = [rng.randrange(args.topics) for _ in batch]
+            file_ids = db.execute(
+                insert(FileRecord).returning(FileRecord.id, sort_by_parameter_order=True),
+                [
+                    {
+                        "owner_id": owner_id,
+                        "original_name": f"doc-{i}.txt",
+                        "stored_name": f"doc-{i}.txt",
+                        "content_type": "text/plain",
+                        "size_bytes": 0,
+                        "storage_path": f"doc-{i}.txt",
+                    }
+                    for i in batch
+                ],
+            ).scalars().all()
+
+            rows = []
+            for file_id, topic in zip(file_ids, topics):
+                topic_of[file_id] = topic
+                for seq in range(args.chunks):
+                    words = [rng.choice(pools[topic]) if rng.random() < 0.3 else rng.choice(filler) for _ in range(150)]
+                    rows.append({"file_id": file_id, "seq": seq, "char_start": 0, "char_end": 0, "text": " ".join(words)})
+
+            vectors = embed_texts(db, [row["text"] for row in rows])
+            chunk_ids = db.execute(
+                insert(FileChunk).returning(FileChunk.id, sort_by_parameter_order=True), rows
+            ).scalars().all()
+            db.commit()
+            store.add(chunk_ids, [row["file_id"] for row in rows], [owner_id] * len(rows), vectors)
+
+    queries = []
+    for _ in range(args.queries):
+        topic = rng.randrange(args.topics)
+        queries.append((topic, " ".join(rng.sample(pools[topic], 3))))
+    return topic_of, queries
+
+
+async def _drive(queries, token: str, k: int, concurrency: int, topic_of: dict[int, int]):
+    import httpx
+    from app.main import app
+
+    headers = {"Authorization": f"Bearer {token}"}
+    samples, stages, hits, returned = [], {}, 0, 0
+    remaining = iter(queries)
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench", timeout=None) as client:
+        await client.post("/files/retrieve", headers=headers, json={"query": queries[0][1], "k": k})  # warm up
+
+        async def worker():
+            nonlocal hits, returned
+            for topic, query in remaining:
+                start = time.perf_counter()
+                r = await client.post("/files/retrieve", headers=headers, json={"query": query, "k": k})
+                samples.append(time.perf_counter() - start)
+                r.raise_for_status()
+                body = r.json()
+                timings = body["timings_ms"]
+                timings["serial"] = timings.get("lexical", 0) + timings.get("embed", 0) + timings.get("vector", 0)
+                for stage, ms in timings.items():
+                    stages.setdefault(stage, []).append(ms / 1000)
+                returned += len(body["items"])
+                hits += sum(topic_of[item["file"]["id"]] == topic for item in body["items"])
+
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return samples, stages, hits / max(returned, 1)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--files", type=int, default=2000)
+    parser.add_argument("--chunks", type=int, default=4, help="chunks per file")
+    parser.add_argument("--topics", type=int, default=50)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=8)
+    parser.add_argument("--concurrency", type=int, default=1)
+    args = parser.parse_args()
+
+    prepare_workdir()
+    create_schema()
+    owner_id = seed_user("bench")
+    token = token_for(owner_id)
+
+    start = time.perf_counter()
+    topic_of, queries = _build_corpus(args, owner_id, random.Random(0))
+    print(f"corpus: {args.files} files x {args.chunks} chunks in {time.perf_counter() - start:.1f}s")
+
+    samples, stages, precision = asyncio.run(_drive(queries, token, args.k, args.concurrency, topic_of))
+    rows = [{"stage": "end to end (client)", **latency_summary(samples)}]
+    for stage in ("lexical", "embed", "vector", "serial", "retrieve", "fusion", "hydrate", "total"):
+        if stage in stages:
+            rows.append({"stage": stage, **latency_summary(stages[stage])})
+    print_table(rows, ["stage", "count", "p50_ms", "p95_ms", "p99_ms", "max_ms"])
+    print(f"precision@{args.k}: {precision:.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""Token encode/decode cost: jose vs the stdlib hmac backend, with and without
+the verified-claims cache that decode_token puts in front of either.
+
+    python benchmarks/jwt_decode.py --iterations 20000
+"""
+from __future__ import annotations
+
+import argparse
+import hashlib
+import time
+from datetime import datetime, timedelta, timezone
+
+from _common import prepare_workdir, print_table
+
+
+def _per_call_us(func, iterations: int) -> float:
+    start = time.perf_counter()
+    for _ in range(iterations):
+        func()
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=20000)
+    args = parser.parse_args()
+
+    prepare_workdir()
+
+    from app.core.cache import TTLCache
+    from app.core.jwt_backend import HMACBackend, JoseBackend
+
+    key, alg = "bench-secret", "HS256"
+    claims = {"sub": "42", "role": "user", "exp": datetime.now(timezone.utc) + timedelta(hours=1)}
+
+    rows = []
+    for backend in (JoseBackend(), HMACBackend()):
+        token = backend.encode(claims, key, alg)
+        cache: TTLCache[bytes, dict] = TTLCache(10000, 300)
+
+        def cached_decode():
+            digest = hashlib.sha256(token.encode()).digest()
+            hit = cache.get(digest)
+            if hit is None:
+                cache.set(digest, backend.decode(token, key, [alg]))
+                return
+            return dict(hit)
+
+        rows.append({
+            "backend": backend.name,
+            "encode us": f"{_per_call_us(lambda: backend.encode(claims, key, alg), args.iterations):.1f}",
+            "decode us": f"{_per_call_us(lambda: backend.decode(token, key, [alg]), args.iterations):.1f}",
+            "cached decode us": f"{_per_call_us(cached_decode, args.iterations):.2f}",
+        })
+
+    print_table(rows, ["backend", "encode us", "decode us", "cached decode us"])
+
+
+if __name__ == "__main__":
+    main()
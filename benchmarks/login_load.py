@@ -0,0 +1,93 @@
+"""Login throughput vs. concurrent file-listing latency.
+
+Floods /auth/login from --login-clients concurrent clients for --seconds while
+another client keeps listing /files/, then prints login throughput, both
+latency distributions and the hashing pool counters from /health/hashing.
+Re-run with PASSWORD_HASH_WORKERS / PASSWORD_HASH_MAX_QUEUE to compare.
+
+    python benchmarks/login_load.py --login-clients 32 --seconds 10
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import time
+
+from _common import (
+    BENCH_PASSWORD,
+    create_schema,
+    latency_summary,
+    prepare_workdir,
+    print_table,
+    seed_user,
+    token_for,
+    uvicorn_server,
+)
+
+
+async def _run(base_url: str, token: str, admin_token: str, clients: int, seconds: float):
+    import httpx
+
+    login_lat: list[float] = []
+    files_lat: list[float] = []
+    statuses: dict[int, int] = {}
+    deadline = time.monotonic() + seconds
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=120) as client:
+
+        async def login_loop():
+            while time.monotonic() < deadline:
+                start = time.perf_counter()
+                r = await client.post("/auth/login", data={"username": "bench", "password": BENCH_PASSWORD})
+                statuses[r.status_code] = statuses.get(r.status_code, 0) + 1
+                if r.status_code == 200:
+                    login_lat.append(time.perf_counter() - start)
+                elif r.status_code == 503:
+                    await asyncio.sleep(float(r.headers.get("Retry-After", "1")))
+
+        async def files_loop():
+            headers = {"Authorization": f"Bearer {token}"}
+            while time.monotonic() < deadline:
+                start = time.perf_counter()
+                r = await client.get("/files/", headers=headers)
+                r.raise_for_status()
+                files_lat.append(time.perf_counter() - start)
+                await asyncio.sleep(0.01)
+
+        await asyncio.gather(files_loop(), *(login_loop() for _ in range(clients)))
+        stats = (await client.get("/health/hashing", headers={"Authorization": f"Bearer {admin_token}"})).json()
+
+    return login_lat, files_lat, statuses, stats
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--login-clients", type=int, default=16)
+    parser.add_argument("--seconds", type=float, default=10.0)
+    args = parser.parse_args()
+
+    workdir = prepare_workdir()
+    create_schema()
+    user_id = seed_user("bench")
+    token = token_for(user_id)
+    admin_token = token_for(seed_user("bench-admin", role="admin"), role="admin")
+
+    with uvicorn_server(workdir) as base_url:
+        login_lat, files_lat, statuses, stats = asyncio.run(
+            _run(base_url, token, admin_token, args.login_clients, args.seconds)
+        )
+
+    print(f"logins: {len(login_lat) / args.seconds:.1f}/s  status counts: {statuses}")
+    print_table(
+        [
+            {"endpoint": "/auth/login", **latency_summary(login_lat)},
+            {"endpoint": "/files/", **latency_summary(files_lat)},
+        ],
+        ["endpoint", "count", "p50_ms", "p95_ms", "p99_ms", "max_ms"],
+    )
+    print("hashing pool:", json.dumps(stats))
+
+
+if __name__ == "__main__":
+    main()
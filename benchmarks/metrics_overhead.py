@@ -0,0 +1,121 @@
+"""Cost of the metrics middleware and DB hooks, plus raw primitive timings.
+
+Same in-process setup as user_cache.py: each mode runs in its own
+interpreter, since METRICS_ENABLED is read at import time.
+
+    python benchmarks/metrics_overhead.py --requests 5000 --concurrency 16
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+import timeit
+
+from _common import create_schema, prepare_workdir, print_table, seed_user, token_for
+
+
+async def _drive(path: str, token: str, total: int, concurrency: int) -> float:
+    import httpx
+    from app.main import app
+
+    headers = {"Authorization": f"Bearer {token}"}
+    transport = httpx.ASGITransport(app=app)
+    remaining = iter(range(total))
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        await client.get(path, headers=headers)  # warm up
+
+        async def worker():
+            for _ in remaining:
+                r = await client.get(path, headers=headers)
+                r.raise_for_status()
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        return total / (time.perf_counter() - start)
+
+
+def _child(args) -> None:
+    prepare_workdir()
+    create_schema()
+    user_id = seed_user("bench")
+    token = token_for(user_id)
+
+    from app.db.database import SessionLocal
+    from app.models.file import FileRecord
+
+    with SessionLocal() as db:
+        rec = FileRecord(owner_id=user_id, original_name="a.txt", stored_name="a.txt", size_bytes=1, storage_path="a.txt")
+        db.add(rec)
+        db.commit()
+        file_id = rec.id
+
+    async def run_all() -> dict:
+        # one loop for all: the async engine's pool is bound to it
+        return {
+            path: await _drive(path, token, args.requests, args.concurrency)
+            for path in ("/health/", "/files/", f"/files/{file_id}")
+        }
+
+    print(json.dumps(asyncio.run(run_all())))
+
+
+def _primitives() -> list[dict]:
+    prepare_workdir()
+    from app.core import metrics
+
+    counter = metrics.Counter("bench_total", "bench", ("route",))
+    histogram = metrics.Histogram("bench_seconds", "bench", ("route",))
+    rows = []
+    for label, stmt in (
+        ("Counter.inc", lambda: counter.inc("/files/{file_id}")),
+        ("Histogram.observe", lambda: histogram.observe(0.0042, "/files/{file_id}")),
+    ):
+        n = 1_000_000
+        seconds = timeit.timeit(stmt, number=n)
+        rows.append({"op": label, "ns/op": f"{seconds / n * 1e9:.0f}"})
+    return rows
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=3000)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        _child(args)
+        return
+
+    results = {}
+    for label, enabled in (("metrics on", "1"), ("metrics off", "0")):
+        env = {**os.environ, "METRICS_ENABLED": enabled}
+        proc = subprocess.run(
+            [sys.executable, __file__, "--child", "--requests", str(args.requests),
+             "--concurrency", str(args.concurrency)],
+            env=env, check=True, capture_output=True, text=True,
+        )
+        results[label] = json.loads(proc.stdout.strip().splitlines()[-1])
+
+    rows = []
+    for path in results["metrics on"]:
+        on, off = results["metrics on"][path], results["metrics off"][path]
+        rows.append({
+            "endpoint": path,
+            "off req/s": f"{off:.0f}",
+            "on req/s": f"{on:.0f}",
+            "overhead": f"{(off - on) / off:.1%}",
+        })
+    print_table(rows, ["endpoint", "off req/s", "on req/s", "overhead"])
+    print()
+    print_table(_primitives(), ["op", "ns/op"])
+
+
+if __name__ == "__main__":
+    main()
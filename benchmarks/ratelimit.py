@@ -0,0 +1,104 @@
+"""Cost of the rate limiter per request, by bucket backend, plus raw take() timings.
+
+A rule with a huge allowance covers GET /files/, so every request pays for
+the bucket without ever being refused; /health/ matches no rule. Each
+backend runs in its own interpreter, since the settings are read at import.
+
+    python benchmarks/ratelimit.py --requests 5000 --concurrency 16
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+
+from _common import create_schema, prepare_workdir, print_table, seed_user, token_for
+
+BACKENDS = ("off", "memory", "sqlite")
+
+
+async def _drive(path: str, token: str, total: int, concurrency: int) -> float:
+    import httpx
+    from app.main import app
+
+    headers = {"Authorization": f"Bearer {token}"}
+    transport = httpx.ASGITransport(app=app)
+    remaining = iter(range(total))
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        await client.get(path, headers=headers)  # warm up
+
+        async def worker():
+            for _ in remaining:
+                r = await client.get(path, headers=headers)
+                r.raise_for_status()
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        return total / (time.perf_counter() - start)
+
+
+def _child(args) -> None:
+    prepare_workdir(RATE_LIMITS="GET /files/=1000000000/1")
+    create_schema()
+    token = token_for(seed_user("bench"))
+
+    async def run_all() -> dict:
+        # one loop for all: the async engine's pool is bound to it
+        return {path: await _drive(path, token, args.requests, args.concurrency) for path in ("/health/", "/files/")}
+
+    print(json.dumps(asyncio.run(run_all())))
+
+
+def _primitives() -> list[dict]:
+    prepare_workdir()
+    from app.core.ratelimit import MemoryBuckets, SqliteBuckets
+
+    rows = []
+    for label, buckets in (("memory", MemoryBuckets()), ("sqlite", SqliteBuckets("ratelimit-bench.sqlite3"))):
+        n = 20_000
+        start = time.perf_counter()
+        for i in range(n):
+            buckets.take(f"user:{i % 100}", 1, 1e9, 1e9)
+        rows.append({"backend": label, "us/take": f"{(time.perf_counter() - start) / n * 1e6:.1f}"})
+    return rows
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=3000)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        _child(args)
+        return
+
+    results = {}
+    for backend in BACKENDS:
+        env = {**os.environ, "RATE_LIMIT_BACKEND": backend}
+        proc = subprocess.run(
+            [sys.executable, __file__, "--child", "--requests", str(args.requests),
+             "--concurrency", str(args.concurrency)],
+            env=env, check=True, capture_output=True, text=True,
+        )
+        results[backend] = json.loads(proc.stdout.strip().splitlines()[-1])
+
+    rows = []
+    for path in results["off"]:
+        row = {"endpoint": path}
+        for backend in BACKENDS:
+            row[f"{backend} req/s"] = f"{results[backend][path]:.0f}"
+        rows.append(row)
+    print_table(rows, ["endpoint"] + [f"{b} req/s" for b in BACKENDS])
+    print()
+    print_table(_primitives(), ["backend", "us/take"])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+"""Cold start: import time breakdown and time to the first /health answer.
+
+Each run is a fresh interpreter. ``python -X importtime -c "import app.main"``
+gives the import cost, grouped by top-level package and listed for the
+heaviest modules, plus which optional heavy dependencies got loaded at
+import time. Then uvicorn is started --runs times and /health/ polled until
+it answers; the median wall time from spawn is the number that matters for
+autoscaling and test start-up.
+
+--budget-import-ms / --budget-health-ms turn it into a check: exit status 1
+when a median goes over budget, so CI can track regressions.
+
+    python benchmarks/startup.py --runs 5 --out startup.json
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+from collections import Counter
+
+from _common import REPO_ROOT, create_schema, free_port, prepare_workdir, print_table
+
+# loaded on first use or by the lifespan warm-up, never by ``import app.main``
+LAZY = ("numpy", "passlib", "argon2", "jose.jwt", "cryptography", "dotenv", "boto3", "zstandard", "pypdf")
+
+
+def _env(extra: dict | None = None) -> dict:
+    return {**os.environ, **(extra or {}), "PYTHONPATH": str(REPO_ROOT)}
+
+
+def _importtime(workdir) -> tuple[float, list[tuple[int, int, str]]]:
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app.main"],
+        cwd=workdir, env=_env(), capture_output=True, text=True, check=True,
+    )
+    rows = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, name = line.split(":", 1)[1].split("|")
+        rows.append((int(self_us), int(cumulative_us), name.rstrip()))
+    total = next(cum for _, cum, name in rows if name.strip() == "app.main")
+    return total / 1000, rows
+
+
+def _first_health(workdir, env: dict | None) -> float:
+    port = free_port()
+    url = f"http://127.0.0.1:{port}/health/"
+    start = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        cwd=workdir, env=_env(env),
+    )
+    try:
+        while True:
+            try:
+                with urllib.request.urlopen(url, timeout=1) as r:
+                    if r.status == 200:
+                        return (time.perf_counter() - start) * 1000
+            except OSError:
+                pass
+            if proc.poll() is not None or time.perf_counter() - start > 60:
+                raise RuntimeError("uvicorn did not answer /health/")
+            time.sleep(0.005)
+    finally:
+        proc.terminate()
+        proc.wait(timeout=10)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15, help="heaviest modules to list")
+    parser.add_argument("--budget-import-ms", type=float, default=None)
+    parser.add_argument("--budget-health-ms", type=float, default=None)
+    parser.add_argument("--out", help="write the results as JSON")
+    args = parser.parse_args()
+
+    out = os.path.abspath(args.out) if args.out else None
+    workdir = prepare_workdir()
+    create_schema()
+
+    import_ms, runs_rows = [], []
+    for _ in range(args.runs):
+        total, rows = _importtime(workdir)
+        import_ms.append(total)
+        runs_rows.append(rows)
+    rows = runs_rows[import_ms.index(statistics.median_low(import_ms))]
+
+    by_package: Counter = Counter()
+    for self_us, _, name in rows:
+        by_package[name.strip().split(".")[0]] += self_us
+    loaded = {name.strip() for _, _, name in rows}
+    eager = [m for m in LAZY if m in loaded]
+
+    print(f"import app.main: median {statistics.median(import_ms):.0f} ms over {args.runs} runs")
+    print_table(
+        [{"package": p, "self_ms": round(us / 1000, 1)} for p, us in by_package.most_common(args.top)],
+        ["package", "self_ms"],
+    )
+    print()
+    print_table(
+        [{"module": name.strip(), "cumulative_ms": round(cum / 1000, 1)}
+         for _, cum, name in sorted(rows, key=lambda r: -r[1])[:args.top]],
+        ["module", "cumulative_ms"],
+    )
+    print(f"\nheavy optional modules loaded at import: {', '.join(eager) or 'none'}\n")
+
+    health = {}
+    for label, env in (("warm-up in background", None), ("warm-up before serving", {"STARTUP_WARMUP": "blocking"})):
+        samples = [_first_health(workdir, env) for _ in range(args.runs)]
+        health[label] = {"median_ms": round(statistics.median(samples), 1), "max_ms": round(max(samples), 1)}
+    print_table([{"uvicorn": k, **v} for k, v in health.items()], ["uvicorn", "median_ms", "max_ms"])
+
+    result = {
+        "import_ms": {"median": round(statistics.median(import_ms), 1), "runs": [round(v, 1) for v in import_ms]},
+        "import_by_package_ms": {p: round(us / 1000, 1) for p, us in by_package.most_common()},
+        "eager_heavy_modules": eager,
+        "first_health_ms": health,
+    }
+    if out:
+        with open(out, "w") as f:
+            json.dump(result, f, indent=2)
+
+    failed = []
+    if args.budget_import_ms is not None and result["import_ms"]["median"] > args.budget_import_ms:
+        failed.append(f"import {result['import_ms']['median']} ms > {args.budget_import_ms} ms")
+    first = health["warm-up in background"]["median_ms"]
+    if args.budget_health_ms is not None and first > args.budget_health_ms:
+        failed.append(f"first /health {first} ms > {args.budget_health_ms} ms")
+    if failed:
+        print("\nover budget: " + "; ".join(failed))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
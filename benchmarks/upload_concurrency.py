@@ -0,0 +1,108 @@
+"""p99 latency of /health and /files/ while large uploads are running.
+
+Starts uvicorn twice against the same database, once with the upload I/O pool
+(default) and once with UPLOAD_IO_WORKERS=0 (hash + write on the event loop),
+and probes the light endpoints while N concurrent uploads stream in.
+
+    python benchmarks/upload_concurrency.py --uploads 4 --size-mb 256
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import time
+
+from _common import (
+    create_schema,
+    latency_summary,
+    prepare_workdir,
+    print_table,
+    seed_user,
+    token_for,
+    uvicorn_server,
+)
+
+
+async def _probe(client, path: str, headers: dict, stop: asyncio.Event, samples: list[float], interval: float):
+    while not stop.is_set():
+        start = time.perf_counter()
+        r = await client.get(path, headers=headers)
+        r.raise_for_status()
+        samples.append(time.perf_counter() - start)
+        await asyncio.sleep(interval)
+
+
+async def _upload(client, headers: dict, payload_path: str) -> None:
+    with open(payload_path, "rb") as fh:
+        r = await client.post(
+            "/files/upload",
+            headers=headers,
+            files={"uploaded": ("payload.bin", fh, "application/octet-stream")},
+        )
+    r.raise_for_status()
+
+
+async def _run(base_url: str, token: str, payload_path: str, uploads: int, interval: float, idle_seconds: float):
+    import httpx
+
+    headers = {"Authorization": f"Bearer {token}"}
+    results = {}
+    async with httpx.AsyncClient(base_url=base_url, timeout=600) as client:
+        for phase in ("idle", "uploading"):
+            stop = asyncio.Event()
+            health: list[float] = []
+            files: list[float] = []
+            probes = [
+                asyncio.create_task(_probe(client, "/health/", {}, stop, health, interval)),
+                asyncio.create_task(_probe(client, "/files/", headers, stop, files, interval)),
+            ]
+            started = time.perf_counter()
+            if phase == "idle":
+                await asyncio.sleep(idle_seconds)
+            else:
+                await asyncio.gather(*(_upload(client, headers, payload_path) for _ in range(uploads)))
+            elapsed = time.perf_counter() - started
+            stop.set()
+            await asyncio.gather(*probes)
+            results[phase] = (latency_summary(health), latency_summary(files), elapsed)
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--uploads", type=int, default=4, help="concurrent uploads")
+    parser.add_argument("--size-mb", type=int, default=128, help="size of each upload")
+    parser.add_argument("--interval", type=float, default=0.01, help="pause between probes (s)")
+    parser.add_argument("--idle-seconds", type=float, default=3.0)
+    args = parser.parse_args()
+
+    workdir = prepare_workdir()
+    create_schema()
+    user_id = seed_user("bench")
+    token = token_for(user_id)
+
+    payload_path = str(workdir / "payload.bin")
+    with open(payload_path, "wb") as fh:
+        block = os.urandom(1024 * 1024)
+        for _ in range(args.size_mb):
+            fh.write(block)
+
+    rows = []
+    for label, workers in (("io pool", "4"), ("inline", "0")):
+        with uvicorn_server(workdir, {"UPLOAD_IO_WORKERS": workers}) as base_url:
+            results = asyncio.run(
+                _run(base_url, token, payload_path, args.uploads, args.interval, args.idle_seconds)
+            )
+        for phase, (health, files, elapsed) in results.items():
+            for endpoint, summary in (("/health/", health), ("/files/", files)):
+                rows.append({"mode": label, "phase": phase, "endpoint": endpoint, **summary})
+            if phase == "uploading":
+                mb = args.uploads * args.size_mb
+                print(f"[{label}] {args.uploads} x {args.size_mb} MB in {elapsed:.2f}s ({mb / elapsed:.0f} MB/s)")
+
+    print_table(rows, ["mode", "phase", "endpoint", "count", "p50_ms", "p95_ms", "p99_ms", "max_ms"])
+
+
+if __name__ == "__main__":
+    main()
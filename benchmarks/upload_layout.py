@@ -0,0 +1,91 @@
+"""Flat vs sharded upload directory: create / open / lookup latency at scale.
+
+Fills one directory tree per layout with --files small files named like
+uploads (uuid hex + suffix), going through storage.layout_path() and the
+same mkdir + open + write the upload sink does. Create latency is reported
+per tenth of the run, so growth with directory size shows up. Then
+--samples random existing files are opened and read, and as many missing
+names are looked up (the stat a download does for a deleted file), in a
+cold-ish order after the creates. "scan" is one full os.walk of the tree,
+roughly what a backup or ``ls -R`` pays.
+
+    python benchmarks/upload_layout.py --files 1000000
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import random
+import shutil
+import time
+import uuid
+
+from _common import latency_summary, prepare_workdir, print_table
+
+
+def _run(layout: str, root: str, names: list[str], samples: int, payload: bytes, rng: random.Random) -> list[dict]:
+    import app.services.storage as storage
+
+    storage.UPLOAD_LAYOUT = layout
+    paths = [storage.layout_path(root, name) for name in names]
+
+    rows = []
+    tenth = max(len(paths) // 10, 1)
+    creates: list[float] = []
+    for i, path in enumerate(paths, 1):
+        start = time.perf_counter()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with path.open("wb") as f:
+            f.write(payload)
+        creates.append(time.perf_counter() - start)
+        if i % tenth == 0 or i == len(paths):
+            rows.append({"layout": layout, "op": f"create @{i}", **latency_summary(creates)})
+            creates = []
+
+    opens = []
+    for path in rng.sample(paths, min(samples, len(paths))):
+        start = time.perf_counter()
+        with open(path, "rb") as f:
+            f.read()
+        opens.append(time.perf_counter() - start)
+    rows.append({"layout": layout, "op": "open+read", **latency_summary(opens)})
+
+    misses = []
+    for _ in range(samples):
+        path = storage.layout_path(root, f"{uuid.uuid4().hex}.txt")
+        start = time.perf_counter()
+        os.path.exists(path)
+        misses.append(time.perf_counter() - start)
+    rows.append({"layout": layout, "op": "stat miss", **latency_summary(misses)})
+
+    start = time.perf_counter()
+    count = sum(len(files) for _, _, files in os.walk(root))
+    rows.append({"layout": layout, "op": f"scan {count}", **latency_summary([time.perf_counter() - start])})
+    return rows
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--files", type=int, default=100_000)
+    parser.add_argument("--samples", type=int, default=10_000)
+    parser.add_argument("--size", type=int, default=64, help="bytes per file")
+    parser.add_argument("--layouts", default="flat,sharded")
+    parser.add_argument("--keep", action="store_true", help="leave the trees on disk")
+    args = parser.parse_args()
+
+    workdir = prepare_workdir()
+    rng = random.Random(0)
+    names = [f"{uuid.UUID(int=rng.getrandbits(128)).hex}.txt" for _ in range(args.files)]
+    payload = os.urandom(args.size)
+
+    rows = []
+    for layout in args.layouts.split(","):
+        root = str(workdir / layout)
+        rows += _run(layout, root, names, args.samples, payload, rng)
+        if not args.keep:
+            shutil.rmtree(root)
+    print_table(rows, ["layout", "op", "count", "p50_ms", "p95_ms", "p99_ms", "max_ms"])
+
+
+if __name__ == "__main__":
+    main()
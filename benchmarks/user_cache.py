@@ -0,0 +1,109 @@
+"""Requests/sec of authenticated endpoints with and without the user cache.
+
+Drives the app in-process (httpx ASGI transport) so the numbers reflect the
+per-request auth cost rather than socket overhead. Each mode runs in its own
+interpreter because the cache settings are read at import time.
+
+    python benchmarks/user_cache.py --requests 5000 --concurrency 32
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+
+from _common import create_schema, prepare_workdir, print_table, seed_user, token_for
+
+
+async def _drive(path: str, token: str, total: int, concurrency: int) -> float:
+    import httpx
+    from app.main import app
+
+    headers = {"Authorization": f"Bearer {token}"}
+    transport = httpx.ASGITransport(app=app)
+    remaining = iter(range(total))
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        await client.get(path, headers=headers)  # warm up
+
+        async def worker():
+            for _ in remaining:
+                r = await client.get(path, headers=headers)
+                r.raise_for_status()
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        return total / (time.perf_counter() - start)
+
+
+def _child(args) -> None:
+    prepare_workdir()
+    create_schema()
+    user_id = seed_user("bench")
+    token = token_for(user_id)
+
+    from app.db.database import SessionLocal
+    from app.models.file import FileRecord
+
+    db = SessionLocal()
+    rec = FileRecord(
+        owner_id=user_id,
+        original_name="a.txt",
+        stored_name="a.txt",
+        size_bytes=1,
+        storage_path="a.txt",
+    )
+    db.add(rec)
+    db.commit()
+    file_id = rec.id
+    db.close()
+
+    async def run_all() -> dict:
+        # one loop for all: the async engine's pool is bound to it
+        return {
+            path: await _drive(path, token, args.requests, args.concurrency)
+            for path in ("/users/me", "/files/", f"/files/{file_id}")
+        }
+
+    print(json.dumps(asyncio.run(run_all())))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=3000)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        _child(args)
+        return
+
+    results = {}
+    for label, ttl in (("cache on", "30"), ("cache off", "0")):
+        env = {**os.environ, "USER_CACHE_TTL_SECONDS": ttl}
+        proc = subprocess.run(
+            [sys.executable, __file__, "--child", "--requests", str(args.requests),
+             "--concurrency", str(args.concurrency)],
+            env=env, check=True, capture_output=True, text=True,
+        )
+        results[label] = json.loads(proc.stdout.strip().splitlines()[-1])
+
+    rows = []
+    for path in results["cache on"]:
+        on, off = results["cache on"][path], results["cache off"][path]
+        rows.append({
+            "endpoint": path,
+            "cache off req/s": f"{off:.0f}",
+            "cache on req/s": f"{on:.0f}",
+            "speedup": f"{on / off:.2f}x",
+        })
+    print_table(rows, ["endpoint", "cache off req/s", "cache on req/s", "speedup"])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""Vector store search: exact scan vs IVF, latency and recall@k.
+
+Fills a VectorStore with --rows synthetic clustered unit vectors, then times
+single-query exact search, batched exact search, an owner-filtered search
+(one owner holding ~1% of rows) and IVF at several nprobe values, reporting
+recall against the exact top-k.
+
+    python benchmarks/vector_search.py --rows 1000000 --dim 256
+"""
+from __future__ import annotations
+
+import argparse
+import time
+
+import numpy as np
+
+from _common import latency_summary, prepare_workdir, print_table
+
+
+def _corpus(rows: int, centers: np.ndarray, rng) -> np.ndarray:
+    labels = rng.integers(0, len(centers), size=rows)
+    out = np.empty((rows, centers.shape[1]), dtype=np.float32)
+    for start in range(0, rows, 100_000):
+        stop = min(start + 100_000, rows)
+        noise = rng.normal(scale=0.6, size=(stop - start, centers.shape[1])).astype(np.float32)
+        out[start:stop] = centers[labels[start:stop]] + noise
+    return out
+
+
+def _timed(func, queries) -> tuple[list, list[float]]:
+    results, samples = [], []
+    for q in queries:
+        start = time.perf_counter()
+        results.append(func(q))
+        samples.append(time.perf_counter() - start)
+    return results, samples
+
+
+def _recall(truth: list, got: list) -> float:
+    return float(np.mean([
+        len({h.chunk_id for h in a} & {h.chunk_id for h in b}) / max(len(a), 1)
+        for a, b in zip(truth, got)
+    ]))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--dim", type=int, default=256)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--clusters", type=int, default=500)
+    parser.add_argument("--batch", type=int, default=32, help="queries per search_batch call")
+    args = parser.parse_args()
+
+    workdir = prepare_workdir()
+    from app.services.vector_store import VectorStore
+
+    rng = np.random.default_rng(0)
+    centers = rng.normal(size=(args.clusters, args.dim)).astype(np.float32)
+    store = VectorStore(workdir / "vectors", args.dim)
+
+    start = time.perf_counter()
+    for offset in range(0, args.rows, 100_000):
+        vectors = _corpus(min(100_000, args.rows - offset), centers, rng)
+        ids = np.arange(offset, offset + len(vectors))
+        store.add(ids, ids // 8, ids % 100, vectors)
+    print(f"loaded {args.rows} x {args.dim} in {time.perf_counter() - start:.1f}s")
+
+    queries = _corpus(args.queries, centers, rng)
+    rows = []
+
+    truth, samples = _timed(lambda q: store.search(q, args.k, nprobe=0), queries)
+    rows.append({"mode": "exact", "recall": "1.000", **latency_summary(samples)})
+
+    batches = [queries[i:i + args.batch] for i in range(0, len(queries), args.batch)]
+    _, samples = _timed(lambda b: store.search_batch(b, args.k, nprobe=0), batches)
+    per_query = [s / args.batch for s in samples]
+    rows.append({"mode": f"exact batch={args.batch} (per query)", "recall": "1.000", **latency_summary(per_query)})
+
+    store.search(queries[0], args.k, owner_id=7, nprobe=0)  # builds the owner's row cache
+    _, samples = _timed(lambda q: store.search(q, args.k, owner_id=7, nprobe=0), queries)
+    rows.append({"mode": "exact owner filter (1%)", "recall": "1.000", **latency_summary(samples)})
+
+    start = time.perf_counter()
+    store.build_ivf()
+    print(f"ivf build: {store.stats()['ivf_lists']} lists in {time.perf_counter() - start:.1f}s")
+
+    for nprobe in (1, 4, 8, 16, 32):
+        got, samples = _timed(lambda q: store.search(q, args.k, nprobe=nprobe), queries)
+        rows.append({"mode": f"ivf nprobe={nprobe}", "recall": f"{_recall(truth, got):.3f}", **latency_summary(samples)})
+
+    print_table(rows, ["mode", "recall", "count", "p50_ms", "p95_ms", "p99_ms", "max_ms"])
+
+
+if __name__ == "__main__":
+    main()
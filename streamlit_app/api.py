@@ -1,5 +1,12 @@
+import hashlib
+import mimetypes
+import os
+
 import requests
 
+UPLOAD_CHUNK_SIZE = 8 * 1024 * 1024
+UPLOAD_RETRIES = 5
+
 def safe_json(r):
     try:
         return r.json()
@@ -25,34 +32,123 @@ def create_account(api_base, email, username, password):
     return r.status_code, safe_json(r), r.text
 
 
-def list_files(api_base, headers):
-    r = requests.get(f"{api_base}/files", headers=headers, timeout=15)
+def list_files(api_base, headers, cursor=None, limit=50):
+    params = {"limit": limit, "fields": "id,original_name,size_bytes"}
+    if cursor is not None:
+        params["cursor"] = cursor
+    r = requests.get(f"{api_base}/files/", headers=headers, params=params, timeout=15)
     return r.status_code, safe_json(r), r.text
 
 
 def upload_file(api_base, headers, uploaded):
-    files = {
-        "uploaded": (
-            uploaded.name,
-            uploaded.getvalue(),
-            uploaded.type or "application/octet-stream",
+    return upload_stream(
+        api_base,
+        headers,
+        uploaded,
+        uploaded.name,
+        uploaded.type or "application/octet-stream",
+        uploaded.size,
+    )
+
+
+def upload_path(api_base, headers, path):
+    with open(path, "rb") as fh:
+        return upload_stream(
+            api_base,
+            headers,
+            fh,
+            os.path.basename(path),
+            mimetypes.guess_type(path)[0] or "application/octet-stream",
+            os.path.getsize(path),
         )
-    }
+
+
+def upload_stream(api_base, headers, fh, name, content_type, size, chunk_size=UPLOAD_CHUNK_SIZE):
+    """Resumable upload: reads ``fh`` one chunk at a time, never the whole file."""
     r = requests.post(
-        f"{api_base}/files/upload",
+        f"{api_base}/files/uploads",
         headers=headers,
-        files=files,
-        timeout=60,
+        json={"filename": name, "content_type": content_type, "total_size": size},
+        timeout=15,
     )
+    if r.status_code != 201:
+        return r.status_code, safe_json(r), r.text
+
+    session_url = f"{api_base}/files/uploads/{r.json()['id']}"
+    chunk_headers = {**headers, "Content-Type": "application/octet-stream"}
+    hasher = hashlib.sha256()
+    offset = 0
+    failures = 0
+
+    while offset < size:
+        fh.seek(offset)
+        chunk = fh.read(chunk_size)
+        try:
+            r = requests.put(
+                session_url,
+                params={"offset": offset},
+                data=chunk,
+                headers=chunk_headers,
+                timeout=120,
+            )
+        except requests.RequestException:
+            r = None
+
+        if r is not None and r.status_code == 200:
+            if hasher is not None:
+                hasher.update(chunk)
+            offset += len(chunk)
+            failures = 0
+            continue
+
+        if r is not None and r.status_code < 500 and r.status_code != 409:
+            return r.status_code, safe_json(r), r.text
+        failures += 1
+        if failures > UPLOAD_RETRIES:
+            if r is None:
+                return 0, None, "Upload failed: server unreachable"
+            return r.status_code, safe_json(r), r.text
+
+        # ask the server how far it got and resume from there
+        try:
+            s = requests.get(session_url, headers=headers, timeout=15)
+        except requests.RequestException:
+            continue
+        if s.status_code != 200:
+            return s.status_code, safe_json(s), s.text
+        server_offset = s.json()["received_bytes"]
+        if server_offset == offset + len(chunk) and hasher is not None:
+            hasher.update(chunk)  # chunk landed, only the response got lost
+        elif server_offset != offset:
+            hasher = None  # can't vouch for the digest any more
+        offset = server_offset
+
+    params = {"sha256": hasher.hexdigest()} if hasher is not None else {}
+    r = requests.post(f"{session_url}/complete", headers=headers, params=params, timeout=60)
     return r.status_code, safe_json(r), r.text
 
 
-def download_file(api_base, headers, file_id):
+def download_file(api_base, headers, file_id, cache=None):
+    """GET a file, revalidating against `cache` ({file_id: (etag, content)}).
+
+    A 304 is returned to the caller as 200 with the cached bytes.
+    """
+    cached = cache.get(file_id) if cache is not None else None
+    req_headers = dict(headers)
+    if cached:
+        req_headers["If-None-Match"] = cached[0]
+
     r = requests.get(
         f"{api_base}/files/{file_id}/download",
-        headers=headers,
+        headers=req_headers,
         timeout=60,
     )
+    if r.status_code == 304 and cached:
+        return 200, cached[1], r.text
+
+    etag = r.headers.get("ETag")
+    if cache is not None and r.status_code == 200 and etag:
+        cache[file_id] = (etag, r.content)
     return r.status_code, r.content, r.text
 
 
@@ -28,20 +28,34 @@ if uploaded and st.button("Upload"):
 # List
 st.subheader("Your Files")
 
+if "files_cursor" not in st.session_state:
+    st.session_state.files_cursor = None
+
 code, data, text = list_files(
     st.session_state.api_base,
     auth_headers(),
+    cursor=st.session_state.files_cursor,
 )
 
 if code != 200:
     st.error(text)
     st.stop()
 
-if not data:
+if not data["items"]:
     st.info("No files uploaded yet.")
     st.stop()
 
-for f in data:
+p1, p2 = st.columns([1, 1])
+with p1:
+    if st.session_state.files_cursor is not None and st.button("First page"):
+        st.session_state.files_cursor = None
+        st.rerun()
+with p2:
+    if data.get("next_cursor") is not None and st.button("Next page"):
+        st.session_state.files_cursor = data["next_cursor"]
+        st.rerun()
+
+for f in data["items"]:
     with st.container():
         c1, c2, c3 = st.columns([5, 2, 2])
 
@@ -54,6 +68,7 @@ for f in data:
                     st.session_state.api_base,
                     auth_headers(),
                     f["id"],
+                    cache=st.session_state.setdefault("download_cache", {}),
                 )
                 if d_code == 200:
                     st.download_button(
@@ -0,0 +1,123 @@
+"""S3Backend against moto's in-process S3.
+
+    pip install -r requirements-dev.txt
+    python -m pytest -q tests
+"""
+import io
+
+import pytest
+
+pytest.importorskip("boto3")
+moto = pytest.importorskip("moto")
+
+from app.services.backends import S3Backend
+
+BUCKET = "test-bucket"
+PART = 5 * 1024 * 1024  # the smallest part S3 accepts
+
+
+@pytest.fixture
+def s3(monkeypatch):
+    for name, value in (
+        ("AWS_ACCESS_KEY_ID", "testing"),
+        ("AWS_SECRET_ACCESS_KEY", "testing"),
+        ("AWS_DEFAULT_REGION", "us-east-1"),
+    ):
+        monkeypatch.setenv(name, value)
+    with moto.mock_aws():
+        backend = S3Backend(bucket=BUCKET, prefix="blobs/", region="us-east-1", part_size=PART, max_concurrency=2)
+        backend._client.create_bucket(Bucket=BUCKET)
+        yield backend
+
+
+def _payload(size: int) -> bytes:
+    return (bytes(range(256)) * (size // 256 + 1))[:size]
+
+
+class _Trickle(io.RawIOBase):
+    """Short reads, like an archive member or a socket."""
+
+    def __init__(self, data: bytes, step: int = 700_000):
+        self._data, self._pos, self._step = data, 0, step
+
+    def readable(self):
+        return True
+
+    def read(self, size=-1):
+        size = self._step if size < 0 else min(size, self._step)
+        block = self._data[self._pos:self._pos + size]
+        self._pos += len(block)
+        return block
+
+
+class _Failing(_Trickle):
+    def read(self, size=-1):
+        if self._pos >= PART:
+            raise OSError("client went away")
+        return super().read(size)
+
+
+def test_small_object_round_trip(s3):
+    s3.put_stream("a/small.txt", io.BytesIO(b"hello world"))
+
+    assert s3.stat("a/small.txt").size == 11
+    assert s3.open_range("a/small.txt").read() == b"hello world"
+    head = s3._client.head_object(Bucket=BUCKET, Key="blobs/a/small.txt")
+    assert "-" not in head["ETag"]  # a single PUT, not a multipart upload
+
+
+def test_multipart_upload(s3):
+    data = _payload(2 * PART + 12345)
+    s3.put_stream("big.bin", _Trickle(data))
+
+    head = s3._client.head_object(Bucket=BUCKET, Key="blobs/big.bin")
+    assert head["ETag"].strip('"').endswith("-3")
+    assert s3.stat("big.bin").size == len(data)
+    assert s3.open_range("big.bin").read() == data
+    assert not s3._client.list_multipart_uploads(Bucket=BUCKET).get("Uploads")
+
+
+def test_failed_multipart_upload_is_aborted(s3):
+    with pytest.raises(OSError):
+        s3.put_stream("broken.bin", _Failing(_payload(3 * PART)))
+
+    assert s3.stat("broken.bin") is None
+    assert not s3._client.list_multipart_uploads(Bucket=BUCKET).get("Uploads")
+
+
+def test_ranged_reads(s3):
+    data = _payload(PART + 1000)
+    s3.put_stream("r.bin", io.BytesIO(data))
+
+    assert s3.open_range("r.bin", 0, 9).read() == data[:10]
+    assert s3.open_range("r.bin", PART - 5, PART + 4).read() == data[PART - 5:PART + 5]
+    assert s3.open_range("r.bin", PART).read() == data[PART:]
+    assert s3.open_range("r.bin", len(data) - 1, len(data) - 1).read() == data[-1:]
+
+
+def test_exists_and_delete(s3):
+    assert s3.stat("gone.txt") is None
+    with pytest.raises(FileNotFoundError):
+        s3.open_range("gone.txt")
+
+    s3.put_stream("gone.txt", io.BytesIO(b"x"))
+    assert s3.stat("gone.txt") is not None
+    s3.delete("gone.txt")
+    assert s3.stat("gone.txt") is None
+    s3.delete("gone.txt")  # a missing key is not an error
+
+
+def test_copy_and_put_file(s3, tmp_path):
+    src = tmp_path / "upload.bin"
+    src.write_bytes(b"payload")
+    s3.put_file("orig.bin", str(src))
+
+    assert not src.exists()
+    s3.copy("orig.bin", "copy.bin")
+    assert s3.open_range("copy.bin").read() == b"payload"
+    assert s3.open_range("orig.bin").read() == b"payload"
+    assert s3.local_path("copy.bin") is None
+    assert sorted(o["Key"] for o in s3._client.list_objects_v2(Bucket=BUCKET)["Contents"]) == [
+        "blobs/copy.bin",
+        "blobs/orig.bin",
+    ]